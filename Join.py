@@ -1,38 +1,89 @@
-import pandas as pd
+from customer_input import read_customers
+from report_writer import read_report, save_dataframe
+from url_join import CustomerIndex, load_customer_index
+
+
+def join_feed_customer_frames(df_main,
+                              main_join_column,
+                              customers,
+                              customer_join_column,
+                              normalize_urls=False):
+    """
+    INNER JOIN of the feed errors DataFrame with the customers by the feed URL,
+    in memory. 'customers' is a DataFrame or a url_join.CustomerIndex already
+    built (only used with 'normalize_urls').
+    """
+    import pandas as pd
+
+    # Verify if join columns exists in both data
+    if main_join_column not in df_main.columns:
+        raise ValueError(f"The join column '{main_join_column}' doesn't found on the feed errors.")
+
+    if normalize_urls:
+        if not isinstance(customers, CustomerIndex):
+            if customer_join_column not in customers.columns:
+                raise ValueError(f"The join column '{customer_join_column}' doesn't found on the customers. ")
+            # The index adds its key column, so it gets its own copy of the frame
+            customers = CustomerIndex(customers.copy(deep=False), customer_join_column)
+
+        # --- Realize an INNER JOIN by the normalized URL ---
+        df_combined, stats = customers.join(df_main, main_join_column)
+        print(f"URLs matched: {stats['matched']}, unmatched: {stats['unmatched']}, "
+              f"ambiguous: {stats['ambiguous']} (rows joined by a non identical URL: {stats['not_exact']})")
+        return df_combined
+
+    if customer_join_column not in customers.columns:
+        raise ValueError(f"The join column '{customer_join_column}' doesn't found on the customers. ")
+
+    # --- Realize an INNER JOIN on the frames ---
+    df_combined = pd.merge(df_main, customers,
+                           left_on=main_join_column,
+                           right_on=customer_join_column,
+                           how='inner')
+
+    # --- Manage the duplicated URL columns ---
+    if main_join_column != customer_join_column and customer_join_column in df_combined.columns:
+        df_combined = df_combined.drop(columns=[customer_join_column]) # keep only one URL column
+    return df_combined
+
 
 def join_feed_customer_data(main_file_path,
                             main_join_column,
                             customer_file_path,
                             customer_join_column,
-                            output_file_path):
-
+                            output_file_path,
+                            normalize_urls=False,
+                            use_sidecars=False):
+    """
+    INNER JOIN of the feed errors file with the customers file by the feed URL.
+    With 'normalize_urls' the URLs that only differ by scheme, host case,
+    trailing slash or query order also match. With 'use_sidecars' the customer
+    URL index (or the Parquet copy of an xlsx) is kept next to the customer
+    file to reuse it while the file doesn't change.
+    """
     try:
         # Log the main file
-        df_main = pd.read_excel(main_file_path, header=0)
+        df_main = read_report(main_file_path)
         print(f"'{main_file_path}' log successfull. Columns: {df_main.columns.tolist()}")
 
-        # Log the customer file
-        df_customer = pd.read_excel(customer_file_path, header=0)
-        print(f"'{customer_file_path}' log successfull. Columns: {df_customer.columns.tolist()}")
-
         # Verify if join columns exists in both file
         if main_join_column not in df_main.columns:
             raise ValueError(f"The join column '{main_join_column}' doesn't found on '{main_file_path}'.")
-        if customer_join_column not in df_customer.columns:
-            raise ValueError(f"The join column '{customer_join_column}' doesn't found on '{customer_file_path}'. ")
 
-        # --- Realize an INNER JOIN on the files ---
-        df_combined = pd.merge(df_main, df_customer,
-                               left_on=main_join_column,
-                               right_on=customer_join_column,
-                               how='inner')
+        if normalize_urls:
+            # Log the customer URL index (built from the customer file only when it changed)
+            customers = load_customer_index(customer_file_path, customer_join_column, use_cache=use_sidecars)
+            print(f"'{customer_file_path}' log successfull. Columns: {customers.frame.columns.tolist()[:-1]}")
+        else:
+            # Log the customer file (an xlsx can be kept as a Parquet copy, see customer_input)
+            customers = read_customers(customer_file_path, columns=None, use_sidecar=use_sidecars)
+            print(f"'{customer_file_path}' log successfull. Columns: {customers.columns.tolist()}")
 
-        # --- Manage the duplicated URL columns ---
-        if main_join_column != customer_join_column and customer_join_column in df_combined.columns:
-            df_combined = df_combined.drop(columns=[customer_join_column]) # keep only one URL column
+        df_combined = join_feed_customer_frames(df_main, main_join_column, customers, customer_join_column,
+                                                normalize_urls=normalize_urls)
 
-        # Save the result on a new excel file
-        df_combined.to_excel(output_file_path, index=False)
+        # Save the result on a new file (xlsx, csv or parquet, by its extension)
+        save_dataframe(df_combined, output_file_path)
         print(f"\nData join save successfully on the file '{output_file_path}'.")
         print(f"Columns: {df_combined.columns.tolist()}")
         print(f"Rows: {len(df_combined)}")
@@ -51,5 +102,7 @@ if __name__ == "__main__":
         main_join_column="Feed_URL",
         customer_file_path="Group_feed_url.xlsx", # Feed whit customer group by feed_url
         customer_join_column="feed_url",
-        output_file_path="final_report.xlsx" # Name of the resulting file
+        output_file_path="final_report.xlsx", # Name of the resulting file
+        normalize_urls=True, # Match the URLs that only differ by scheme, case, trailing slash...
+        use_sidecars=True # Keep the customer URL index next to the customer file
     )
\ No newline at end of file
@@ -0,0 +1,227 @@
+# --- asyncio feed probing ---
+# The same error types as feed_probe.feed_error_type, for async code. It only
+# uses the standard library (no requests, pymongo or pandas) and does nothing
+# at import, so it's quick to load inside other processes:
+#
+#     error_type = await async_probe.feed_error_type(url)
+#     async for url, error_type in async_probe.classify_many(urls, concurrency=50):
+#         ...
+#
+# Only the status line and the headers of every answer are read (the body is
+# never downloaded) and every request uses its own connection.
+
+# import libraries
+import asyncio
+from collections import deque
+from urllib.parse import quote, urljoin, urlsplit
+
+from feed_classify import DEFAULT_HEADERS, classify_answer
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 30 # same limit as requests
+_SAFE_CHARS = "/%:@!$&'()*+,;=-._~"
+_ssl_context = None
+
+
+class _RequestFailed(Exception):
+    # A URL that requests rejects without an answer, 'name' is the requests exception
+    def __init__(self, name):
+        super().__init__(name)
+        self.name = name
+
+
+def _tls_context():
+    # Created on the first https request, ssl is not imported for plain http
+    global _ssl_context
+    if _ssl_context is None:
+        import ssl
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def _split_url(url):
+    # Return (scheme, host, port, netloc, target) of a URL, checked as requests does
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if not scheme:
+        raise _RequestFailed("MissingSchema")
+    if scheme not in ("http", "https"):
+        raise _RequestFailed("InvalidSchema")
+    try:
+        host = parts.hostname
+        port = parts.port
+    except ValueError:
+        raise _RequestFailed("InvalidURL")
+    if not host:
+        raise _RequestFailed("InvalidURL")
+
+    netloc = f"[{host}]" if ":" in host else host
+    if port is not None:
+        netloc = f"{netloc}:{port}"
+    target = quote(parts.path or "/", safe=_SAFE_CHARS)
+    if parts.query:
+        target += "?" + quote(parts.query, safe=_SAFE_CHARS + "?")
+    return scheme, host, port or (443 if scheme == "https" else 80), netloc, target
+
+
+async def _read_head(reader, read_timeout):
+    # Read the status line and the headers of the answer (skipping 1xx answers)
+    while True:
+        status_line = await asyncio.wait_for(reader.readline(), read_timeout)
+        fields = status_line.decode("latin-1").split(None, 2)
+        if len(fields) < 2 or not fields[0].startswith("HTTP/") or not fields[1].isdigit():
+            raise ConnectionError("the server didn't answer with HTTP")
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), read_timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        status_code = int(fields[1])
+        if not 100 <= status_code < 200 or status_code == 101:
+            return status_code, headers
+
+
+async def _request(url, method, headers, connect_timeout, read_timeout):
+    # One request on a new connection, return (prepared url, status code, headers)
+    scheme, host, port, netloc, target = _split_url(url)
+    tls = _tls_context() if scheme == "https" else None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=tls, server_hostname=host if tls else None),
+            connect_timeout)
+    except asyncio.TimeoutError:
+        # requests reports a connect timeout as a connection error
+        raise ConnectionError("connect timeout")
+
+    try:
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {netloc}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines += ["Accept: */*", "Accept-Encoding: identity", "Connection: close", "", ""]
+        writer.write("\r\n".join(lines).encode("latin-1"))
+        await asyncio.wait_for(writer.drain(), read_timeout)
+        status_code, answer_headers = await _read_head(reader, read_timeout)
+        return f"{scheme}://{netloc}{target}", status_code, answer_headers
+    finally:
+        # The body isn't needed, drop the connection without reading it
+        writer.transport.abort()
+
+
+async def feed_error_type(feed_url: str, timeout=10, report_redirects=True, connect_timeout=None,
+                          headers=None, method="GET") -> str:
+    """
+    Try to search the feed URL and determine the error by its HTTP state, as
+    feed_probe.feed_error_type does (same error types). The redirects are
+    followed, and with 'report_redirects' a redirected feed returns
+    "REDIRECTED: <from> -> <to>". 'timeout' is the read timeout and
+    'connect_timeout' (default 'timeout') the connection one.
+    """
+    headers = DEFAULT_HEADERS if headers is None else headers
+    connect_timeout = timeout if connect_timeout is None else connect_timeout
+    try:
+        url = feed_url
+        redirected_from = None
+        for _ in range(MAX_REDIRECTS + 1):
+            url, status_code, answer_headers = await _request(url, method, headers, connect_timeout, timeout)
+            location = answer_headers.get("location")
+            if status_code not in REDIRECT_CODES or not location:
+                if report_redirects and redirected_from is not None:
+                    return classify_answer(status_code, redirect_from=redirected_from, redirect_to=url)
+                return classify_answer(status_code, answer_headers.get("content-type", ""))
+            redirected_from = url
+            url = urljoin(url, location)
+        raise _RequestFailed("TooManyRedirects")
+
+    # Other posible error if we can't reach the feed URL
+    except _RequestFailed as e:
+        return f"REQUEST_FAILED: {e.name}"
+    except asyncio.TimeoutError:
+        return "TIMEOUT_ERROR"
+    except (ConnectionError, OSError):
+        return "CONNECTION_ERROR"
+    except Exception as e:
+        return f"UNKNOWN_ERROR: {type(e).__name__}"
+
+
+def _host(url):
+    try:
+        return urlsplit(url).netloc.lower()
+    except (AttributeError, ValueError):
+        return ""
+
+
+async def classify_many(urls, concurrency=16, max_per_host=4, window=None, **options):
+    """
+    Probe every URL of 'urls' (any iterable) with at most 'concurrency' probes at
+    the same time, and never more than 'max_per_host' on one host, and yield
+    (url, error_type) as every probe finishes (not in the order of 'urls').
+    A URL whose host is busy doesn't hold a probe: the next URL of a host with
+    a free slot is probed instead, as in feed_probe.probe_feeds. 'window'
+    limits the URLs read ahead waiting for their host (default: 8 per probe).
+    The options are the ones of feed_error_type.
+    """
+    concurrency = max(1, concurrency)
+    max_per_host = max(1, max_per_host)
+    if window is None:
+        window = concurrency * 8
+
+    iterator = iter(urls)
+    exhausted = False
+    waiting = {}           # host -> deque of URLs waiting for a free host slot
+    ready_hosts = deque()  # hosts with waiting URLs, in round-robin order
+    waiting_urls = 0
+    in_flight = {}         # host -> number of running probes
+    tasks = {}             # task -> (url, host)
+
+    try:
+        while True:
+            # Read ahead from 'urls' until the window is full
+            while not exhausted and waiting_urls < window:
+                try:
+                    url = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                host = _host(url)
+                if host not in waiting:
+                    waiting[host] = deque()
+                    ready_hosts.append(host)
+                waiting[host].append(url)
+                waiting_urls += 1
+
+            # Start probes while there are free slots, rotating over the hosts
+            checked = 0
+            while len(tasks) < concurrency and ready_hosts and checked < len(ready_hosts):
+                host = ready_hosts.popleft()
+                if in_flight.get(host, 0) >= max_per_host:
+                    ready_hosts.append(host)
+                    checked += 1
+                    continue
+                checked = 0
+                url = waiting[host].popleft()
+                waiting_urls -= 1
+                if waiting[host]:
+                    ready_hosts.append(host)
+                else:
+                    del waiting[host]
+                in_flight[host] = in_flight.get(host, 0) + 1
+                tasks[asyncio.ensure_future(feed_error_type(url, **options))] = (url, host)
+
+            if not tasks:
+                # Nothing running means nothing waiting either: every URL was probed
+                break
+
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url, host = tasks.pop(task)
+                in_flight[host] -= 1
+                if not in_flight[host]:
+                    del in_flight[host]
+                yield url, task.result()
+    finally:
+        # Stop the probes still running if the consumer goes away early
+        for task in tasks:
+            task.cancel()
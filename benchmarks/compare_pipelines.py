@@ -0,0 +1,140 @@
+"""
+Check that the optimized errorDate stages give the same errors / errorDate per feed
+as the original ones, and time both.
+
+Both stage lists (with the errorDate match, without the $lookup and the report
+projection) are compared with a Python reference built with
+error_state.fold_status_entry: first on hand-written feeds (no IDLE, errors only
+before the last IDLE, several IDLEs), then on a synthetic feed_status_log.
+They always run on an in-memory collection (benchmarks.memory_collection), and
+then on a scratch database of a local mongod (dropped at the end), whose times
+are the ones to compare. The exit status is 0 if everything agrees, 1 if not, and 77 if it agreed
+in memory but there was no mongod to check.
+
+Run from the repository root:
+    python -m benchmarks.compare_pipelines --uri mongodb://localhost:27017 --feeds 2000
+"""
+# import libraries
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from error_pipeline import ensure_error_indexes, error_date_stages, error_match_stage, optimized_error_date_stages
+from error_state import IDLE, READING_ERROR, READING_ERROR_DURING_ATTEMPT, new_feed_state, fold_status_entry
+from benchmarks.memory_collection import MemoryCollection
+from benchmarks.synthetic_data import iter_status_log
+
+# Exit status when the in-memory check passed but the mongod one was skipped
+SKIPPED_EXIT = 77
+
+# Status sequences (one entry a day) of the feeds where the two pipelines could differ
+EDGE_CASES = {
+    "no_idle": [READING_ERROR_DURING_ATTEMPT, READING_ERROR, READING_ERROR_DURING_ATTEMPT, READING_ERROR],
+    "errors_before_last_idle": [READING_ERROR_DURING_ATTEMPT, READING_ERROR, READING_ERROR_DURING_ATTEMPT,
+                                IDLE, READING_ERROR],
+    "several_idles": [READING_ERROR_DURING_ATTEMPT, IDLE, READING_ERROR_DURING_ATTEMPT, READING_ERROR, IDLE,
+                      "READING", READING_ERROR_DURING_ATTEMPT, READING_ERROR_DURING_ATTEMPT, READING_ERROR],
+    "idle_last": [READING_ERROR_DURING_ATTEMPT, READING_ERROR, IDLE],
+}
+
+
+def edge_case_log(start):
+    # feed_status_log documents of EDGE_CASES, the feed URL is the name of the case
+    return [{"feedUrl": case, "status": status, "date": start + timedelta(days=day)}
+            for case, statuses in EDGE_CASES.items() for day, status in enumerate(statuses)]
+
+
+def reference_error_dates(status_log, error_days_ago):
+    # (errors, errorDate) calculated in Python, for the feeds the errorDate match keeps
+    states = {}
+    for doc in status_log:
+        state = states.get(doc["feedUrl"])
+        if state is None:
+            state = states[doc["feedUrl"]] = new_feed_state(doc["feedUrl"])
+        fold_status_entry(state, doc["status"], doc["date"])
+    return {feed_url: (state["errors"], state["errorDate"]) for feed_url, state in states.items()
+            if state["errors"] > 0 and state["errorDate"] is not None and state["errorDate"] <= error_days_ago}
+
+
+def run_stages(collection, date_stages, error_days_ago):
+    start = time.perf_counter()
+    pipeline = date_stages + [error_match_stage(error_days_ago)]
+    rows = {row["_id"]: (row["errors"], row["errorDate"]) for row in collection.aggregate(pipeline)}
+    return rows, time.perf_counter() - start
+
+
+def compare_all(collection, status_log, error_days_ago):
+    # The edge cases, then the synthetic log. Return True if all agree
+    same = compare(collection, edge_case_log(error_days_ago - timedelta(days=30)), error_days_ago, "Edge cases")
+    same &= compare(collection, status_log, error_days_ago, "Synthetic log")
+    return same
+
+
+def compare(collection, status_log, error_days_ago, label):
+    """
+    Load 'status_log' into 'collection', run both stage lists and compare them
+    with each other and with the Python reference. Return True if all agree.
+    """
+    collection.drop()
+    collection.insert_many([dict(doc) for doc in status_log])
+    ensure_error_indexes(collection.database, collection.name)
+
+    expected = reference_error_dates(status_log, error_days_ago)
+    classic, classic_time = run_stages(collection, error_date_stages(), error_days_ago)
+    optimized, optimized_time = run_stages(collection, optimized_error_date_stages(), error_days_ago)
+    print(f"{label}: {len(status_log)} log entries, original {len(classic)} feeds in {classic_time:.2f}s, "
+          f"optimized {len(optimized)} feeds in {optimized_time:.2f}s")
+
+    same = True
+    for name, rows in (("original", classic), ("optimized", optimized)):
+        if rows != expected:
+            same = False
+            different = set(rows.items()) ^ set(expected.items())
+            print(f"  The {name} pipeline differs from the Python reference in {len(different)} rows, "
+                  f"e.g. {sorted(different, key=str)[:3]}")
+    return same
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="local mongod to use")
+    parser.add_argument("--feeds", type=int, default=2000, help="number of synthetic feeds")
+    parser.add_argument("--events", type=int, default=40, help="max log entries per feed")
+    parser.add_argument("--days", type=int, default=24, help="days the error needs to be older than")
+    args = parser.parse_args()
+
+    # MongoDB keeps milliseconds, the reference must use the same dates
+    now = datetime.now().replace(microsecond=0)
+    error_days_ago = now - timedelta(days=args.days)
+    status_log = list(iter_status_log(args.feeds, args.events, now - timedelta(days=args.events * 2 + args.days), now))
+
+    print("In memory:")
+    failed = not compare_all(MemoryCollection(), status_log, error_days_ago)
+    if not failed:
+        print("Both pipelines give the same output as the Python reference in memory")
+
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(args.uri, serverSelectionTimeoutMS=3000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        print(f"No mongod at {args.uri}, the mongod check is skipped ({type(e).__name__})")
+        sys.exit(1 if failed else SKIPPED_EXIT)
+
+    db = client.feed_errors_pipeline_check
+    print(f"\nOn {args.uri}:")
+    try:
+        failed |= not compare_all(db.feed_status_log, status_log, error_days_ago)
+        if not failed:
+            print("Both pipelines give the same output as the Python reference")
+    except PyMongoError as e:
+        failed = True
+        print(f"The pipelines couldn't run on this server: {type(e).__name__}: {e}")
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,71 @@
+"""
+Measure the run time of probing a mix of healthy and broken hosts, with and
+without the per host circuit breaker and adaptive timeouts of ProbeClient.
+
+The broken hosts are a stub host that never answers in time (every probe is a
+TIMEOUT_ERROR) and a closed port (every probe is a CONNECTION_ERROR).
+
+Run from the repository root:
+    python -m benchmarks.host_breaker --urls-per-host 100 --read-timeout 1
+"""
+# import libraries
+import argparse
+import socket
+import time
+
+from feed_probe import ProbeClient, probe_feeds
+from benchmarks.stub_server import start_stub_server
+
+
+def closed_port():
+    # A port with nothing listening: the connections are refused
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run(urls, args, **client_options):
+    with ProbeClient(max_per_host=args.max_per_host, connect_timeout=args.read_timeout,
+                     read_timeout=args.read_timeout, **client_options) as client:
+        start = time.perf_counter()
+        results = [result for _, result in probe_feeds(urls, client.feed_error_type,
+                                                        max_workers=args.concurrency,
+                                                        max_per_host=args.max_per_host)]
+        return results, time.perf_counter() - start, client.connection_stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls-per-host", type=int, default=100, help="feed URLs on every host")
+    parser.add_argument("--concurrency", type=int, default=16, help="URLs probed at the same time")
+    parser.add_argument("--max-per-host", type=int, default=4, help="URLs probed at the same time on one host")
+    parser.add_argument("--read-timeout", type=float, default=1, help="timeout of the probes (seconds)")
+    parser.add_argument("--threshold", type=int, default=3, help="consecutive failures that open the breaker")
+    args = parser.parse_args()
+
+    healthy = start_stub_server()
+    hanging = start_stub_server()
+    healthy_url = f"http://127.0.0.1:{healthy.server_port}"
+    hanging_url = f"http://127.0.0.1:{hanging.server_port}"
+    refused_url = f"http://127.0.0.1:{closed_port()}"
+
+    urls = []
+    for i in range(args.urls_per_host):
+        urls.append(f"{healthy_url}/feed.xml?i={i}")
+        urls.append(f"{hanging_url}/slow?delay={args.read_timeout * 3}&i={i}")
+        urls.append(f"{refused_url}/feed.xml?i={i}")
+
+    plain, plain_time, _ = run(urls, args)
+    print(f"No breaker:  {len(urls)} URLs in {plain_time:.2f}s")
+
+    guarded, guarded_time, stats = run(urls, args, breaker_threshold=args.threshold, adaptive_timeouts=True)
+    print(f"Breaker:     {len(urls)} URLs in {guarded_time:.2f}s "
+          f"({stats['open_hosts']} hosts skipped, {stats['short_circuited']} URLs not probed)")
+
+    print(f"Speed-up: x{plain_time / guarded_time:.1f}")
+    if plain != guarded:
+        different = sum(1 for a, b in zip(plain, guarded) if a != b)
+        print(f"Warning: {different} results differ with the breaker")
+
+    for server in (healthy, hanging):
+        server.shutdown()
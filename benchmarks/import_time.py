@@ -0,0 +1,96 @@
+"""
+Measure the import time of the scripts with `python -X importtime` and check it
+stays in budget: no heavy library (pymongo, requests, pandas, numpy, openpyxl)
+is loaded at import, and the import takes less than --budget-ms.
+
+Every import runs in a new process. The exit code is 1 if a module is over
+budget, so it can run in a CI job or a cron check to catch regressions.
+
+Run from the repository root:
+    python -m benchmarks.import_time --budget-ms 150
+"""
+# import libraries
+import argparse
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ("pymongo", "requests", "pandas", "numpy", "openpyxl", "pyarrow")
+
+# Modules that must import without any heavy library
+LIGHT_MODULES = [
+    "search_error",
+    "feedErrorReport",
+    "feed_report",
+    "group_feed",
+    "error_state",
+    "live_tracker",
+    "customer_input",
+    "run_journal",
+    "error_pipeline",
+    "report_writer",
+    "run_metrics",
+    "async_probe",
+    "feed_classify",
+    "feed_probe",
+    "url_join",
+    "Join",
+]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(module):
+    """
+    Import 'module' in a new process and return (cumulative microseconds of the
+    import, names of the modules it loaded).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    total = None
+    loaded = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[1].strip().isdigit():
+            continue  # the header line
+        name = fields[2].strip()
+        loaded.append(name)
+        if name == module:
+            total = int(fields[1])
+    return total, loaded
+
+
+def heavy_imports(loaded):
+    return sorted({name.split(".")[0] for name in loaded if name.split(".")[0] in HEAVY_MODULES})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=150, help="maximum import time of every module")
+    parser.add_argument("--repeat", type=int, default=3, help="imports of every module (the fastest counts)")
+    parser.add_argument("modules", nargs="*", default=LIGHT_MODULES, help="modules to check")
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'module':<18}{'import (ms)':>12}  heavy modules loaded")
+    for module in args.modules:
+        measures = [import_time(module) for _ in range(max(1, args.repeat))]
+        total = min(total for total, _ in measures) / 1000
+        heavy = heavy_imports(measures[0][1])
+
+        status = ""
+        if heavy or total > args.budget_ms:
+            failures += 1
+            status = "  <- over budget"
+        print(f"{module:<18}{total:>12.1f}  {', '.join(heavy) or '-'}{status}")
+
+    if failures:
+        print(f"\n{failures} modules over budget ({args.budget_ms:g} ms, no {', '.join(HEAVY_MODULES)})")
+        sys.exit(1)
+    print(f"\nAll modules in budget ({args.budget_ms:g} ms)")
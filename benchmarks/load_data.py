@@ -0,0 +1,133 @@
+"""
+Load a synthetic feed_status_log (IDLE / READING_ERROR / READING_ERROR_DURING_ATTEMPT
+sequences, see synthetic_data.iter_status_log), its 'feeds' collection and a
+"Feeds with customers" sheet into a local mongod or into files, to run the
+scripts (or the benchmark suite) without the production SRV link.
+
+The log and the feeds are streamed in batches, so millions of entries don't
+have to fit in memory. The same --seed gives the same data. The files are
+MongoDB extended JSON, one document per line, ready for mongoimport.
+
+Run from the repository root:
+    python -m benchmarks.load_data --uri mongodb://localhost:27017 --feeds 100000 --events 40
+    python -m benchmarks.load_data --output-dir bench_data --feeds 100000 --customers 300000
+"""
+# import libraries
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+from report_writer import REPORT_FORMATS, open_report_writer, report_file_name
+from benchmarks.synthetic_data import generate_customers, iter_feeds, iter_status_log
+
+CUSTOMER_COLUMNS = ["feed_id", "feed_url", "owner_id", "platform_id", "platform_name"]
+
+
+def batches(documents, size):
+    iterator = iter(documents)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def load_into_mongo(db, feeds, events_per_feed, end, span_days=120, seed=0, batch_size=10000, payload_kb=0):
+    """
+    Replace the feed_status_log and feeds collections of 'db' with synthetic
+    ones and create the indexes the scripts use. Return (log entries, feeds).
+    'payload_kb' is the size of the filler of every 'feeds' document.
+    """
+    from error_pipeline import ensure_error_indexes
+
+    db.feed_status_log.drop()
+    db.feeds.drop()
+
+    entries = 0
+    start = end - timedelta(days=span_days)
+    for batch in batches(iter_status_log(feeds, events_per_feed, start, end, seed=seed), batch_size):
+        db.feed_status_log.insert_many(batch, ordered=False)
+        entries += len(batch)
+    for batch in batches(iter_feeds(feeds, seed=seed, payload_kb=payload_kb), batch_size):
+        db.feeds.insert_many(batch, ordered=False)
+
+    db.feeds.create_index("feedUrl")
+    ensure_error_indexes(db)
+    return entries, feeds
+
+
+def _extended_json(document):
+    # Dates as {"$date": ...}, the form mongoimport reads
+    return json.dumps({key: {"$date": value.isoformat() + "Z"} if isinstance(value, datetime) else value
+                       for key, value in document.items()})
+
+
+def write_collection_file(path, documents):
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for document in documents:
+            f.write(_extended_json(document) + "\n")
+            count += 1
+    return count
+
+
+def write_customers_file(path, rows, feeds=None, seed=0):
+    """
+    Write a "Feeds with customers" sheet (xlsx, csv or parquet by the extension
+    of 'path') with 'rows' customers over 'feeds' feed URLs.
+    """
+    columns = generate_customers(rows, feeds=feeds, seed=seed)
+    writer = open_report_writer(path, CUSTOMER_COLUMNS, sheet_title="Sheet1")
+    for row in zip(*(columns[column] for column in CUSTOMER_COLUMNS)):
+        writer.append(list(row))
+    writer.close()
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=None, help="local mongod to load the collections into")
+    parser.add_argument("--database", default="feedreader", help="database of the collections")
+    parser.add_argument("--output-dir", default=None, help="write the data to files in this folder instead")
+    parser.add_argument("--feeds", type=int, default=100000, help="number of feed URLs")
+    parser.add_argument("--events", type=int, default=40, help="max log entries per feed (half of it on average)")
+    parser.add_argument("--span-days", type=int, default=120, help="days of log, until today")
+    parser.add_argument("--customers", type=int, default=None, help="customer rows (default 3 per feed)")
+    parser.add_argument("--customers-format", choices=REPORT_FORMATS, default="xlsx", help="format of the customer sheet")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random data")
+    args = parser.parse_args()
+
+    if not args.uri and not args.output_dir:
+        parser.error("use --uri or --output-dir")
+    end = datetime.now().replace(microsecond=0)
+    customers = args.customers if args.customers is not None else args.feeds * 3
+
+    if args.uri:
+        from pymongo import MongoClient
+
+        client = MongoClient(args.uri, serverSelectionTimeoutMS=5000)
+        start = time.perf_counter()
+        entries, feeds = load_into_mongo(client[args.database], args.feeds, args.events, end,
+                                         span_days=args.span_days, seed=args.seed)
+        client.close()
+        print(f"Loaded {entries} log entries and {feeds} feeds into '{args.database}' "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        start = time.perf_counter()
+        logPath = os.path.join(args.output_dir, "feed_status_log.jsonl")
+        entries = write_collection_file(logPath, iter_status_log(args.feeds, args.events,
+                                                                 end - timedelta(days=args.span_days), end,
+                                                                 seed=args.seed))
+        feedsPath = os.path.join(args.output_dir, "feeds.jsonl")
+        write_collection_file(feedsPath, iter_feeds(args.feeds, seed=args.seed))
+        customersPath = write_customers_file(
+            os.path.join(args.output_dir, report_file_name("Feeds with customers", args.customers_format)),
+            customers, feeds=args.feeds, seed=args.seed)
+        print(f"Wrote {entries} log entries to '{logPath}', {args.feeds} feeds to '{feedsPath}' and "
+              f"{customers} customers to '{customersPath}' in {time.perf_counter() - start:.1f}s")
+        print(f"Load them with: mongoimport --db {args.database} --collection feed_status_log --file {logPath}")
@@ -0,0 +1,61 @@
+"""
+Time the three ways of joining the error feeds with the 'feeds' collection
+("embedded" $lookup, status only "pipeline" $lookup and "batched" find($in))
+on a local mongod, and check they give the same rows.
+
+Run from the repository root:
+    python -m benchmarks.lookup_strategies --uri mongodb://localhost:27017 --feeds 5000 --feed-kb 50
+"""
+# import libraries
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from error_pipeline import LOOKUP_STRATEGIES, build_error_pipeline, filter_available_feeds
+from benchmarks.load_data import load_into_mongo
+
+
+def run_strategy(db, error_days_ago, lookup, optimized):
+    start = time.perf_counter()
+    rows = db.feed_status_log.aggregate(build_error_pipeline(error_days_ago, optimized=optimized, lookup=lookup))
+    if lookup == "batched":
+        rows = filter_available_feeds(db, rows)
+    result = sorted((row["_id"], row["errorDate"]) for row in rows)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="local mongod to use")
+    parser.add_argument("--feeds", type=int, default=5000, help="number of synthetic feeds")
+    parser.add_argument("--events", type=int, default=20, help="max log entries per feed")
+    parser.add_argument("--feed-kb", type=int, default=50, help="size of every 'feeds' document")
+    parser.add_argument("--optimized", action="store_true", help="use the optimized errorDate stages")
+    parser.add_argument("--days", type=int, default=24, help="days the error needs to be older than")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri, serverSelectionTimeoutMS=5000)
+    db = client.feed_errors_lookup_check
+    now = datetime.now().replace(microsecond=0)
+    error_days_ago = now - timedelta(days=args.days)
+
+    entries, _ = load_into_mongo(db, args.feeds, args.events, now, span_days=args.events * 2 + args.days,
+                                 payload_kb=args.feed_kb)
+    print(f"Loaded {entries} log entries and {args.feeds} feeds of {args.feed_kb} KB")
+
+    results = {}
+    try:
+        for lookup in LOOKUP_STRATEGIES:
+            results[lookup], elapsed = run_strategy(db, error_days_ago, lookup, args.optimized)
+            print(f"  {lookup:<9} {len(results[lookup])} rows in {elapsed:.2f}s")
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+    if len({tuple(rows) for rows in results.values()}) != 1:
+        print("The strategies give different rows")
+        sys.exit(1)
+    print("All the strategies give the same rows")
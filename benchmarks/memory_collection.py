@@ -0,0 +1,200 @@
+# import libraries
+from datetime import datetime
+
+
+class MemoryCollection:
+    """
+    A list of documents with the aggregate() of the stages and operators the
+    errorDate pipelines use ($match, $group, $addFields, $setWindowFields
+    over a whole partition; $cond, $eq, $gt, $and, $filter, $min...), so
+    compare_pipelines can check them without a mongod.
+    The values are compared in MongoDB's order for what the pipelines hold:
+    null before numbers, numbers before strings, strings before dates.
+    """
+    def __init__(self, name="feed_status_log"):
+        self.name = name
+        self.database = {name: self}
+        self.docs = []
+
+    def drop(self):
+        self.docs = []
+
+    def insert_many(self, docs):
+        self.docs.extend(dict(doc) for doc in docs)
+
+    def create_index(self, keys, **kwargs):
+        # Nothing to index, the stages scan the list
+        return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+    def aggregate(self, pipeline, **kwargs):
+        docs = [dict(doc) for doc in self.docs]
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name not in STAGES:
+                raise NotImplementedError(f"{name} is not supported by MemoryCollection")
+            docs = STAGES[name](docs, spec)
+        return iter(docs)
+
+
+# --- Expressions ---
+REMOVE = object() # $$REMOVE
+
+
+def _order(value):
+    # Sort key in MongoDB's order of the types (for the types the pipelines use)
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value)
+    raise TypeError(f"MemoryCollection can't compare {type(value).__name__}")
+
+
+def evaluate(expression, doc, variables=None):
+    """
+    Return the value of an aggregation expression for 'doc'.
+    """
+    variables = variables or {}
+    if isinstance(expression, str):
+        if expression == "$$REMOVE":
+            return REMOVE
+        if expression.startswith("$$"):
+            return variables[expression[2:]]
+        if expression.startswith("$"):
+            return doc.get(expression[1:])
+        return expression
+    if isinstance(expression, list):
+        return [evaluate(item, doc, variables) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+
+    (operator, args), = expression.items()
+    if operator == "$cond":
+        if isinstance(args, list):
+            args = dict(zip(("if", "then", "else"), args))
+        branch = "then" if evaluate(args["if"], doc, variables) else "else"
+        return evaluate(args[branch], doc, variables)
+    if operator == "$eq":
+        first, second = evaluate(args, doc, variables)
+        return _order(first) == _order(second)
+    if operator == "$gt":
+        first, second = evaluate(args, doc, variables)
+        return _order(first) > _order(second)
+    if operator == "$and":
+        return all(evaluate(arg, doc, variables) for arg in args)
+    if operator == "$filter":
+        name = args.get("as", "this")
+        values = evaluate(args["input"], doc, variables) or []
+        return [value for value in values if evaluate(args["cond"], doc, {**variables, name: value})]
+    if operator in ("$min", "$max"):
+        # The expression forms: of several arguments, or of one array; nulls are left out
+        values = evaluate(args, doc, variables)
+        if not isinstance(values, list):
+            values = [values]
+        return _extreme(operator, values)
+    raise NotImplementedError(f"{operator} is not supported by MemoryCollection")
+
+
+def _extreme(operator, values):
+    values = [value for value in values if value is not None and value is not REMOVE]
+    if not values:
+        return None
+    return (min if operator == "$min" else max)(values, key=_order)
+
+
+def _accumulate(operator, expression, docs):
+    # Value of a $group / $setWindowFields accumulator over 'docs'
+    values = [evaluate(expression, doc) for doc in docs]
+    if operator == "$sum":
+        return sum(value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool))
+    if operator in ("$min", "$max"):
+        return _extreme(operator, values)
+    if operator == "$push":
+        return [value for value in values if value is not REMOVE]
+    if operator == "$first":
+        return values[0] if values else None
+    raise NotImplementedError(f"{operator} is not supported by MemoryCollection")
+
+
+# --- Stages ---
+def _matches(doc, query):
+    for field, condition in query.items():
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if _order(value) != _order(condition):
+                return False
+            continue
+        for operator, operand in condition.items():
+            if operator == "$in":
+                if not any(_order(value) == _order(item) for item in operand):
+                    return False
+            elif operator in ("$gt", "$gte", "$lt", "$lte"):
+                # Like MongoDB, a range only compares values of the same type
+                if value is None or _order(value)[0] != _order(operand)[0]:
+                    return False
+                if not {"$gt": value > operand, "$gte": value >= operand,
+                        "$lt": value < operand, "$lte": value <= operand}[operator]:
+                    return False
+            else:
+                raise NotImplementedError(f"{operator} is not supported by MemoryCollection")
+    return True
+
+
+def _group_docs(docs, key_expression):
+    # The documents of every key, in the order the keys are first seen
+    groups = {}
+    for doc in docs:
+        key = evaluate(key_expression, doc)
+        groups.setdefault(key if key is not REMOVE else None, []).append(doc)
+    return groups
+
+
+def _match_stage(docs, query):
+    return [doc for doc in docs if _matches(doc, query)]
+
+
+def _group_stage(docs, spec):
+    rows = []
+    for key, group in _group_docs(docs, spec["_id"]).items():
+        row = {"_id": key}
+        for field, accumulator in spec.items():
+            if field != "_id":
+                (operator, expression), = accumulator.items()
+                row[field] = _accumulate(operator, expression, group)
+        rows.append(row)
+    return rows
+
+
+def _add_fields_stage(docs, spec):
+    for doc in docs:
+        values = {field: evaluate(expression, doc) for field, expression in spec.items()}
+        doc.update((field, value) for field, value in values.items() if value is not REMOVE)
+    return docs
+
+
+def _set_window_fields_stage(docs, spec):
+    # Only the default window (the whole partition) is supported
+    if "sortBy" in spec:
+        raise NotImplementedError("$setWindowFields with sortBy is not supported by MemoryCollection")
+    rows = []
+    for group in _group_docs(docs, spec.get("partitionBy")).values():
+        for field, accumulator in spec["output"].items():
+            if "window" in accumulator:
+                raise NotImplementedError("$setWindowFields windows are not supported by MemoryCollection")
+            (operator, expression), = accumulator.items()
+            value = _accumulate(operator, expression, group)
+            for doc in group:
+                doc[field] = value
+        rows.extend(group)
+    return rows
+
+
+STAGES = {
+    "$match": _match_stage,
+    "$group": _group_stage,
+    "$addFields": _add_fields_stage,
+    "$setWindowFields": _set_window_fields_stage,
+}
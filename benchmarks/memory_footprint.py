@@ -0,0 +1,123 @@
+"""
+Measure the memory of the in-memory representations, before and after the
+compact ones:
+
+  cursor:  the cursor documents kept while probing (dicts vs error_pipeline.ErrorRecord)
+  errors:  the errors DataFrame of feed_report (a list per row vs feed_report.error_frame,
+           with the error types as a categorical)
+  groups:  the customers grouped by feed_url (group_feed "tuples" vs "arrow")
+
+Every measurement runs in its own process. 'held' is the RSS the result keeps
+after it's built and 'peak' the highest RSS of the process.
+
+Run from the repository root:
+    python -m benchmarks.memory_footprint --rows 100000 1000000
+"""
+# import libraries
+import argparse
+import gc
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.synthetic_data import generate_customers, generate_error_documents
+
+ERROR_TYPES = [404, 500, 403, 410, 200, 200, 200]
+CASES = {
+    "cursor": ("dicts", "records"),
+    "errors": ("row-lists", "columns"),
+    "groups": ("tuples", "arrow"),
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return peak_rss_mb() # not Linux: the peak is the best we have
+
+
+def error_rows(count):
+    # The rows of search_error_rows, with a new error type string per row as the probes give them
+    for i, document in enumerate(generate_error_documents(count, datetime(2024, 1, 1))):
+        code = ERROR_TYPES[i % len(ERROR_TYPES)]
+        error_type = "NOT_VALIDATED" if code == 200 else "ERROR_" + str(code)
+        yield [document["_id"], document["errorDate"], document["days_error"], error_type, i % 3 == 0]
+
+
+def build(case, variant, rows):
+    """
+    Prepare the input of 'case', then build the 'variant' representation of
+    it. Return (result, seconds to build it, RSS before building).
+    """
+    import pandas as pd
+
+    if case == "groups":
+        from group_feed import group_feed_frame
+
+        customers = pd.DataFrame(generate_customers(rows))
+        gc.collect()
+        baseline = current_rss_mb()
+        start = time.perf_counter()
+        result = group_feed_frame(customers, output=variant)
+        elapsed = time.perf_counter() - start
+        del customers
+        return result, elapsed, baseline
+
+    gc.collect()
+    baseline = current_rss_mb()
+    start = time.perf_counter()
+    if case == "cursor":
+        from error_pipeline import error_records
+
+        documents = generate_error_documents(rows, datetime(2024, 1, 1))
+        result = list(documents) if variant == "dicts" else list(error_records(documents))
+    else:
+        from feedErrorReport import error_report_headers
+        from feed_report import error_frame
+
+        columns = error_report_headers(cache_path="cache")
+        if variant == "row-lists":
+            result = pd.DataFrame(list(error_rows(rows)), columns=columns)
+        else:
+            result = error_frame(error_rows(rows), columns)
+    return result, time.perf_counter() - start, baseline
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000], help="row counts")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--child", nargs=3, metavar=("CASE", "VARIANT", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        case, variant, count = args.child
+        result, elapsed, baseline = build(case, variant, int(count))
+        gc.collect()
+        print(f"{elapsed:.3f} {current_rss_mb() - baseline:.1f} {peak_rss_mb():.1f}")
+        sys.exit(0)
+
+    print(f"{'case':<8}{'variant':<11}{'rows':>10}{'time (s)':>10}{'held (MB)':>11}{'peak RSS (MB)':>15}")
+    for count in args.rows:
+        for case in args.cases:
+            for variant in CASES[case]:
+                child = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.memory_footprint", "--child", case, variant, str(count)],
+                    capture_output=True, text=True
+                )
+                if child.returncode != 0:
+                    print(f"{case:<8}{variant:<11}{count:>10}  failed: {child.stderr.strip().splitlines()[-1]}")
+                    continue
+                elapsed, held, peak = child.stdout.split()
+                print(f"{case:<8}{variant:<11}{count:>10}{float(elapsed):>10.2f}{float(held):>11.1f}{float(peak):>15.1f}")
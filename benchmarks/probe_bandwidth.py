@@ -0,0 +1,48 @@
+"""
+Compare the bytes downloaded and the time spent by the full GET probe against
+the lightweight (HEAD first / capped streamed GET) probe, on large catalog feeds.
+
+Run from the repository root:
+    python -m benchmarks.probe_bandwidth --urls 40 --feed-mb 5
+"""
+# import libraries
+import argparse
+import time
+
+from feed_probe import ProbeClient, probe_feeds
+from benchmarks.stub_server import StubFeedHandler, start_stub_server
+
+
+def run(urls, lightweight, concurrency, max_bytes):
+    StubFeedHandler.bytes_sent = 0
+    start = time.perf_counter()
+    with ProbeClient(max_per_host=concurrency, lightweight=lightweight, max_bytes=max_bytes) as client:
+        results = [result for _, result in probe_feeds(urls, client.feed_error_type,
+                                                        max_workers=concurrency,
+                                                        max_per_host=concurrency)]
+    return results, time.perf_counter() - start, StubFeedHandler.bytes_sent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=40, help="number of feed URLs to probe")
+    parser.add_argument("--feed-mb", type=float, default=5, help="size of the large feeds in MB")
+    parser.add_argument("--concurrency", type=int, default=8, help="probes at the same time")
+    parser.add_argument("--max-bytes", type=int, default=8192, help="body cap of the lightweight probe")
+    args = parser.parse_args()
+
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    paths = [f"/big.xml?mb={args.feed_mb}", "/no-head.xml", "/page.html", "/status/404", "/redirect"]
+    urls = [base_url + paths[i % len(paths)] for i in range(args.urls)]
+
+    full_results, full_time, full_bytes = run(urls, False, args.concurrency, args.max_bytes)
+    print(f"Full GET:    {full_time:.2f}s, {full_bytes / 1024 / 1024:.1f} MB downloaded")
+
+    light_results, light_time, light_bytes = run(urls, True, args.concurrency, args.max_bytes)
+    print(f"Lightweight: {light_time:.2f}s, {light_bytes / 1024 / 1024:.3f} MB downloaded")
+
+    if full_results != light_results:
+        print("Warning: the lightweight results differ from the full GET ones.")
+
+    server.shutdown()
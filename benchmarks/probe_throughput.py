@@ -0,0 +1,90 @@
+"""
+Measure URLs/second of the serial probing loop against the concurrent engine,
+with a new connection per probe and with the shared keep-alive ProbeClient,
+and of the asyncio probes (async_probe.classify_many).
+
+Run from the repository root:
+    python -m benchmarks.probe_throughput --urls 200 --concurrency 32
+"""
+# import libraries
+import argparse
+import asyncio
+import random
+import time
+
+from async_probe import classify_many
+from feed_probe import ProbeClient, feed_error_type, probe_feeds
+from benchmarks.stub_server import start_stub_server
+
+
+def build_urls(base_urls, count, slow_delay, seed=0):
+    """
+    Build a mix of slow, failing, redirecting and good feed URLs spread over the stub hosts.
+    """
+    rng = random.Random(seed)
+    paths = [
+        "/feed.xml",
+        "/page.html",
+        "/status/404",
+        "/status/500",
+        "/redirect",
+        f"/slow?delay={slow_delay}",
+        "/drop",
+    ]
+    return [rng.choice(base_urls) + rng.choice(paths) for _ in range(count)]
+
+
+def run(urls, concurrency, max_per_host, probe=feed_error_type):
+    start = time.perf_counter()
+    results = [result for _, result in probe_feeds(urls, probe,
+                                                    max_workers=concurrency,
+                                                    max_per_host=max_per_host)]
+    elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+async def run_async(urls, concurrency, max_per_host):
+    start = time.perf_counter()
+    results = [result async for result in classify_many(urls, concurrency=concurrency, max_per_host=max_per_host)]
+    return results, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=200, help="number of feed URLs to probe")
+    parser.add_argument("--hosts", type=int, default=4, help="number of stub hosts")
+    parser.add_argument("--concurrency", type=int, default=32, help="workers of the concurrent run")
+    parser.add_argument("--max-per-host", type=int, default=8, help="probes at the same time per host")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="seconds the slow feeds wait")
+    args = parser.parse_args()
+
+    servers = [start_stub_server() for _ in range(args.hosts)]
+    base_urls = [f"http://127.0.0.1:{server.server_port}" for server in servers]
+    urls = build_urls(base_urls, args.urls, args.slow_delay)
+
+    serial_results, serial_time = run(urls, 1, 1)
+    print(f"Serial:     {len(urls)} URLs in {serial_time:.2f}s -> {len(urls) / serial_time:.1f} URLs/s")
+
+    concurrent_results, concurrent_time = run(urls, args.concurrency, args.max_per_host)
+    print(f"Concurrent: {len(urls)} URLs in {concurrent_time:.2f}s -> {len(urls) / concurrent_time:.1f} URLs/s "
+          f"(concurrency={args.concurrency}, max_per_host={args.max_per_host})")
+
+    with ProbeClient(max_per_host=args.max_per_host) as client:
+        pooled_results, pooled_time = run(urls, args.concurrency, args.max_per_host, client.feed_error_type)
+        stats = client.connection_stats()
+    print(f"Pooled:     {len(urls)} URLs in {pooled_time:.2f}s -> {len(urls) / pooled_time:.1f} URLs/s "
+          f"(requests={stats['requests']}, connections opened={stats['opened']}, reused={stats['reused']})")
+
+    async_results, async_time = asyncio.run(run_async(urls, args.concurrency, args.max_per_host))
+    print(f"Async:      {len(urls)} URLs in {async_time:.2f}s -> {len(urls) / async_time:.1f} URLs/s")
+
+    print(f"Speed-up: x{serial_time / concurrent_time:.1f} concurrent, x{serial_time / pooled_time:.1f} pooled, "
+          f"x{serial_time / async_time:.1f} async")
+    if serial_results != concurrent_results or serial_results != pooled_results:
+        print("Warning: the concurrent results differ from the serial ones.")
+    # The async results come as they finish, compare them without the order
+    if sorted(zip(urls, serial_results)) != sorted(async_results):
+        print("Warning: the async results differ from the serial ones.")
+
+    for server in servers:
+        server.shutdown()
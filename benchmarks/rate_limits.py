@@ -0,0 +1,58 @@
+"""
+Probe stub hosts that answer 429 above a request rate, as customer platforms do,
+without limits, with retries only and with the per host rate limiter.
+
+Every mode gets new stub servers, so the 429s counted by the servers are its own.
+
+Run from the repository root:
+    python -m benchmarks.rate_limits --hosts 4 --urls-per-host 60 --server-rate 10
+"""
+# import libraries
+import argparse
+import time
+
+from feed_probe import ProbeClient, probe_feeds
+from benchmarks.stub_server import rate_limited_handler, start_stub_server
+
+
+def run_mode(args, **client_options):
+    handlers = [rate_limited_handler(args.server_rate, burst=args.server_burst, retry_after=1)
+                for _ in range(args.hosts)]
+    servers = [start_stub_server(handler=handler) for handler in handlers]
+    urls = [f"http://127.0.0.1:{server.server_port}/feed.xml?i={i}"
+            for i in range(args.urls_per_host) for server in servers]
+
+    with ProbeClient(max_per_host=args.max_per_host, **client_options) as client:
+        start = time.perf_counter()
+        results = [result for _, result in probe_feeds(urls, client.feed_error_type,
+                                                        max_workers=args.concurrency,
+                                                        max_per_host=args.max_per_host)]
+        elapsed = time.perf_counter() - start
+        stats = client.connection_stats()
+
+    for server in servers:
+        server.shutdown()
+    rejected = sum(handler.rejected for handler in handlers)
+    return len(urls), elapsed, results.count("ERROR_429"), rejected, stats["retries"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hosts", type=int, default=4, help="number of stub hosts")
+    parser.add_argument("--urls-per-host", type=int, default=60, help="feed URLs on every host")
+    parser.add_argument("--server-rate", type=float, default=10, help="requests a second every host accepts")
+    parser.add_argument("--server-burst", type=int, default=2, help="burst every host accepts")
+    parser.add_argument("--concurrency", type=int, default=16, help="URLs probed at the same time")
+    parser.add_argument("--max-per-host", type=int, default=4, help="URLs probed at the same time on one host")
+    args = parser.parse_args()
+
+    modes = [
+        ("no limits", {}),
+        ("retries only", {"retries": 3, "backoff": 0.5}),
+        ("rate limited", {"rate_limit": args.server_rate * 0.9, "rate_burst": args.server_burst,
+                          "retries": 3, "backoff": 0.5}),
+    ]
+    print(f"{'mode':<14}{'URLs':>6}{'time (s)':>10}{'URLs/s':>8}{'429 in report':>15}{'429 sent':>10}{'retries':>9}")
+    for name, options in modes:
+        count, elapsed, reported, rejected, retries = run_mode(args, **options)
+        print(f"{name:<14}{count:>6}{elapsed:>10.2f}{count / elapsed:>8.1f}{reported:>15}{rejected:>10}{retries:>9}")
@@ -0,0 +1,88 @@
+"""
+Measure write time and peak RSS of every report format at several row counts.
+"xlsx-inmemory" is the old openpyxl Workbook() kept in memory until save.
+
+Every measurement runs in its own process, so the peak RSS is only the writer's.
+
+Run from the repository root:
+    python -m benchmarks.report_writers --rows 10000 100000 1000000
+"""
+# import libraries
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from report_writer import REPORT_FORMATS, open_report_writer, report_file_name
+
+HEADERS = ["Feed_URL", "Error_Start_Date", "Days_Since_Error_Start", "Error_type"]
+ERROR_TYPES = ["NOT_VALIDATED", "HTML_FORMAT", "ERROR_404", "ERROR_500", "CONNECTION_ERROR", "TIMEOUT_ERROR"]
+
+
+def generate_rows(count):
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        yield [
+            f"https://shop{i % 997}.example.com/feeds/{i}/products.xml",
+            start + timedelta(minutes=i),
+            i % 400,
+            ERROR_TYPES[i % len(ERROR_TYPES)],
+        ]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def write_rows(output_format, count, directory):
+    path = os.path.join(directory, report_file_name(f"bench_{count}", output_format.split("-")[0]))
+    start = time.perf_counter()
+    if output_format == "xlsx-inmemory":
+        import openpyxl
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(HEADERS)
+        for row in generate_rows(count):
+            ws.append(row)
+        wb.save(path)
+    else:
+        writer = open_report_writer(path, HEADERS, output_format)
+        for row in generate_rows(count):
+            writer.append(row)
+        writer.close()
+    elapsed = time.perf_counter() - start
+    return elapsed, os.path.getsize(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000], help="row counts")
+    parser.add_argument("--formats", nargs="+", default=["xlsx-inmemory"] + list(REPORT_FORMATS))
+    parser.add_argument("--child", nargs=3, metavar=("FORMAT", "ROWS", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        output_format, count, directory = args.child
+        elapsed, size = write_rows(output_format, int(count), directory)
+        print(f"{elapsed:.3f} {peak_rss_mb():.1f} {size}")
+        sys.exit(0)
+
+    print(f"{'format':<14}{'rows':>10}{'time (s)':>10}{'peak RSS (MB)':>15}{'size (MB)':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.rows:
+            for output_format in args.formats:
+                child = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.report_writers", "--child", output_format, str(count), directory],
+                    capture_output=True, text=True
+                )
+                if child.returncode != 0:
+                    print(f"{output_format:<14}{count:>10}  failed: {child.stderr.strip().splitlines()[-1]}")
+                    continue
+                elapsed, rss, size = child.stdout.split()
+                print(f"{output_format:<14}{count:>10}{float(elapsed):>10.2f}{float(rss):>15.1f}{int(size) / 1024 / 1024:>11.1f}")
@@ -0,0 +1,66 @@
+"""
+Time the error search as one aggregation and split into feedUrl ranges
+(sharded_search) on a local mongod, and check they give the same rows.
+
+Run from the repository root:
+    python -m benchmarks.sharded_search --uri mongodb://localhost:27017 --feeds 20000 --shards 2 4 8
+"""
+# import libraries
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from error_pipeline import build_error_pipeline
+from sharded_search import shard_boundaries, sharded_aggregate
+from benchmarks.load_data import load_into_mongo
+
+
+def rows_of(cursor):
+    return sorted((row["_id"], row["errorDate"], row.get("days_error")) for row in cursor)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="local mongod to use")
+    parser.add_argument("--feeds", type=int, default=20000, help="number of synthetic feeds")
+    parser.add_argument("--events", type=int, default=20, help="max log entries per feed")
+    parser.add_argument("--shards", type=int, nargs="+", default=[2, 4, 8], help="numbers of ranges to try")
+    parser.add_argument("--parallelism", type=int, default=4, help="ranges searched at the same time")
+    parser.add_argument("--optimized", action="store_true", help="use the optimized errorDate stages")
+    parser.add_argument("--days", type=int, default=24, help="days the error needs to be older than")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri, serverSelectionTimeoutMS=5000, maxPoolSize=max(100, args.parallelism))
+    db = client.feed_errors_shard_check
+    now = datetime.now().replace(microsecond=0)
+    error_days_ago = now - timedelta(days=args.days)
+
+    entries, _ = load_into_mongo(db, args.feeds, args.events, now, span_days=args.events * 2 + args.days)
+    print(f"Loaded {entries} log entries for {args.feeds} feeds")
+
+    pipeline = build_error_pipeline(error_days_ago, optimized=args.optimized)
+    failed = False
+    try:
+        start = time.perf_counter()
+        expected = rows_of(db.feed_status_log.aggregate(pipeline))
+        print(f"  one aggregation: {len(expected)} rows in {time.perf_counter() - start:.2f}s")
+
+        for shards in args.shards:
+            start = time.perf_counter()
+            boundaries = shard_boundaries(db.feed_status_log, shards)
+            rows = rows_of(sharded_aggregate(db.feed_status_log, pipeline, boundaries,
+                                             parallelism=args.parallelism))
+            print(f"  {len(boundaries) + 1} ranges: {len(rows)} rows in {time.perf_counter() - start:.2f}s")
+            if rows != expected:
+                failed = True
+                print(f"  {len(boundaries) + 1} ranges give different rows")
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+    if failed:
+        sys.exit(1)
+    print("The sharded searches give the same rows")
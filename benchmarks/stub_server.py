@@ -0,0 +1,198 @@
+# import libraries
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+FEED_BODY = b'<?xml version="1.0"?><rss><channel><item><title>Product</title></item></channel></rss>'
+HTML_BODY = b"<html><body>Not a feed</body></html>"
+
+
+class StubFeedHandler(BaseHTTPRequestHandler):
+    """
+    Serve fake feeds that behave like the ones we find in the report:
+      /feed.xml          -> 200 application/xml
+      /page.html         -> 200 text/html
+      /status/<code>     -> that HTTP status
+      /redirect          -> 302 to /feed.xml
+      /redirect?hops=<n> -> a chain of n redirects ending in /feed.xml
+      /slow?delay=<s>    -> waits before answering with a feed
+      /drop              -> closes the connection without answer
+      /big.xml?mb=<n>    -> a large feed of n MB (default 5)
+      /no-head.xml       -> 405 to HEAD requests, a feed to GET
+    See rate_limited_handler for a server that answers 429 above a rate.
+    The body bytes sent by all the handlers are counted in 'bytes_sent'.
+    """
+    protocol_version = "HTTP/1.1"
+    bytes_sent = 0
+    counter_lock = threading.Lock()
+
+    @classmethod
+    def count_bytes(cls, size):
+        with cls.counter_lock:
+            cls.bytes_sent += size
+
+    def log_message(self, format, *args):
+        pass  # keep the benchmark output clean
+
+    def _send(self, code, body=b"", content_type="application/xml", extra_headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+            self.count_bytes(len(body))
+
+    def _send_big(self, size):
+        # Stream a large feed in chunks, stopping if the client closes the connection
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        chunk = b"<item>" + b"x" * 65530 + b"</item>"
+        sent = 0
+        try:
+            while sent < size:
+                part = chunk[:size - sent]
+                self.wfile.write(part)
+                sent += len(part)
+                self.count_bytes(len(part))
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path = parts.path
+        query = parse_qs(parts.query)
+
+        if path == "/feed.xml":
+            self._send(200, FEED_BODY)
+        elif path == "/page.html":
+            self._send(200, HTML_BODY, "text/html; charset=utf-8")
+        elif path.startswith("/status/"):
+            self._send(int(path.rsplit("/", 1)[1]), b"", "text/plain")
+        elif path == "/redirect":
+            hops = int(query.get("hops", ["1"])[0])
+            location = f"/redirect?hops={hops - 1}" if hops > 1 else "/feed.xml"
+            self._send(302, b"", "text/plain", {"Location": location})
+        elif path == "/slow":
+            time.sleep(float(query.get("delay", ["1"])[0]))
+            self._send(200, FEED_BODY)
+        elif path == "/big.xml":
+            self._send_big(int(float(query.get("mb", ["5"])[0]) * 1024 * 1024))
+        elif path == "/no-head.xml":
+            if self.command == "HEAD":
+                self._send(405, b"", "text/plain")
+            else:
+                self._send(200, FEED_BODY)
+        elif path == "/drop":
+            self.close_connection = True
+            self.connection.close()
+        else:
+            self._send(404, b"", "text/plain")
+
+    do_HEAD = do_GET
+
+
+def rate_limited_handler(rate, burst=1, retry_after=1, status=429):
+    """
+    Return a StubFeedHandler class that accepts at most 'rate' requests a second
+    (bursts of 'burst'), as a customer platform does. The other requests get
+    'status' with a Retry-After of 'retry_after' seconds ('None' sends no header).
+    Use a new class for every server: the limit is shared by its requests, and
+    'accepted'/'rejected' count them.
+    """
+    class RateLimitedHandler(StubFeedHandler):
+        limit_lock = threading.Lock()
+        tokens = float(burst)
+        last_refill = time.monotonic()
+        accepted = 0
+        rejected = 0
+
+        @classmethod
+        def take_token(cls):
+            with cls.limit_lock:
+                now = time.monotonic()
+                cls.tokens = min(burst, cls.tokens + (now - cls.last_refill) * rate)
+                cls.last_refill = now
+                if cls.tokens >= 1:
+                    cls.tokens -= 1
+                    cls.accepted += 1
+                    return True
+                cls.rejected += 1
+                return False
+
+        def do_GET(self):
+            if self.take_token():
+                super().do_GET()
+            else:
+                headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+                self._send(status, b"", "text/plain", headers)
+
+        do_HEAD = do_GET
+
+    return RateLimitedHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # A client that gave up (timeout, closed connection) isn't an error of the stub
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+# Share of every kind of answer in stub_feed_urls, like the feeds of a report run
+URL_MIX = {
+    "/feed.xml": 0.35,
+    "/page.html": 0.1,
+    "/status/404": 0.15,
+    "/status/410": 0.05,
+    "/status/500": 0.05,
+    "/status/403": 0.05,
+    "/redirect": 0.05,
+    "/redirect?hops=3": 0.03,
+    "/slow?delay=0.2": 0.1,
+    "/slow?delay=30": 0.02,  # more than the probe timeout: a TIMEOUT_ERROR
+    "/drop": 0.05,
+}
+
+
+def stub_feed_urls(base_url, count, mix=None, seed=0):
+    """
+    Return 'count' URLs of the stub server at 'base_url' with the share of
+    answers of 'mix' (path: share, default URL_MIX), in a random order that
+    only depends on 'seed'. Every URL is different (an 'i' query parameter).
+    """
+    rng = random.Random(seed)
+    mix = mix or URL_MIX
+    paths = rng.choices(list(mix), [mix[path] for path in mix], k=count)
+    return [f"{base_url}{path}{'&' if '?' in path else '?'}i={i}" for i, path in enumerate(paths)]
+
+
+def start_stub_server(host="127.0.0.1", port=0, handler=StubFeedHandler):
+    """
+    Start a stub feed server on a background thread and return it.
+    The base URL is f"http://{host}:{server.server_port}".
+    """
+    server = StubServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    server = start_stub_server(port=8000)
+    print(f"Stub feed server running on http://127.0.0.1:{server.server_port} (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,286 @@
+"""
+Repeatable timing and memory runs of the report steps on synthetic data,
+to check that a performance change actually helps:
+
+  aggregation  the errorDate search on a local mongod (loaded by benchmarks.load_data)
+  probing      ProbeClient.feed_error_type on a mix of stub server URLs (see stub_server.URL_MIX)
+  grouping     group_feed.group_by_feed_url on a "Feeds with customers" sheet (read cold
+               by default, from its Parquet copy with --warm-cache)
+  join         Join.join_feed_customer_data of an errors report with the grouped customers
+
+The input files are generated once into --data-dir and reused. Every run is a
+new process, so 'peak' is the RSS of that step alone; the fastest and the
+median of --repeat runs are shown. --save keeps the results in a JSON file and
+--compare shows the change against one saved before (e.g. on the main branch).
+
+Run from the repository root:
+    python -m benchmarks.suite --save before.json
+    python -m benchmarks.suite --compare before.json
+    python -m benchmarks.suite --uri mongodb://localhost:27017 --feeds 100000 --stages aggregation
+"""
+# import libraries
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.synthetic_data import generate_error_documents
+
+STAGES = ("aggregation", "probing", "grouping", "join")
+BENCH_DATABASE = "feed_errors_benchmark"
+
+
+def peak_rss_mb():
+    # On Linux ru_maxrss keeps the peak of the parent the run was forked from, VmHWM starts at the exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+# --- Input data (generated once) ---
+def data_paths(args):
+    name = f"{args.customers}_{args.seed}"
+    return {
+        "customers": os.path.join(args.data_dir, f"customers_{name}.{args.customers_format}"),
+        "grouped": os.path.join(args.data_dir, f"grouped_{name}.{args.group_format}"),
+        "errors": os.path.join(args.data_dir, f"errors_{args.errors}_{args.seed}.csv"),
+    }
+
+
+def prepare_files(args, stages):
+    """
+    Generate the input files of 'stages' that are not in --data-dir yet.
+    """
+    from feedErrorReport import ERROR_REPORT_HEADERS
+    from report_writer import open_report_writer
+    from benchmarks.load_data import write_customers_file
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    paths = data_paths(args)
+    if {"grouping", "join"} & set(stages) and not os.path.exists(paths["customers"]):
+        print(f"Writing {args.customers} customer rows to '{paths['customers']}'...")
+        write_customers_file(paths["customers"], args.customers, seed=args.seed)
+    if "grouping" in stages and args.warm_cache:
+        from customer_input import read_customers
+
+        # Every run reads the Parquet copy of the customer sheet instead of the sheet
+        read_customers(paths["customers"], use_sidecar=True)
+
+    if "join" in stages and not os.path.exists(paths["grouped"]):
+        from group_feed import group_by_feed_url
+        from report_writer import save_dataframe
+
+        print(f"Grouping them into '{paths['grouped']}'...")
+        save_dataframe(group_by_feed_url(paths["customers"]), paths["grouped"])
+
+    if "join" in stages and not os.path.exists(paths["errors"]):
+        print(f"Writing {args.errors} error rows to '{paths['errors']}'...")
+        writer = open_report_writer(paths["errors"], ERROR_REPORT_HEADERS)
+        for document in generate_error_documents(args.errors, datetime(2024, 1, 1), seed=args.seed):
+            writer.append([document["_id"], document["errorDate"], document["days_error"], "ERROR_404"])
+        writer.close()
+    return paths
+
+
+def prepare_database(args):
+    """
+    Load the synthetic log into --database of --uri, unless it's already there
+    (--reload loads it again). Return the number of log entries.
+    """
+    from pymongo import MongoClient
+    from benchmarks.load_data import load_into_mongo
+
+    client = MongoClient(args.uri, serverSelectionTimeoutMS=5000)
+    try:
+        db = client[args.database]
+        entries = db.feed_status_log.estimated_document_count()
+        if entries == 0 or args.reload:
+            print(f"Loading {args.feeds} synthetic feeds into '{args.database}'...")
+            entries, _ = load_into_mongo(db, args.feeds, args.events, datetime.now().replace(microsecond=0),
+                                         seed=args.seed)
+        return entries
+    finally:
+        client.close()
+
+
+# --- One measured run (in its own process) ---
+def run_stage(stage, args):
+    """
+    Run 'stage' once and return (seconds, number of items it produced).
+    Only the step itself is timed, not reading the arguments or the imports.
+    """
+    paths = data_paths(args)
+    if stage == "aggregation":
+        from pymongo import MongoClient
+        from error_pipeline import build_error_pipeline, filter_available_feeds
+
+        client = MongoClient(args.uri)
+        db = client[args.database]
+        pipeline = build_error_pipeline(datetime.now() - timedelta(days=args.days), optimized=args.optimized,
+                                        lookup=args.lookup)
+        start = time.perf_counter()
+        rows = db.feed_status_log.aggregate(pipeline)
+        if args.lookup == "batched":
+            rows = filter_available_feeds(db, rows)
+        count = sum(1 for _ in rows)
+        elapsed = time.perf_counter() - start
+        client.close()
+        return elapsed, count
+
+    if stage == "probing":
+        from feed_probe import ProbeClient, probe_feeds
+        from benchmarks.stub_server import stub_feed_urls
+
+        urls = stub_feed_urls(args.base_url, args.urls, seed=args.seed)
+        start = time.perf_counter()
+        with ProbeClient(max_per_host=args.max_per_host, report_redirects=False, lightweight=args.lightweight,
+                         connect_timeout=args.read_timeout, read_timeout=args.read_timeout) as client:
+            count = sum(1 for _ in probe_feeds(urls, client.feed_error_type, max_workers=args.concurrency,
+                                               max_per_host=args.max_per_host))
+        return time.perf_counter() - start, count
+
+    if stage == "grouping":
+        from group_feed import group_by_feed_url
+
+        # Without --warm-cache every run reads the customer sheet itself
+        start = time.perf_counter()
+        result = group_by_feed_url(paths["customers"], output=args.group_output, use_sidecar=args.warm_cache)
+        return time.perf_counter() - start, len(result)
+
+    if stage == "join":
+        import tempfile
+        from Join import join_feed_customer_data
+        from report_writer import read_report
+
+        # Without the customer URL index kept next to the file, so every run is a cold one
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, f"final_report.{args.join_format}")
+            start = time.perf_counter()
+            join_feed_customer_data(paths["errors"], "Feed_URL", paths["grouped"], "feed_url", output,
+                                    normalize_urls=True)
+            elapsed = time.perf_counter() - start
+            count = len(read_report(output)) if os.path.exists(output) else 0
+        return elapsed, count
+
+    raise ValueError(f"Unknown stage '{stage}', use one of {STAGES}")
+
+
+def measure(stage, args, extra_arguments):
+    """
+    Run 'stage' --repeat times, each in a new process, and return its results.
+    """
+    runs = []
+    for _ in range(max(1, args.repeat)):
+        child = subprocess.run([sys.executable, "-m", "benchmarks.suite", "--child", stage] + extra_arguments,
+                               capture_output=True, text=True)
+        if child.returncode != 0:
+            return {"error": (child.stderr.strip().splitlines() or ["failed"])[-1]}
+        runs.append(json.loads(child.stdout.strip().splitlines()[-1]))
+    seconds = [run["seconds"] for run in runs]
+    return {"runs": len(runs), "min": min(seconds), "median": statistics.median(seconds),
+            "peak_mb": max(run["peak_mb"] for run in runs), "items": runs[-1]["items"]}
+
+
+def change(before, after):
+    return f"{(after - before) / before * 100:+.0f}%" if before else "-"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=None,
+                        help="steps to measure (default all, 'aggregation' only with --uri)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every step")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument("--data-dir", default="bench_data", help="folder of the generated input files")
+    parser.add_argument("--save", default=None, help="save the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="compare with the results saved in this JSON file")
+    # aggregation
+    parser.add_argument("--uri", default=None, help="local mongod for the aggregation step")
+    parser.add_argument("--database", default=BENCH_DATABASE, help="scratch database of the synthetic log")
+    parser.add_argument("--reload", action="store_true", help="load the synthetic log again")
+    parser.add_argument("--feeds", type=int, default=50000, help="feed URLs of the synthetic log")
+    parser.add_argument("--events", type=int, default=40, help="max log entries per feed")
+    parser.add_argument("--days", type=int, default=24, help="days the error needs to be older than")
+    parser.add_argument("--optimized", action="store_true", help="use the optimized pipeline")
+    parser.add_argument("--lookup", default="embedded", help="join with 'feeds' (embedded, pipeline or batched)")
+    # probing
+    parser.add_argument("--urls", type=int, default=500, help="stub server URLs probed")
+    parser.add_argument("--concurrency", type=int, default=16, help="URLs probed at the same time")
+    parser.add_argument("--max-per-host", type=int, default=16, help="probes at the same time on one host "
+                                                                    "(all the stub URLs are on one host)")
+    parser.add_argument("--lightweight", action="store_true", help="classify the feeds without downloading them")
+    parser.add_argument("--read-timeout", type=float, default=2, help="seconds a probe waits")
+    # grouping and join
+    parser.add_argument("--customers", type=int, default=300000, help="rows of the customer sheet")
+    parser.add_argument("--customers-format", default="xlsx", help="format of the customer sheet (xlsx, csv or parquet)")
+    parser.add_argument("--warm-cache", action="store_true", help="read the customer sheet from its Parquet copy")
+    parser.add_argument("--errors", type=int, default=50000, help="rows of the errors report joined")
+    parser.add_argument("--group-output", default="tuples", help="output of group_by_feed_url")
+    parser.add_argument("--group-format", default="xlsx", help="format of the grouped customers file")
+    parser.add_argument("--join-format", default="xlsx", help="format of the joined report")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # A measured run: the last line of the output is its result
+        seconds, items = run_stage(args.child, args)
+        print(json.dumps({"seconds": seconds, "items": items, "peak_mb": peak_rss_mb()}))
+        sys.exit(0)
+
+    stages = args.stages or [stage for stage in STAGES if stage != "aggregation" or args.uri]
+    if "aggregation" in stages and not args.uri:
+        parser.error("the aggregation step needs a local mongod (--uri)")
+
+    childArguments = sys.argv[1:]
+    server = None
+    if "probing" in stages:
+        from benchmarks.stub_server import start_stub_server
+
+        # The stub server runs in this process, so the peak RSS of a run is only the prober's
+        server = start_stub_server("127.0.0.1")
+        childArguments += ["--base-url", f"http://127.0.0.1:{server.server_port}"]
+    if "aggregation" in stages:
+        print(f"Synthetic log: {prepare_database(args)} entries")
+    prepare_files(args, stages)
+
+    results = {"settings": {key: value for key, value in vars(args).items()
+                            if key not in ("child", "base_url", "save", "compare")},
+               "date": datetime.now().isoformat(), "stages": {}}
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+
+    print(f"\n{'step':<13}{'items':>9}{'min (s)':>10}{'median (s)':>12}{'peak (MB)':>11}  vs. baseline (median / peak)")
+    for stage in stages:
+        result = measure(stage, args, childArguments)
+        results["stages"][stage] = result
+        if "error" in result:
+            print(f"{stage:<13}  failed: {result['error']}")
+            continue
+        compared = ""
+        before = baseline.get(stage)
+        if before and "error" not in before:
+            compared = f"  {change(before['median'], result['median'])} / {change(before['peak_mb'], result['peak_mb'])}"
+        print(f"{stage:<13}{result['items']:>9}{result['min']:>10.2f}{result['median']:>12.2f}"
+              f"{result['peak_mb']:>11.1f}{compared}")
+
+    if server is not None:
+        server.shutdown()
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to '{args.save}'")
@@ -0,0 +1,123 @@
+# --- Synthetic data for the benchmarks ---
+# import libraries
+import heapq
+import random
+from datetime import timedelta
+
+HEALTHY_CYCLE = ("IDLE", "READING", "INDEXED")
+
+# Share of the feeds of every kind in iter_status_log:
+#   healthy     only IDLE / READING / INDEXED cycles
+#   recovered   an error run, then back to IDLE
+#   broken      errors after the last IDLE until today (the feeds of the report)
+#   never_idle  errors since the first entry
+FEED_PROFILES = {"healthy": 0.6, "recovered": 0.15, "broken": 0.2, "never_idle": 0.05}
+
+
+def synthetic_feed_url(feed):
+    # The same URL for a feed number in the log, 'feeds', the customers and the error rows
+    return f"https://shop{feed % 997}.example.com/feeds/{feed}/products.xml"
+
+
+def generate_customers(rows, feeds=None, platforms=40, seed=0):
+    """
+    Return the columns (a dict of lists) of a "Feeds with customers" file with
+    'rows' customer rows over 'feeds' feed URLs (by default a third of the rows).
+    """
+    rng = random.Random(seed)
+    feeds = feeds or max(1, rows // 3)
+    platform_names = [f"Platform {platform}" for platform in range(platforms)]
+    columns = {"feed_id": [], "feed_url": [], "owner_id": [], "platform_id": [], "platform_name": []}
+    for row in range(rows):
+        feed = rng.randrange(feeds)
+        platform = feed % platforms
+        columns["feed_id"].append(row)
+        columns["feed_url"].append(synthetic_feed_url(feed))
+        columns["owner_id"].append(rng.randrange(rows))
+        columns["platform_id"].append(platform)
+        columns["platform_name"].append(platform_names[platform])
+    return columns
+
+
+def generate_error_documents(count, start, seed=0):
+    """
+    Yield 'count' documents as the error pipelines return them (_id, errorDate, days_error).
+    """
+    rng = random.Random(seed)
+    for feed in range(count):
+        yield {"_id": synthetic_feed_url(feed),
+               "errorDate": start + timedelta(minutes=rng.randrange(60 * 24 * 365)),
+               "days_error": rng.randrange(24, 400)}
+
+
+def _feed_status(rng, step, profile, error_start, error_end):
+    # Status of the entry 'step' of a feed: the healthy cycle outside its error run
+    # [error_start, error_end), and inside it a READING_ERROR followed by attempts
+    if profile == "healthy" or not error_start <= step < error_end:
+        since = step - error_end if step >= error_end else step
+        return HEALTHY_CYCLE[since % len(HEALTHY_CYCLE)]
+    if step == error_start or rng.random() < 0.3:
+        return "READING_ERROR"
+    return "READING_ERROR_DURING_ATTEMPT"
+
+
+def iter_status_log(feeds, events_per_feed, start, end, seed=0, profiles=None):
+    """
+    Yield feed_status_log documents for 'feeds' feed URLs between 'start' and
+    'end', in date order, as the collector writes them. Every feed has from
+    1 to 'events_per_feed' entries following one of 'profiles' (share by
+    profile, default FEED_PROFILES). Only one entry per feed is kept in
+    memory, so millions of entries can be streamed to a database or a file.
+    The same 'seed' gives the same documents.
+    """
+    rng = random.Random(seed)
+    profiles = profiles or FEED_PROFILES
+    names = list(profiles)
+    weights = [profiles[name] for name in names]
+    span = (end - start).total_seconds()
+
+    # One heap entry per feed: (date, feed, step, entries, seconds between entries, profile, error run)
+    heap = []
+    for feed in range(feeds):
+        events = rng.randint(1, events_per_feed)
+        profile = rng.choices(names, weights)[0]
+        if profile == "never_idle":
+            error_start, error_end = 0, events
+        elif profile == "broken":
+            error_start, error_end = rng.randrange(events), events
+        elif profile == "recovered" and events > 2:
+            error_start = rng.randrange(1, events - 1)
+            error_end = rng.randint(error_start + 1, min(events - 1, error_start + 6))
+        else:
+            profile, error_start, error_end = "healthy", events, events
+        gap = span / events
+        heap.append((start + timedelta(seconds=rng.uniform(0, gap)), feed, 0, events, gap, profile,
+                     error_start, error_end))
+    heapq.heapify(heap)
+
+    while heap:
+        date, feed, step, events, gap, profile, error_start, error_end = heap[0]
+        yield {"feedUrl": synthetic_feed_url(feed),
+               "status": _feed_status(rng, step, profile, error_start, error_end),
+               "date": date.replace(microsecond=0)}
+        if step + 1 < events:
+            nextDate = min(date + timedelta(seconds=rng.uniform(0.5, 1.5) * gap), end)
+            heapq.heapreplace(heap, (nextDate, feed, step + 1, events, gap, profile, error_start, error_end))
+        else:
+            heapq.heappop(heap)
+
+
+def iter_feeds(feeds, seed=0, not_available=0.1, payload_kb=0):
+    """
+    Yield the 'feeds' document of every feed URL of iter_status_log, a share
+    'not_available' of them NOT_AVAILABLE. 'payload_kb' adds a filler field
+    to make the documents as large as the real ones.
+    """
+    rng = random.Random(seed)
+    payload = "x" * (payload_kb * 1024)
+    for feed in range(feeds):
+        document = {"feedUrl": synthetic_feed_url(feed),
+                    "status": "NOT_AVAILABLE" if rng.random() < not_available else "AVAILABLE"}
+        if payload:
+            document["config"] = payload
+        yield document
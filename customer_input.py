@@ -0,0 +1,134 @@
+# import libraries
+import json
+import os
+
+from report_writer import excel_engine, read_report, report_format
+
+# --- Customer input ---
+# Reading the "Feeds with customers" file takes longer than grouping it, so
+# only the columns the report uses are read:
+#
+#     df = read_customers("Feeds with customers.xlsx")
+#
+# csv and parquet files are read directly. An xlsx is read with calamine when
+# it's installed. With use_sidecar=True (the command line scripts) it's also
+# saved once to a Parquet file next to it (<file>.cache.parquet, needs
+# pyarrow), used instead of the xlsx while the xlsx keeps the same
+# modification time and size. A sheet Arrow can't store (e.g. a column of
+# numbers and text) gets a sidecar without rows that only records that, so it
+# isn't tried again until the xlsx changes.
+CUSTOMER_COLUMNS = ['feed_id', 'feed_url', 'owner_id', 'platform_id', 'platform_name']
+SIDECAR_VERSION = 1
+SIDECAR_KEY = b"customer_source"
+
+
+def customer_sidecar_path(file_path, sheet=0):
+    suffix = "" if sheet == 0 else f".{sheet}"
+    return f"{file_path}{suffix}.cache.parquet"
+
+
+def read_customers(file_path, columns=CUSTOMER_COLUMNS, sheet=0, use_sidecar=False):
+    """
+    Read the 'columns' of a customer file (xlsx, csv or parquet by its
+    extension, all the columns with None) into a DataFrame. The columns the
+    file doesn't have are left out, for the caller to check. 'sheet' is the
+    xlsx sheet, and with 'use_sidecar' an xlsx is kept as a Parquet copy.
+    """
+    import pandas as pd
+
+    wanted = None if columns is None else set(columns)
+    usecols = None if wanted is None else (lambda column: column in wanted)
+    input_format = report_format(file_path)
+
+    if input_format == "csv":
+        return pd.read_csv(file_path, usecols=usecols)
+    if input_format == "parquet":
+        return read_report(file_path, columns=_parquet_columns(file_path, wanted))
+
+    stat = os.stat(file_path)
+    sidecar = customer_sidecar_path(file_path, sheet)
+    saved = _sidecar_metadata(sidecar, stat, sheet) if use_sidecar else None
+    unsupported = (saved is not None and saved.get("unsupported")
+                   and saved["columns"] == (None if columns is None else list(columns)))
+    if saved is not None and not saved.get("unsupported"):
+        df = _read_sidecar(sidecar, saved, wanted)
+        if df is not None:
+            return df
+
+    df = pd.read_excel(file_path, sheet_name=sheet, usecols=usecols, engine=excel_engine())
+    if use_sidecar and not unsupported and sidecar not in _unwritable_sidecars:
+        _write_sidecar(df, sidecar, stat, sheet, columns)
+    return df
+
+
+def _parquet_columns(file_path, wanted):
+    # The wanted columns that the Parquet file has (reading a missing one is an error)
+    import pyarrow.parquet as pq
+
+    names = pq.read_schema(file_path).names
+    return None if wanted is None else [name for name in names if name in wanted]
+
+
+# Sidecars that couldn't even be marked as unsupported (e.g. a read-only folder),
+# not tried again by this process
+_unwritable_sidecars = set()
+
+
+def _sidecar_metadata(sidecar, stat, sheet):
+    # What the sidecar saved about its source, or None if there's none or it's of another version of the source
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        import pyarrow.parquet as pq
+
+        metadata = pq.read_schema(sidecar).metadata or {}
+        saved = json.loads(metadata[SIDECAR_KEY])
+        if (saved["version"] != SIDECAR_VERSION or saved["source_mtime"] != stat.st_mtime
+                or saved["source_size"] != stat.st_size or saved["sheet"] != sheet):
+            return None
+        return saved
+    except Exception as e:
+        print(f"The customer cache '{sidecar}' couldn't be used, reading the xlsx again: {e}")
+        return None
+
+
+def _read_sidecar(sidecar, saved, wanted):
+    # The sidecar frame, or None if it doesn't have the wanted columns
+    savedColumns = None if saved["columns"] is None else set(saved["columns"])
+    if savedColumns is not None and (wanted is None or not wanted <= savedColumns):
+        return None
+    try:
+        return read_report(sidecar, columns=_parquet_columns(sidecar, wanted))
+    except Exception as e:
+        print(f"The customer cache '{sidecar}' couldn't be used, reading the xlsx again: {e}")
+        return None
+
+
+def _save_sidecar_table(table, sidecar, saved):
+    import pyarrow.parquet as pq
+
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SIDECAR_KEY: json.dumps(saved)})
+    temp_path = sidecar + ".tmp"
+    pq.write_table(table, temp_path)
+    os.replace(temp_path, sidecar)
+
+
+def _write_sidecar(df, sidecar, stat, sheet, columns):
+    # Save the frame with the version of its source. A frame Arrow can't store gets
+    # an empty sidecar marked "unsupported", so it isn't tried (and reported) on every run
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return # no pyarrow, the xlsx is read every time
+
+    saved = {"version": SIDECAR_VERSION, "source_mtime": stat.st_mtime, "source_size": stat.st_size,
+             "sheet": sheet, "columns": None if columns is None else list(columns)}
+    try:
+        _save_sidecar_table(pa.Table.from_pandas(df, preserve_index=False), sidecar, saved)
+        return
+    except Exception as e:
+        print(f"The customer cache '{sidecar}' can't be saved, the xlsx will be read while it doesn't change: {e}")
+    try:
+        _save_sidecar_table(pa.table({}), sidecar, {**saved, "unsupported": True})
+    except Exception:
+        _unwritable_sidecars.add(sidecar)
@@ -0,0 +1,308 @@
+# --- Aggregation pipeline used to find the feeds with errors ---
+# The stages are split so the other search modes can reuse them:
+#   error_date_stages()      -> one document per feedUrl with 'errors' and 'errorDate'
+#   optimized_error_date_stages() -> the same documents, without per feed date arrays
+#   error_match_stage()      -> keep the feeds whose errorDate is older than the limit
+#   available_feed_stages()  -> join with 'feeds', drop NOT_AVAILABLE and project the output
+#   filter_available_feeds() -> the same join done after the aggregation, in batches
+#
+# The 'lookup' strategies to join with 'feeds':
+#   "embedded" -> $lookup of the whole feeds documents for every feed (the original)
+#   "pipeline" -> $lookup that only brings the 'status' of the feeds documents
+#   "batched"  -> no $lookup: filter_available_feeds asks for the feeds of a chunk
+#                 of URLs with one find($in) query
+from datetime import datetime
+from typing import NamedTuple
+
+LOOKUP_STRATEGIES = ("embedded", "pipeline", "batched")
+
+
+class ErrorRecord(NamedTuple):
+    """
+    A feed with errors, with only the fields of report_project_stage. It takes
+    about a third of the memory of the cursor document (a dict).
+    """
+    feed_url: str
+    error_date: datetime
+    days_error: int
+
+
+def error_records(rows):
+    """
+    Turn the rows of the error pipelines (or filter_available_feeds) into ErrorRecords.
+    """
+    for row in rows:
+        yield ErrorRecord(row["_id"], row.get("errorDate"), row.get("days_error"))
+
+
+def error_date_stages():
+    """
+    Group feed_status_log by feedUrl and calculate the 'errorDate' of every feed.
+    """
+    return [
+        {
+            "$group": {
+                # Select the feed URL that has at least one READING_ERROR
+                "_id": "$feedUrl",
+                "count": {"$sum": 1},
+                "errors": {
+                    "$sum": {
+                        "$cond": {
+                            "if": {"$eq": ["$status", "READING_ERROR"]},
+                            "then": 1,
+                            "else": 0
+                        }
+                    }
+                },
+                # This is the date of the oldest "READING_ERROR_DURING_ATTEMPT" found for this feedUrl (overall)
+                "earliestReadingErrorDate": {
+                    "$min": {
+                        "$cond": {
+                            "if": {"$eq": ["$status", "READING_ERROR_DURING_ATTEMPT"]},
+                            "then": "$date",
+                            "else": None
+                        }
+                    }
+                },
+                # Calculate the most recent "IDLE" date for this feedUrl
+                "latestIdleDate": {
+                    "$max": {
+                        "$cond": {
+                            "if": {"$eq": ["$status", "IDLE"]},
+                            "then": "$date",
+                            "else": None
+                        }
+                    }
+                },
+                # Collect all "READING_ERROR_DURING_ATTEMPT" dates into an array
+                "allReadingErrorDates": {
+                    "$push": {
+                        "$cond": {
+                            "if": {"$eq": ["$status", "READING_ERROR_DURING_ATTEMPT"]},
+                            "then": "$date",
+                            "else": "$$REMOVE"
+                        }
+                    }
+                }
+            }
+        },
+        {
+            # Calculate 'errorDate' based on aggregated values from the previous group
+            "$addFields": {
+                # 'errorDate' will be the ldest READING_ERROR_ATTEMPT date after the latest IDLE,
+                # or the oldest overall READING_ERROR_ATTEMPT if no IDLE occurred.
+                "errorDate": {
+                    "$cond": {
+                        "if": {"$eq": ["$latestIdleDate", None]},
+                        "then": "$earliestReadingErrorDate",
+                        "else": {
+                            "$min": {
+                                "$filter": {
+                                    "input": "$allReadingErrorDates",
+                                    "as": "errDate",
+                                    "cond": {"$gt": ["$$errDate", "$latestIdleDate"]}
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    ]
+
+
+def optimized_error_date_stages():
+    """
+    Same 'errors' and 'errorDate' per feedUrl as error_date_stages, but:
+      - it starts with an index friendly $match on the three statuses it needs,
+      - the latest IDLE is spread to every entry of the feed with $setWindowFields,
+        so the first error after it is a plain $min instead of a pushed array.
+    Needs MongoDB 5.0+ (as $dateDiff in the report projection).
+    """
+    return [
+        {
+            "$match": {
+                "status": {"$in": ["READING_ERROR", "READING_ERROR_DURING_ATTEMPT", "IDLE"]}
+            }
+        },
+        {
+            # Add to every entry the most recent "IDLE" date of its feedUrl
+            "$setWindowFields": {
+                "partitionBy": "$feedUrl",
+                "output": {
+                    "latestIdleDate": {
+                        "$max": {
+                            "$cond": {
+                                "if": {"$eq": ["$status", "IDLE"]},
+                                "then": "$date",
+                                "else": None
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        {
+            "$group": {
+                "_id": "$feedUrl",
+                "errors": {
+                    "$sum": {
+                        "$cond": {
+                            "if": {"$eq": ["$status", "READING_ERROR"]},
+                            "then": 1,
+                            "else": 0
+                        }
+                    }
+                },
+                "earliestReadingErrorDate": {
+                    "$min": {
+                        "$cond": {
+                            "if": {"$eq": ["$status", "READING_ERROR_DURING_ATTEMPT"]},
+                            "then": "$date",
+                            "else": None
+                        }
+                    }
+                },
+                "latestIdleDate": {"$first": "$latestIdleDate"},
+                # The oldest "READING_ERROR_DURING_ATTEMPT" after the latest IDLE
+                "errorAfterIdleDate": {
+                    "$min": {
+                        "$cond": {
+                            "if": {
+                                "$and": [
+                                    {"$eq": ["$status", "READING_ERROR_DURING_ATTEMPT"]},
+                                    {"$gt": ["$date", "$latestIdleDate"]}
+                                ]
+                            },
+                            "then": "$date",
+                            "else": None
+                        }
+                    }
+                }
+            }
+        },
+        {
+            "$addFields": {
+                "errorDate": {
+                    "$cond": {
+                        "if": {"$eq": ["$latestIdleDate", None]},
+                        "then": "$earliestReadingErrorDate",
+                        "else": "$errorAfterIdleDate"
+                    }
+                }
+            }
+        }
+    ]
+
+
+def ensure_error_indexes(db, log_collection="feed_status_log"):
+    """
+    Create the compound index that supports the optimized pipeline's $match and
+    the per feed partition. Return the index name.
+    """
+    return db[log_collection].create_index([("feedUrl", 1), ("status", 1), ("date", 1)])
+
+
+def error_match_stage(error_days_ago):
+    return {
+        "$match": {
+            "errors": {"$gt": 0},  # Keep groups that have errors
+            "errorDate": {"$lte": error_days_ago}  # Filter groups where 'errorDate' is older than 'error_days_ago'
+        }
+    }
+
+
+def available_feed_stages(lookup="embedded"):
+    """
+    Join every feed URL with the 'feeds' collection, keep the available ones
+    and project the report fields (_id, errorDate, days_error).
+    With the "batched" lookup only the projection is added, the rows must go
+    through filter_available_feeds.
+    """
+    if lookup not in LOOKUP_STRATEGIES:
+        raise ValueError(f"Unknown lookup strategy '{lookup}', use one of {LOOKUP_STRATEGIES}")
+    if lookup == "batched":
+        return [report_project_stage()]
+
+    lookup_stage = {
+        "$lookup": {
+            "from": "feeds",
+            "localField": "_id",
+            "foreignField": "feedUrl",
+            "as": "feedInfo"
+        }
+    }
+    if lookup == "pipeline":
+        # Bring only the status of the (large) feeds documents, MongoDB 5.0+
+        lookup_stage["$lookup"]["pipeline"] = [{"$project": {"_id": 0, "status": 1}}]
+
+    return [
+        lookup_stage,
+        {
+            # Ensure there's a matching feedInfo document and its status is not "NOT_AVAILABLE"
+            "$match": {
+                "feedInfo": {"$ne": []},
+                "feedInfo.status": {"$ne": "NOT_AVAILABLE"}
+            }
+        },
+        {
+            "$unwind": "$feedInfo"
+        },
+        report_project_stage()
+    ]
+
+
+def report_project_stage():
+    return {
+        "$project": {
+            "_id": 1, # The feed URL
+            "errorDate": 1, # The calculated "date this error start"
+            "days_error": { # the day since this error start (example: 25 days)
+                "$dateDiff": {
+                    "startDate": "$errorDate",
+                    "endDate": "$$NOW",
+                    "unit": "day",
+                }
+            }
+        }
+    }
+
+
+def filter_available_feeds(db, rows, chunk_size=1000, feeds_collection="feeds"):
+    """
+    Keep the rows (with the feed URL in '_id') whose feed exists in 'feeds' and is
+    not NOT_AVAILABLE, asking for a whole chunk of URLs in one query. Same rows as
+    the $lookup stages: a URL with several feeds documents gives one row for each.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from _filter_available_chunk(db[feeds_collection], chunk)
+            chunk = []
+    if chunk:
+        yield from _filter_available_chunk(db[feeds_collection], chunk)
+
+
+def _filter_available_chunk(feeds, chunk):
+    # The NOT_AVAILABLE documents are read too: one of them drops the URL even if
+    # other documents of the same URL are available, as in the $lookup version
+    statuses = {}
+    for feed in feeds.find({"feedUrl": {"$in": [row["_id"] for row in chunk]}},
+                           {"_id": 0, "feedUrl": 1, "status": 1}):
+        statuses.setdefault(feed["feedUrl"], []).append(feed.get("status"))
+
+    for row in chunk:
+        feed_statuses = statuses.get(row["_id"], [])
+        if feed_statuses and "NOT_AVAILABLE" not in feed_statuses:
+            for _ in feed_statuses:
+                yield row
+
+
+def build_error_pipeline(error_days_ago, optimized=False, lookup="embedded"):
+    """
+    The aggregation pipeline translated from JavaScript to Python dictionary format.
+    Run it on feed_status_log. With 'optimized' it uses optimized_error_date_stages.
+    """
+    date_stages = optimized_error_date_stages() if optimized else error_date_stages()
+    return date_stages + [error_match_stage(error_days_ago)] + available_feed_stages(lookup)
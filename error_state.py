@@ -0,0 +1,128 @@
+# import libraries
+from error_pipeline import available_feed_stages, error_match_stage
+
+IDLE = "IDLE"
+READING_ERROR = "READING_ERROR"
+READING_ERROR_DURING_ATTEMPT = "READING_ERROR_DURING_ATTEMPT"
+
+STATE_COLLECTION = "feed_error_state"
+CHECKPOINT_COLLECTION = "feed_error_state_checkpoint"
+
+
+# --- Per feed state ---
+def new_feed_state(feed_url):
+    return {
+        "_id": feed_url,
+        "errors": 0,                   # number of READING_ERROR
+        "latestIdleDate": None,        # most recent IDLE
+        "earliestReadingErrorDate": None,  # oldest READING_ERROR_DURING_ATTEMPT (overall)
+        "errorAfterIdleDate": None,    # oldest READING_ERROR_DURING_ATTEMPT after latestIdleDate
+        "errorDate": None,
+        "lastId": None,
+        "lastDate": None,
+    }
+
+
+def fold_status_entry(state, status, date, entry_id=None):
+    """
+    Add one feed_status_log entry to the state of its feed.
+
+    The 'errorDate' is the same one the full aggregation calculates: the oldest
+    READING_ERROR_DURING_ATTEMPT after the latest IDLE, or the oldest overall if
+    there was no IDLE. The entries must be folded in log order (by _id).
+    """
+    if status == READING_ERROR:
+        state["errors"] += 1
+    elif date is None:
+        pass  # an IDLE or an attempt without date can't move the dates
+    elif status == IDLE:
+        if state["latestIdleDate"] is None or date > state["latestIdleDate"]:
+            state["latestIdleDate"] = date
+            # The errors before this IDLE don't count anymore
+            state["errorAfterIdleDate"] = None
+    elif status == READING_ERROR_DURING_ATTEMPT:
+        if state["earliestReadingErrorDate"] is None or date < state["earliestReadingErrorDate"]:
+            state["earliestReadingErrorDate"] = date
+        if state["latestIdleDate"] is None or date > state["latestIdleDate"]:
+            if state["errorAfterIdleDate"] is None or date < state["errorAfterIdleDate"]:
+                state["errorAfterIdleDate"] = date
+
+    if state["latestIdleDate"] is None:
+        state["errorDate"] = state["earliestReadingErrorDate"]
+    else:
+        state["errorDate"] = state["errorAfterIdleDate"]
+
+    if entry_id is not None:
+        state["lastId"] = entry_id
+    if date is not None and (state["lastDate"] is None or date > state["lastDate"]):
+        state["lastDate"] = date
+    return state
+
+
+# --- Side collection update ---
+def update_error_state(db, log_collection="feed_status_log", state_collection=STATE_COLLECTION,
+                       checkpoint_collection=CHECKPOINT_COLLECTION, chunk_size=5000):
+    """
+    Fold the feed_status_log entries newer than the last checkpoint into the
+    per feed state collection and move the checkpoint forward.
+    The first run reads the whole log, the next ones only the new entries.
+    Return the number of log entries processed.
+    """
+    from pymongo import ASCENDING
+
+    states = db[state_collection]
+    checkpoints = db[checkpoint_collection]
+    states.create_index([("errors", ASCENDING), ("errorDate", ASCENDING)])
+
+    checkpoint = checkpoints.find_one({"_id": log_collection}) or {}
+    query = {}
+    if checkpoint.get("lastId") is not None:
+        query["_id"] = {"$gt": checkpoint["lastId"]}
+
+    logCursor = db[log_collection].find(query, {"feedUrl": 1, "status": 1, "date": 1}) \
+        .sort("_id", ASCENDING).batch_size(chunk_size)
+
+    processed = 0
+    chunk = []
+    for entry in logCursor:
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            _fold_chunk(states, checkpoints, log_collection, chunk)
+            processed += len(chunk)
+            chunk = []
+    if chunk:
+        _fold_chunk(states, checkpoints, log_collection, chunk)
+        processed += len(chunk)
+
+    return processed
+
+
+def _fold_chunk(states, checkpoints, log_collection, chunk):
+    # Load the state of the feeds in this chunk, fold the entries and save them back
+    from pymongo import ReplaceOne
+
+    feed_urls = list({entry.get("feedUrl") for entry in chunk})
+    current = {state["_id"]: state for state in states.find({"_id": {"$in": feed_urls}})}
+
+    for entry in chunk:
+        feed_url = entry.get("feedUrl")
+        state = current.get(feed_url)
+        if state is None:
+            state = current[feed_url] = new_feed_state(feed_url)
+        fold_status_entry(state, entry.get("status"), entry.get("date"), entry["_id"])
+
+    states.bulk_write([ReplaceOne({"_id": state["_id"]}, state, upsert=True) for state in current.values()],
+                      ordered=False)
+
+    # The checkpoint only moves after the states are saved
+    last = chunk[-1]
+    checkpoints.replace_one({"_id": log_collection},
+                            {"_id": log_collection, "lastId": last["_id"], "lastDate": last.get("date")},
+                            upsert=True)
+
+
+def incremental_error_pipeline(error_days_ago, lookup="embedded"):
+    """
+    Same output as build_error_pipeline, but run on the state collection.
+    """
+    return [error_match_stage(error_days_ago)] + available_feed_stages(lookup)
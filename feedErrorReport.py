@@ -1,52 +1,175 @@
 # import libraries
-from pymongo import MongoClient
+# pymongo, requests and pandas are imported by the functions that use them, so
+# importing this module (or running it with --help) stays fast
 from datetime import datetime, timedelta
-import openpyxl
-import requests
-from requests.exceptions import ConnectionError, Timeout, RequestException
-import pandas as pd
+import argparse
+import sys
+import time
+from report_writer import REPORT_FORMATS, open_report_writer, report_file_name
+from probe_cache import ProbeCache, probe_mode
+from error_pipeline import LOOKUP_STRATEGIES, build_error_pipeline, error_records, filter_available_feeds
+from error_state import STATE_COLLECTION, incremental_error_pipeline, update_error_state
+from sharded_search import shard_boundaries, sharded_aggregate
+from live_tracker import LiveErrorTracker
+from run_journal import JournalError, RunJournal, check_journal
+from feed_probe import interrupted_results
+from run_metrics import LOG_LEVELS, RunMetrics, UrlLog
+
+# URI to connect to
+MONGO_URI = 'mongodb+srv://r_personal:link' # Replace whit your srv link
+
+# Journal of a run started with a bare --journal (or resumed with --resume)
+JOURNAL_PATH = "report_journal.jsonl"
 
 # --- Web Request Function ---
-def feed_error_type(feed_url: str) -> str:
+def feed_error_type(feed_url: str, session=None) -> str:
     """
     Try to search the feed URl and determine the error by it HTTP state.
+    The redirects are followed, not reported.
     """
-    try:
-        # Create a User-Agent to simulate a browser
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(feed_url, timeout=10, allow_redirects=True, headers=headers)
-
-        sCode = response.status_code
-
-        # If the code is 200 it could be html or have some error on the xml
-        content_type = response.headers.get("Content-Type", "").lower()
-        if sCode == 200:
-            if "text/html" in content_type:
-                return "HTML_FORMAT"
-            return "NOT_VALIDATED"
-        else:
-            return "ERROR_"+str(sCode) # return the error code
-
-    # Other posible error if we can't reach the feed URL
-    except ConnectionError:
-        return "CONNECTION_ERROR"
-    except Timeout:
-        return "TIMEOUT_ERROR"
-    except RequestException as e:
-        return f"REQUEST_FAILED: {type(e).__name__}"
-    except Exception as e:
-        return f"UNKNOWN_ERROR: {type(e).__name__}"
-        
-
-def GenerateErrors(days = 24):
+    from feed_probe import feed_error_type as probe_error_type
+
+    return probe_error_type(feed_url, session=session, report_redirects=False)
+
+
+ERROR_REPORT_HEADERS = [
+    "Feed_URL",
+    "Error_Start_Date",
+    "Days_Since_Error_Start",
+    "Error_type"
+]
+
+# Arrow types of the report columns (the parquet report keeps them even if the first rows are empty)
+ERROR_REPORT_TYPES = {
+    "Feed_URL": "string",
+    "Error_Start_Date": "timestamp[us]",
+    "Days_Since_Error_Start": "int64",
+    "Error_type": "string",
+    "From_Cache": "bool",
+    "Bucket": "int64",
+}
+
+
+def error_report_headers(cache_path=None, buckets=None):
+    """
+    Return the columns of the rows given by search_error_rows.
+    """
+    headers = list(ERROR_REPORT_HEADERS)
+    if cache_path:
+        headers.append("From_Cache")
+    if buckets:
+        headers.append("Bucket")
+    return headers
+
+
+def error_bucket(error_date, bucket_limits):
+    """
+    Return the largest bucket (days) whose limit the error date is older than,
+    or None. 'bucket_limits' is a list of (days, limit date) from the largest days.
+    """
+    if error_date is None:
+        return None
+    for bucket, limit in bucket_limits:
+        if error_date <= limit:
+            return bucket
+    return None
+
+
+def journal_settings(days, buckets=None, cache_path=None):
+    """
+    Return the settings saved with the journal of a run, which a resumed run
+    must have too. With 'buckets', 'days' is the smallest of them.
+    """
+    if buckets:
+        buckets = sorted(set(buckets))
+        days = buckets[0]
+    return {"days": days, "buckets": buckets, "columns": error_report_headers(cache_path, buckets)}
+
+
+def report_days_label(days, buckets=None):
+    # "24" or, with buckets, "7-14-24-60" (used in the report file names)
+    return "-".join(str(bucket) for bucket in sorted(set(buckets))) if buckets else str(days)
+
+
+def search_error_rows(days = 24, concurrency = 1, max_per_host = 4, lightweight = False, max_bytes = 8192,
+                      cache_path = None, force_refresh = False, incremental = False, optimized = False,
+                      lookup = "embedded", streaming = False, batch_size = None, queue_size = 1000,
+                      shards = 1, shard_parallelism = 4, metrics = None, log_level = "info",
+                      connect_timeout = 10, read_timeout = 10, breaker_threshold = 0, adaptive_timeouts = False,
+                      rate_limit = None, rate_burst = 1, retries = 0, live_state = None, buckets = None,
+                      journal_path = None, resume = False, uri = MONGO_URI, report_redirects = False):
+    """
+    Search the feeds with errors older than 'days', probe them and yield one
+    row per feed (see error_report_headers), without writing any file.
+    'concurrency' is the number of URLs probed at the same time (1 = one by
+    one) and 'max_per_host' the limit for a single host.
+    With 'lightweight' the feeds are classified with a HEAD request (or a GET
+    that reads at most 'max_bytes') instead of downloading them.
+    With 'cache_path' the results are kept in a SQLite cache and the URLs
+    checked recently are not probed again ('force_refresh' probes them all).
+    With 'incremental' only the log entries added since the last run are read
+    (see error_state.update_error_state). With 'optimized' the search uses the
+    pipeline without per feed date arrays (see error_pipeline.optimized_error_date_stages).
+    'lookup' is how the feeds are joined with the 'feeds' collection:
+    "embedded", "pipeline" or "batched" (see error_pipeline).
+    With 'streaming' reading the cursor and probing overlap with the consumer
+    of the rows, joined by queues of 'queue_size' rows (see stream_pipeline).
+    'batch_size' is the batchSize of the aggregation cursor. With 'shards' > 1
+    the feedUrl keyspace is split into that many ranges and the search runs on
+    'shard_parallelism' of them at the same time (see sharded_search).
+    The stage timings, probe latencies and counters are added to 'metrics'
+    (a run_metrics.RunMetrics) and 'log_level' sets the URL lines printed
+    ("debug", "info" or "warning", see run_metrics.UrlLog).
+    'connect_timeout' and 'read_timeout' are the seconds a probe waits. With
+    'breaker_threshold' > 0 the URLs of a host are not probed any more after
+    that many consecutive connection errors or timeouts (and one confirmation
+    probe), and with 'adaptive_timeouts' the timeouts of every host follow its
+    latency (see feed_probe.HostHealth). 'rate_limit' is the maximum of probes
+    a second to one host (bursts of 'rate_burst'), and the 429/503 answers are
+    probed again up to 'retries' times, honoring their Retry-After.
+    With 'live_state' (the checkpoint file of live_tracker.py) the feeds come
+    from the state kept by the live tracker instead of a search in the log,
+    and only their join with 'feeds' is done here.
+    With 'buckets' (a list of days) the search and the probes run once, with
+    the smallest of them instead of 'days', and every row gets a 'Bucket'
+    column: the largest of the buckets its error is older than.
+    With 'journal_path' the feeds found and the rows probed are saved to a
+    journal as the run goes (see run_journal), and with 'resume' the run of
+    that journal goes on: its rows are yielded first, then only the feeds not
+    probed yet are (the search isn't repeated if it had finished).
+    'uri' is the MongoDB to search. With 'report_redirects' a redirected feed
+    is "REDIRECTED: <from> -> <to>" instead of the error type of its target.
+    Ctrl-C stops the search and yields the rows already probed (the last ones
+    out of order), also after a KeyboardInterrupt thrown in by the consumer.
+    """
+    from pymongo import MongoClient
+    from feed_probe import ProbeClient, probe_feeds
+
+    if metrics is None:
+        metrics = RunMetrics()
+    urlLog = UrlLog(log_level)
+
     # --- DATE TO USE ---
     # Connecting to the URI
-    client = MongoClient('mongodb+srv://r_personal:link') # Replace whit your srv link
+    client = MongoClient(uri, maxPoolSize=max(100, shard_parallelism))
 
     # Days the error needs to be older than
+    if buckets:
+        # One search for all the buckets, with the smallest one
+        buckets = sorted(set(buckets))
+        days = buckets[0]
     days_subtract = days # you can change the date
     now = datetime.now()
+
+    # The journal of the run, a resumed run keeps the dates of the run it goes on with
+    journal = None
+    if journal_path:
+        journal = RunJournal(journal_path, journal_settings(days, buckets, cache_path), resume=resume)
+        if journal.rows or journal.records:
+            print(f"Resuming the run started at {journal.started}: {len(journal.rows)} feeds already probed")
+        now = journal.started
     error_days_ago = now - timedelta(days=days_subtract)
+    bucketLimits = [(bucket, now - timedelta(days=bucket)) for bucket in reversed(buckets or [])]
 
     print(f"Filtering for errorDate (first error after last IDLE) older than: {error_days_ago}")
 
@@ -57,222 +180,351 @@ def GenerateErrors(days = 24):
     # Selecting the collection feed_status_log
     feedsStatusColeccion = db.feed_status_log
 
-    # The aggregation pipeline translated from JavaScript to Python dictionary format
-    aggregation_pipeline = [
-        {
-            "$group": {
-                # Select the feed URL that has at least one READING_ERROR
-                "_id": "$feedUrl",
-                "count": {"$sum": 1},
-                "errors": {
-                    "$sum": {
-                        "$cond": {
-                            "if": {"$eq": ["$status", "READING_ERROR"]},
-                            "then": 1,
-                            "else": 0
-                        }
-                    }
-                },
-                # This is the date of the oldest "READING_ERROR_DURING_ATTEMPT" found for this feedUrl (overall)
-                "earliestReadingErrorDate": {
-                    "$min": {
-                        "$cond": {
-                            "if": {"$eq": ["$status", "READING_ERROR_DURING_ATTEMPT"]},
-                            "then": "$date",
-                            "else": None
-                        }
-                    }
-                },
-                # Calculate the most recent "IDLE" date for this feedUrl
-                "latestIdleDate": {
-                    "$max": {
-                        "$cond": {
-                            "if": {"$eq": ["$status", "IDLE"]},
-                            "then": "$date",
-                            "else": None
-                        }
-                    }
-                },
-                # Collect all "READING_ERROR_DURING_ATTEMPT" dates into an array
-                "allReadingErrorDates": {
-                    "$push": {
-                        "$cond": {
-                            "if": {"$eq": ["$status", "READING_ERROR_DURING_ATTEMPT"]},
-                            "then": "$date",
-                            "else": "$$REMOVE"
-                        }
-                    }
-                }
-            }
-        },
-        {
-            # Calculate 'errorDate' based on aggregated values from the previous group
-            "$addFields": {
-                # 'errorDate' will be the ldest READING_ERROR_ATTEMPT date after the latest IDLE,
-                # or the oldest overall READING_ERROR_ATTEMPT if no IDLE occurred.
-                "errorDate": {
-                    "$cond": {
-                        "if": {"$eq": ["$latestIdleDate", None]}, 
-                        "then": "$earliestReadingErrorDate",      
-                        "else": {  
-                            "$min": {  
-                                "$filter": {  
-                                    "input": "$allReadingErrorDates",
-                                    "as": "errDate",
-                                    "cond": {"$gt": ["$$errDate", "$latestIdleDate"]}
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        },
-        {
-            # 
-            "$match": {
-                "errors": {"$gt": 0},  # Keep groups that have errors
-                "errorDate": {"$lte": error_days_ago}  # Filter groups where 'errorDate' is older than 'error_days_ago'
-            }
-        },
-        {
-            "$lookup": {
-                "from": "feeds",
-                "localField": "_id",
-                "foreignField": "feedUrl",
-                "as": "feedInfo"
-            }
-        },
-        {
-            # Ensure there's a matching feedInfo document and its status is not "NOT_AVAILABLE"
-            "$match": {
-                "feedInfo": {"$ne": []},
-                "feedInfo.status": {"$ne": "NOT_AVAILABLE"}
-            }
-        },
-        {
-            "$unwind": "$feedInfo"
-        },
-        {
-            "$project": {
-                "_id": 1, # The feed URL
-                "errorDate": 1, # The calculated "date this error start"
-                "days_error": { # the day since this error start (example: 25 days)
-                    "$dateDiff": {
-                        "startDate": "$errorDate",
-                        "endDate": "$$NOW",
-                        "unit": "day",
-                    }
-                }
-            }
-        }
-    ]
-    # Process the search in the DB
-    errorCursor = feedsStatusColeccion.aggregate(aggregation_pipeline)
-
-    # --- Save everything to an Excel file ---
-    wb = openpyxl.Workbook() # Create a new Excel workbook
-    ws = wb.active # Select the active sheet
-    ws.title = "Error_Feeds"
+    searchDone = journal is not None and journal.search_done
+    if searchDone:
+        # The search of the resumed run had finished, its feeds are in the journal
+        errorCursor = journal.pending_records()
+        print(f"The search was already done, {len(errorCursor)} of its {len(journal.records)} feeds left to probe")
+    elif live_state:
+        # The live tracker already has the errorDate of every feed, only the join with 'feeds' is left
+        with metrics.stage("state_load"):
+            tracker = LiveErrorTracker.from_checkpoint(live_state)
+            liveRows = tracker.error_rows(error_days_ago)
+        print(f"Live state: {len(liveRows)} of {len(tracker.states)} feeds with errors older than {days} days")
+        errorCursor = filter_available_feeds(db, liveRows)
+    else:
+        if incremental:
+            # Fold only the new log entries into the per feed state and search on it
+            with metrics.stage("state_update"):
+                processed = update_error_state(db)
+            print(f"Incremental error state updated with {processed} new log entries")
+            searchCollection = db[STATE_COLLECTION]
+            shardField = "_id"
+            aggregation_pipeline = incremental_error_pipeline(error_days_ago, lookup=lookup)
+        else:
+            searchCollection = feedsStatusColeccion
+            shardField = "feedUrl"
+            aggregation_pipeline = build_error_pipeline(error_days_ago, optimized=optimized, lookup=lookup)
+
+        # Process the search in the DB
+        aggregationStart = time.perf_counter()
+        if shards > 1:
+            # One cursor per feedUrl range, merged as the rows arrive
+            boundaries = shard_boundaries(searchCollection, shards, field=shardField)
+            print(f"Searching {len(boundaries) + 1} feedUrl ranges, {shard_parallelism} at the same time")
+            errorCursor = sharded_aggregate(searchCollection, aggregation_pipeline, boundaries, field=shardField,
+                                            parallelism=shard_parallelism, batch_size=batch_size)
+        else:
+            aggregate_options = {"batchSize": batch_size} if batch_size else {}
+            errorCursor = searchCollection.aggregate(aggregation_pipeline, **aggregate_options)
+        metrics.add_time("aggregation", time.perf_counter() - aggregationStart)
+        errorCursor = metrics.first_item(errorCursor, "first_batch", aggregationStart)
+        if lookup == "batched":
+            # The join with 'feeds' is done here, one query per chunk of URLs
+            errorCursor = filter_available_feeds(db, errorCursor)
 
-    # -- Write the headers
-    headers = [
-        "Feed_URL",
-        "Error_Start_Date",
-        "Days_Since_Error_Start",
-        "Error_type"
-    ]
-    ws.append(headers)
-
-    # -- Write the data to the Excel file
     print("\nInitiating web requests for 'Error_type' determination...")
 
-    for element in errorCursor:
-        feed_url = element["_id"]
-        calculated_error_start_date = element.get("errorDate")
-        days_since_error_start = element.get("days_error")
-
-        # --- Determine the error_type by making a web request ---
-        error_type = feed_error_type(feed_url)
-        print(f"  Processing URL: {feed_url} -> Error Type: {error_type}")
-
-        # Add a row with the data to Excel
-        ws.append([
+    if not searchDone:
+        # Only the report fields of every cursor document are kept while it's probed
+        errorCursor = error_records(errorCursor)
+        if journal is not None:
+            # Every feed found is saved to the journal, the ones probed before are skipped
+            errorCursor = journal.track_search(errorCursor)
+
+    # --- Determine the error_type by making the web requests (in the cursor's order) ---
+    # All the probes share one keep-alive client, so feeds on the same host reuse the connection
+    probeClient = ProbeClient(max_hosts=max(100, concurrency), max_per_host=max_per_host,
+                              report_redirects=report_redirects,
+                              lightweight=lightweight, max_bytes=max_bytes,
+                              connect_timeout=connect_timeout, read_timeout=read_timeout,
+                              breaker_threshold=breaker_threshold, adaptive_timeouts=adaptive_timeouts,
+                              on_probe=metrics.observe_probe, rate_limit=rate_limit, rate_burst=rate_burst,
+                              retries=retries)
+    probe = probeClient.feed_error_type
+
+    # The results checked recently come from the cache instead of a new request
+    probeCache = None
+    if cache_path:
+        probeCache = ProbeCache(cache_path, force_refresh=force_refresh,
+                                mode=probe_mode(lightweight, report_redirects=report_redirects, max_bytes=max_bytes))
+        # The results of the hosts skipped by the breaker aren't saved, the feeds weren't probed
+        probe = probeCache.cached(probe, keep=probeClient.probed)
+
+    if streaming:
+        from stream_pipeline import StreamingPipeline
+
+        # Cursor reader and probe workers run at the same time as the consumer of the rows
+        probedCursor = StreamingPipeline(errorCursor, probe,
+                                         key=lambda record: record.feed_url,
+                                         workers=concurrency,
+                                         max_per_host=max_per_host,
+                                         queue_size=queue_size)
+    else:
+        probedCursor = probe_feeds(errorCursor, probe,
+                                   key=lambda record: record.feed_url,
+                                   max_workers=concurrency,
+                                   max_per_host=max_per_host)
+
+    def make_row(record, result):
+        feed_url = record.feed_url
+        calculated_error_start_date = record.error_date
+        days_since_error_start = record.days_error
+
+        row = [
             feed_url,
             calculated_error_start_date,
-            days_since_error_start,
-            error_type
-        ])
+            days_since_error_start
+        ]
+        if probeCache:
+            error_type, from_cache = result
+            row += [error_type, from_cache]
+        else:
+            error_type = result
+            row.append(error_type)
+        if buckets:
+            row.append(error_bucket(calculated_error_start_date, bucketLimits))
 
-    # --- Save the Excel file ---
-    fecha_str = now.strftime("%Y%m%d")
-    excel_file_name = f"{str(days_subtract)}Days_{fecha_str}.xlsx"
-    wb.save(excel_file_name)
+        urlLog.url(feed_url, error_type)
+        metrics.count("rows")
+        if journal is not None:
+            journal.add_row(row)
+        return row
 
-    print(f"\nData saved successfully to '{excel_file_name}'")
+    try:
+        try:
+            # The rows probed by the run that is resumed
+            if journal is not None:
+                for row in journal.rows:
+                    metrics.count("resumed_rows")
+                    yield row
+
+            # 'probing' is the time waiting for the probed rows (the cursor and the probes),
+            # not the time the consumer spends with them
+            waitStart = time.perf_counter()
+            for record, result in probedCursor:
+                metrics.add_time("probing", time.perf_counter() - waitStart)
+                yield make_row(record, result)
+                waitStart = time.perf_counter()
+            if journal is not None:
+                journal.finish()
+        except KeyboardInterrupt:
+            # Ctrl-C: stop searching but keep everything probed so far
+            print("\nInterrupted, keeping the feeds already probed...")
+            if streaming:
+                probedCursor.stop()
+                interruptedRows = probedCursor.drain()
+            else:
+                # The probes that finished but were waiting for the ones before them
+                interruptedRows = interrupted_results(probedCursor)
+            for record, result in interruptedRows:
+                yield make_row(record, result)
+    finally:
+        if streaming:
+            probedCursor.stop()
+        urlLog.close()
+        if journal is not None:
+            journal.close()
+
+        stats = probeClient.connection_stats()
+        probeClient.close()
+        print(f"\nHTTP requests: {stats['requests']} (connections opened: {stats['opened']}, reused: {stats['reused']})")
+        metrics.count("http_requests", stats["requests"])
+        metrics.count("connections_opened", stats["opened"])
+        metrics.count("connections_reused", stats["reused"])
+        metrics.count("redirects", stats["redirects"])
+        metrics.count("short_circuited", stats["short_circuited"])
+        metrics.count("retries", stats["retries"])
+        if stats["short_circuited"]:
+            print(f"Hosts skipped after repeated failures: {stats['open_hosts']} "
+                  f"({stats['short_circuited']} URLs not probed)")
+
+        if probeCache:
+            cacheStats = probeCache.stats()
+            probeCache.close()
+            print(f"Probe cache: {cacheStats['hits']} hits, {cacheStats['misses']} misses "
+                  f"({cacheStats['expired']} expired, {cacheStats['evicted']} evicted)")
+            metrics.count("cache_hits", cacheStats["hits"])
+            metrics.count("cache_misses", cacheStats["misses"])
+
+        # Close the connection
+        client.close()
+        print("\nConnection to MongoDB closed.")
+
+
+def GenerateErrors(days = 24, output_format = "xlsx", metrics = None, **search_kwargs):
+    """
+    Search the feeds with errors older than 'days' and save them, with their
+    error type, to a report file ('output_format': "xlsx", "csv" or "parquet").
+    With 'buckets' every row has its bucket, and the xlsx also has a sheet per
+    bucket with the rows a run with that 'days' would give.
+    'search_kwargs' are the options of search_error_rows. The time spent
+    writing is added to 'metrics' as the 'writing' stage. Ctrl-C stops the
+    run and saves the rows already probed, and so does an error of the search
+    or the probes, which is raised after saving them. A journal that can't be
+    resumed raises run_journal.JournalError before the report file is opened.
+    """
+    if metrics is None:
+        metrics = RunMetrics()
+    buckets = search_kwargs.get("buckets")
+
+    if search_kwargs.get("resume") and search_kwargs.get("journal_path"):
+        # A journal that can't be resumed fails here, before the report file is replaced
+        check_journal(search_kwargs["journal_path"],
+                      journal_settings(days, buckets, search_kwargs.get("cache_path")))
+
+    # --- Save everything to the report file (xlsx, csv or parquet), row by row ---
+    fecha_str = datetime.now().strftime("%Y%m%d")
+    excel_file_name = report_file_name(f"{report_days_label(days, buckets)}Days_{fecha_str}", output_format)
 
-    # Close the connection
-    client.close()
-    print("\nConnection to MongoDB closed.")
+    # -- Write the headers
+    headers = error_report_headers(search_kwargs.get("cache_path"), buckets)
+    reportWriter = open_report_writer(excel_file_name, headers, output_format, sheet_title="Error_Feeds",
+                                      column_types=ERROR_REPORT_TYPES)
+    bucketSheets = []
+    if buckets and output_format == "xlsx":
+        # A sheet per bucket, with the rows a run with that 'days' would give
+        bucketSheets = [(bucket, reportWriter.add_sheet(f"Older_than_{bucket}_days", headers))
+                        for bucket in sorted(set(buckets))]
+    bucketRows = {bucket: 0 for bucket in sorted(set(buckets or []))}
+
+    # -- Write the data to the report file
+    def write_row(row):
+        # Add a row with the data to the report
+        writeStart = time.perf_counter()
+        reportWriter.append(row)
+        # ...and to the sheet of every bucket its error is older than
+        rowBucket = row[-1] if buckets else None
+        for bucket, sheet in bucketSheets:
+            if rowBucket is not None and rowBucket >= bucket:
+                sheet.append(row)
+        metrics.add_time("writing", time.perf_counter() - writeStart)
+        for bucket in bucketRows:
+            if rowBucket is not None and rowBucket >= bucket:
+                bucketRows[bucket] += 1
+
+    errorRows = search_error_rows(days, metrics=metrics, **search_kwargs)
+    try:
+        for row in errorRows:
+            write_row(row)
+    except KeyboardInterrupt:
+        # Ctrl-C while writing: save everything written so far and the rows already probed
+        print("\nInterrupted, saving the feeds already probed...")
+        for row in interrupted_results(errorRows):
+            write_row(row)
+    except Exception:
+        # The search or the probes failed: save everything written so far, then raise the error
+        print("\nThe run failed, saving the feeds already probed...")
+        errorRows.close()
+        with metrics.stage("writing"):
+            reportWriter.close()
+        print(f"Partial report saved to '{excel_file_name}'")
+        raise
+
+    # --- Save the report file ---
+    with metrics.stage("writing"):
+        reportWriter.close()
+
+    print(f"\nData saved successfully to '{excel_file_name}'")
+    for bucket, count in bucketRows.items():
+        print(f"  Errors older than {bucket} days: {count}")
 
     # Return the file name, to searche the file
     return excel_file_name
 
-'''========================================================================================'''
 
-def join_feed_customer_data(main_file_path,
-                            main_join_column,
-                            customer_file_path,
-                            customer_join_column,
-                            output_file_path):
+# Options of search_error_rows given on the command line (add_search_arguments)
+SEARCH_ARGUMENTS = ("days", "buckets", "concurrency", "max_per_host", "lightweight", "cache_path", "force_refresh",
+                    "incremental", "optimized", "lookup", "streaming", "batch_size", "shards", "shard_parallelism",
+                    "connect_timeout", "read_timeout", "breaker_threshold", "adaptive_timeouts", "rate_limit",
+                    "rate_burst", "retries", "live_state", "journal_path", "resume", "log_level")
 
-    try:
-        # Log the main file
-        df_main = pd.read_excel(main_file_path, header=0)
-        print(f"'{main_file_path}' log successfull. Columns: {df_main.columns.tolist()}")
-
-        # Log the customer file
-        df_customer = pd.read_excel(customer_file_path, header=0)
-        print(f"'{customer_file_path}' log successfull. Columns: {df_customer.columns.tolist()}")
-
-        # Verify if join columns exists in both file
-        if main_join_column not in df_main.columns:
-            raise ValueError(f"The join column '{main_join_column}' doesn't found on '{main_file_path}'.")
-        if customer_join_column not in df_customer.columns:
-            raise ValueError(f"The join column '{customer_join_column}' doesn't found on '{customer_file_path}'. ")
-
-        # --- Realize an INNER JOIN on the files ---
-        df_combined = pd.merge(df_main, df_customer,
-                               left_on=main_join_column,
-                               right_on=customer_join_column,
-                               how='inner')
-
-        # --- Manage the duplicated URL columns ---
-        if main_join_column != customer_join_column and customer_join_column in df_combined.columns:
-            df_combined = df_combined.drop(columns=[customer_join_column]) # keep only one URL column
-
-        # Save the result on a new excel file
-        df_combined.to_excel(output_file_path, index=False)
-        print(f"\nData join save successfully on the file '{output_file_path}'.")
-        print(f"Columns: {df_combined.columns.tolist()}")
-        print(f"Rows: {len(df_combined)}")
-
-
-    except FileNotFoundError as e:
-        print(f"Error: Uno de los archivos no fue encontrado. Por favor, verifica la ruta: {e}")
-    except ValueError as e:
-        print(f"Error en la columna de unión: {e}")
-    except Exception as e:
-        print(f"Ocurrió un error inesperado: {e}")
+
+def add_search_arguments(parser, cache_path="feed_error_report_cache.sqlite3"):
+    """
+    Add the command line options of search_error_rows to an argparse parser,
+    with the defaults of search_error_rows. 'cache_path' is the probe cache
+    file of the script, used with a bare --cache.
+    """
+    import inspect
+
+    parser.add_argument("--days", type=int, help="days the error needs to be older than")
+    parser.add_argument("--buckets", type=int, nargs="+",
+                        help="several days thresholds (e.g. 7 14 24 60) searched and probed once, instead of --days")
+    parser.add_argument("--concurrency", type=int, help="URLs probed at the same time")
+    parser.add_argument("--max-per-host", type=int, help="URLs probed at the same time on one host")
+    parser.add_argument("--lightweight", action="store_true", help="classify the feeds without downloading them")
+    parser.add_argument("--cache", dest="cache_path", nargs="?", const=cache_path,
+                        help=f"keep the probe results in a cache file (this one or {cache_path})")
+    parser.add_argument("--force-refresh", action="store_true", help="probe every URL, ignoring the cache")
+    parser.add_argument("--incremental", action="store_true", help="read only the log entries added since the last run")
+    parser.add_argument("--optimized", action="store_true", help="use the pipeline without per feed date arrays")
+    parser.add_argument("--lookup", choices=LOOKUP_STRATEGIES, help="how to join with 'feeds'")
+    parser.add_argument("--streaming", action="store_true", help="overlap the cursor, the probes and the writing")
+    parser.add_argument("--batch-size", type=int, help="batchSize of the aggregation cursor")
+    parser.add_argument("--shards", type=int, help="feedUrl ranges searched as separate aggregations")
+    parser.add_argument("--shard-parallelism", type=int, help="feedUrl ranges searched at the same time")
+    parser.add_argument("--connect-timeout", type=float, help="seconds to wait for a connection")
+    parser.add_argument("--read-timeout", type=float, help="seconds to wait for an answer")
+    parser.add_argument("--breaker", dest="breaker_threshold", type=int,
+                        help="skip a host after this many consecutive connection errors/timeouts (0 = never)")
+    parser.add_argument("--adaptive-timeouts", action="store_true", help="adapt the timeouts to every host's latency")
+    parser.add_argument("--rate-limit", type=float, help="maximum probes a second to one host")
+    parser.add_argument("--rate-burst", type=int, help="probes one host can get at once")
+    parser.add_argument("--retries", type=int, help="times a 429/502/503/504 answer is probed again")
+    parser.add_argument("--live-state",
+                        help="take the feeds from the state file of live_tracker.py instead of searching the log")
+    parser.add_argument("--journal", dest="journal_path", nargs="?", const=JOURNAL_PATH,
+                        help=f"keep a journal of the run (this file or {JOURNAL_PATH}), to go on with it with --resume")
+    parser.add_argument("--resume", action="store_true",
+                        help="go on with the run of --journal, probing only the feeds it didn't probe")
+    parser.add_argument("--log-level", choices=LOG_LEVELS,
+                        help="URL lines: all (debug), a few per second (info) or none (warning)")
+    parser.add_argument("--metrics", default="run_metrics.json", help="JSON metrics file ('' to disable)")
+    parser.add_argument("--prometheus", default=None, help="also save the metrics as a Prometheus text file")
+
+    # The defaults are taken from search_error_rows, so they can't drift apart
+    parameters = inspect.signature(search_error_rows).parameters
+    parser.set_defaults(**{name: parameters[name].default for name in SEARCH_ARGUMENTS})
+    return parser
+
+
+def search_options(args):
+    """
+    Return the keyword arguments of search_error_rows (but 'days') from the
+    options parsed with add_search_arguments.
+    """
+    options = {name: getattr(args, name) for name in SEARCH_ARGUMENTS if name != "days"}
+    if options["resume"] and not options["journal_path"]:
+        # --resume alone goes on with the default journal
+        options["journal_path"] = JOURNAL_PATH
+    return options
 
 if __name__ == "__main__":
-    errorFileName = GenerateErrors(24)
+    from Join import join_feed_customer_data
+
+    parser = argparse.ArgumentParser(description="Generate the feed errors report and join it with the customers.")
+    add_search_arguments(parser)
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="xlsx", help="format of the errors report")
+    args = parser.parse_args()
+
+    runMetrics = RunMetrics()
+    try:
+        errorFileName = GenerateErrors(args.days, output_format=args.format, metrics=runMetrics,
+                                       **search_options(args))
+    except JournalError as e:
+        sys.exit(str(e))
     now = datetime.now()
     fecha_str = now.strftime("%Y%m%d")
 
-    join_feed_customer_data(
-        main_file_path=errorFileName, # Feed whit their error
-        main_join_column="Feed_URL",
-        customer_file_path="Group_feed_url.xlsx", # Feed whit customer group by feed_url
-        customer_join_column="feed_url",
-        output_file_path=f"{fecha_str}final_report.xlsx" # Name of the resulting file
-    )
\ No newline at end of file
+    with runMetrics.stage("join"):
+        join_feed_customer_data(
+            main_file_path=errorFileName, # Feed whit their error
+            main_join_column="Feed_URL",
+            customer_file_path="Group_feed_url.xlsx", # Feed whit customer group by feed_url
+            customer_join_column="feed_url",
+            output_file_path=f"{fecha_str}final_report.xlsx", # Name of the resulting file
+            normalize_urls=True, # Match the URLs that only differ by scheme, case, trailing slash...
+            use_sidecars=True # Keep the customer URL index next to the customer file
+        )
+    runMetrics.save(args.metrics, args.prometheus)
\ No newline at end of file
@@ -0,0 +1,25 @@
+# --- Error types of a probed feed ---
+# Shared by feed_probe (requests) and async_probe (asyncio), so it only uses the
+# standard library and both give the same classification strings.
+
+# Create a User-Agent to simulate a browser
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+
+def classify_answer(status_code, content_type="", redirect_from=None, redirect_to=None) -> str:
+    """
+    Turn the final answer of a probe into the error type. 'redirect_from' is
+    the URL of the last redirecting response and 'redirect_to' the final URL,
+    only when the redirects are reported.
+    """
+    # Check for redirects
+    if redirect_from is not None:
+        return f"REDIRECTED: {redirect_from} -> {redirect_to}"
+
+    # If the code is 200 it could be html or have some error on the xml
+    if status_code == 200:
+        if "text/html" in (content_type or "").lower():
+            return "HTML_FORMAT"
+        return "NOT_VALIDATED"
+    else:
+        return "ERROR_"+str(status_code) # return the error code
@@ -0,0 +1,557 @@
+# import libraries
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+
+from feed_classify import DEFAULT_HEADERS, classify_answer
+
+
+def feed_host(feed_url: str) -> str:
+    """
+    Return the host (with port) of a feed URL, used to group the probes by origin.
+    """
+    try:
+        return urlsplit(feed_url).netloc.lower()
+    except (AttributeError, ValueError):
+        return ""
+
+
+# --- Web Request Function ---
+def _classify_response(response, report_redirects=True) -> str:
+    # Turn the final response of a probe (and its redirect chain) into the error type
+    if report_redirects and response.history:
+        # The last response in history is the one that redirected to the final URL
+        return classify_answer(response.status_code, redirect_from=response.history[-1].url,
+                               redirect_to=response.url)
+    return classify_answer(response.status_code, response.headers.get("Content-Type", ""))
+
+
+def _probe_light(http, feed_url, timeout, headers, report_redirects, max_bytes):
+    # HEAD first: a 200 with a Content-Type (or a redirect we report) is enough to classify
+    response = http.head(feed_url, timeout=timeout, allow_redirects=True, headers=headers)
+    response.close()
+    if (report_redirects and response.history) or (response.status_code == 200 and "Content-Type" in response.headers):
+        return _classify_response(response, report_redirects)
+
+    # Some servers don't answer HEAD like GET, so ask again only for the headers
+    # and at most 'max_bytes' of the body
+    response = http.get(feed_url, timeout=timeout, allow_redirects=True, headers=headers, stream=True)
+    try:
+        length = response.headers.get("Content-Length", "")
+        if max_bytes > 0 and not (length.isdigit() and int(length) > max_bytes):
+            # Reading a small body to the end gives the connection back to the pool
+            read = 0
+            for chunk in response.iter_content(chunk_size=min(max_bytes, 16384)):
+                read += len(chunk)
+                if read >= max_bytes:
+                    break
+        return _classify_response(response, report_redirects)
+    finally:
+        response.close()
+
+
+def feed_error_type(feed_url: str, session=None, timeout=10, report_redirects=True,
+                    lightweight=False, max_bytes=8192) -> str:
+    """
+    Try to search the feed URl and determine the error by it HTTP state.
+    Use 'session' (a requests.Session or a ProbeClient session) to reuse the connections.
+    With 'report_redirects' a redirected feed returns "REDIRECTED: <from> -> <to>".
+    With 'lightweight' the feed isn't downloaded: it tries a HEAD request first and
+    falls back to a streamed GET that reads at most 'max_bytes' of the body.
+    """
+    import requests
+    from requests.exceptions import ConnectionError, Timeout, RequestException
+
+    http = session if session is not None else requests
+    try:
+        headers = None if session is not None else DEFAULT_HEADERS # the session already has them
+        if lightweight:
+            return _probe_light(http, feed_url, timeout, headers, report_redirects, max_bytes)
+
+        response = http.get(feed_url, timeout=timeout, allow_redirects=True, headers=headers)
+        return _classify_response(response, report_redirects)
+
+    # Other posible error if we can't reach the feed URL
+    except ConnectionError:
+        return "CONNECTION_ERROR"
+    except Timeout:
+        return "TIMEOUT_ERROR"
+    except RequestException as e:
+        return f"REQUEST_FAILED: {type(e).__name__}"
+    except Exception as e:
+        return f"UNKNOWN_ERROR: {type(e).__name__}"
+
+
+# --- Shared probing client ---
+class _ConnectionCounter:
+    """
+    Thread safe counters of the connections opened, the requests sent and the
+    redirects followed by a ProbeClient.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.requests = 0
+        self.redirects = 0
+        self.retries = 0
+
+    def add(self, opened=0, requests=0, redirects=0, retries=0):
+        with self.lock:
+            self.opened += opened
+            self.requests += requests
+            self.redirects += redirects
+            self.retries += retries
+
+
+def _counting_pool(pool_class, counter):
+    # Connection pool that reports every new connection and every request to 'counter'
+    class CountingPool(pool_class):
+        def _new_conn(self):
+            counter.add(opened=1)
+            return super()._new_conn()
+
+        def urlopen(self, *args, **kwargs):
+            counter.add(requests=1)
+            return super().urlopen(*args, **kwargs)
+
+    return CountingPool
+
+
+def _counting_adapter(counter, **kwargs):
+    # requests adapter whose connection pools report to 'counter' (requests is loaded here, not at import)
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class CountingAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": _counting_pool(HTTPConnectionPool, counter),
+                "https": _counting_pool(HTTPSConnectionPool, counter),
+            }
+
+    return CountingAdapter(**kwargs)
+
+
+# --- Per host health: circuit breaker and adaptive timeouts ---
+HOST_FAILURES = ("CONNECTION_ERROR", "TIMEOUT_ERROR")
+
+
+class HostHealth:
+    """
+    Thread safe health of every host probed by a ProbeClient.
+
+    Circuit breaker: after 'threshold' consecutive CONNECTION_ERROR/TIMEOUT_ERROR
+    results on a host (plus one more, the confirmation probe, with 'confirm') the
+    rest of its URLs get the last of those errors without a request.
+    A result that isn't one of them resets the count. 'threshold' 0 disables it.
+
+    Adaptive timeouts: with 'adaptive' the connect and read timeouts of a host
+    become 'timeout_factor' times its average latency (once 'min_samples'
+    answers were seen), never less than 'min_timeout' nor more than the
+    configured 'connect_timeout' and 'read_timeout'.
+    """
+    def __init__(self, connect_timeout=10, read_timeout=10, threshold=0, confirm=True, adaptive=False,
+                 min_timeout=2, timeout_factor=4, min_samples=3):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.threshold = threshold
+        self.confirm = confirm
+        self.adaptive = adaptive
+        self.min_timeout = min_timeout
+        self.timeout_factor = timeout_factor
+        self.min_samples = min_samples
+
+        self.lock = threading.Lock()
+        self.hosts = {}
+        self.short_circuited = 0
+
+    def _state(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = {"failures": 0, "last_failure": None, "open": False,
+                                        "latency": None, "samples": 0}
+        return state
+
+    def short_circuit(self, host):
+        """
+        Return the error type of a URL on an open host (it isn't probed), or None.
+        """
+        if self.threshold <= 0:
+            return None
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None or not state["open"]:
+                return None
+            self.short_circuited += 1
+            return state["last_failure"]
+
+    def timeout(self, host):
+        """
+        Return the (connect, read) timeout for a request to 'host'.
+        """
+        if self.adaptive:
+            with self.lock:
+                state = self.hosts.get(host)
+                latency = state["latency"] if state and state["samples"] >= self.min_samples else None
+            if latency is not None:
+                adapted = max(self.min_timeout, self.timeout_factor * latency)
+                return min(self.connect_timeout, adapted), min(self.read_timeout, adapted)
+        return self.connect_timeout, self.read_timeout
+
+    def record(self, host, error_type, seconds):
+        """
+        Update the host with the result of a probe and how long it took.
+        """
+        with self.lock:
+            state = self._state(host)
+            if error_type in HOST_FAILURES:
+                state["failures"] += 1
+                state["last_failure"] = error_type
+                if self.threshold > 0 and state["failures"] >= self.threshold + (1 if self.confirm else 0):
+                    state["open"] = True
+            else:
+                state["failures"] = 0
+                # Moving average of the answer time of the host
+                state["latency"] = seconds if state["latency"] is None else 0.7 * state["latency"] + 0.3 * seconds
+                state["samples"] += 1
+
+    def open_hosts(self):
+        with self.lock:
+            return sorted(host for host, state in self.hosts.items() if state["open"])
+
+
+# --- Per host rate limits and retries ---
+# Answers of an overloaded or rate limiting server, probed again after a pause
+TRANSIENT_ERRORS = ("ERROR_429", "ERROR_502", "ERROR_503", "ERROR_504")
+
+
+def retry_after_seconds(value):
+    """
+    Return the seconds of a Retry-After header (a number or an HTTP date), or None.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostRateLimiter:
+    """
+    Token bucket per host: at most 'rate' probes a second to one host, with
+    bursts of 'burst' probes. pause() stops a host for a while (Retry-After).
+    """
+    def __init__(self, rate=5, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.lock = threading.Lock()
+        self.buckets = {} # host -> [tokens, last refill, paused until]
+
+    def try_acquire(self, host):
+        """
+        Take a token of 'host' and return 0, or return the seconds until there is one.
+        """
+        with self.lock:
+            now = time.monotonic()
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = [float(self.burst), now, 0.0]
+            if now < bucket[2]:
+                return bucket[2] - now
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate
+
+    def acquire(self, host):
+        """
+        Wait until 'host' has a token and take it.
+        """
+        while True:
+            wait = self.try_acquire(host)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def pause(self, host, seconds):
+        with self.lock:
+            bucket = self.buckets.setdefault(host, [0.0, time.monotonic(), 0.0])
+            bucket[0] = 0.0
+            bucket[2] = max(bucket[2], time.monotonic() + seconds)
+
+
+class ProbeClient:
+    """
+    Keep-alive HTTP client shared by all the probes of a report run.
+
+    Uses one requests.Session with pooled connections: up to 'max_hosts' hosts
+    keep their pool and each pool keeps 'max_per_host' connections alive, so the
+    feeds of the same platform reuse the TCP/TLS handshake. The User-Agent is
+    set once on the session. With 'lightweight' the probes don't download the
+    feeds (see feed_error_type).
+
+    'connect_timeout' and 'read_timeout' default to 'timeout'. 'breaker_threshold',
+    'breaker_confirm' and 'adaptive_timeouts' set the per host circuit breaker
+    and timeouts (see HostHealth). 'on_probe' is called with (error_type,
+    seconds) after every request, not for the short-circuited URLs.
+
+    With 'rate_limit' every host gets at most that many probes a second (see
+    HostRateLimiter). The TRANSIENT_ERRORS (429, 503...) are probed again up
+    to 'retries' times, after the server's Retry-After or a jittered
+    exponential backoff starting at 'backoff' seconds. A wait longer than
+    'max_retry_wait' isn't done and the error is kept.
+    """
+    def __init__(self, max_hosts=100, max_per_host=4, timeout=10, headers=None, report_redirects=True,
+                 lightweight=False, max_bytes=8192, connect_timeout=None, read_timeout=None,
+                 breaker_threshold=0, breaker_confirm=True, adaptive_timeouts=False, on_probe=None,
+                 rate_limit=None, rate_burst=1, retries=0, backoff=1.0, max_retry_wait=60):
+        self.timeout = timeout
+        self.health = HostHealth(connect_timeout=timeout if connect_timeout is None else connect_timeout,
+                                 read_timeout=timeout if read_timeout is None else read_timeout,
+                                 threshold=breaker_threshold, confirm=breaker_confirm,
+                                 adaptive=adaptive_timeouts)
+        self.on_probe = on_probe
+        self.rate_limiter = HostRateLimiter(rate_limit, rate_burst) if rate_limit else None
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_wait = max_retry_wait
+        self.retry_after = threading.local() # Retry-After of the last answer, per worker thread
+        self.last_probe = threading.local() # Whether the last URL of the worker thread got a request
+        self.report_redirects = report_redirects
+        self.lightweight = lightweight
+        self.max_bytes = max_bytes
+        self.counter = _ConnectionCounter()
+
+        import requests
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS if headers is None else headers)
+        adapter = _counting_adapter(self.counter, pool_connections=max_hosts, pool_maxsize=max_per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.hooks["response"].append(self._check_response)
+
+    def _check_response(self, response, *args, **kwargs):
+        # Called for every response (also the ones of a redirect chain), in the thread of the probe
+        if response.is_redirect:
+            self.counter.add(redirects=1)
+        self.retry_after.seconds = retry_after_seconds(response.headers.get("Retry-After"))
+
+    def feed_error_type(self, feed_url: str) -> str:
+        host = feed_host(feed_url)
+        error_type = self.health.short_circuit(host)
+        self.last_probe.requested = error_type is None
+        if error_type is not None:
+            return error_type
+
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(host)
+            self.retry_after.seconds = None
+
+            start = time.perf_counter()
+            error_type = feed_error_type(feed_url, session=self.session, timeout=self.health.timeout(host),
+                                         report_redirects=self.report_redirects,
+                                         lightweight=self.lightweight, max_bytes=self.max_bytes)
+            seconds = time.perf_counter() - start
+            self.health.record(host, error_type, seconds)
+            if self.on_probe is not None:
+                self.on_probe(error_type, seconds)
+
+            if error_type not in TRANSIENT_ERRORS or attempt >= self.retries:
+                return error_type
+
+            # Wait what the server asks for, or back off with jitter so the retries don't arrive together
+            retry_after = self.retry_after.seconds
+            if retry_after is not None:
+                wait = retry_after + random.uniform(0, self.backoff)
+            else:
+                wait = random.uniform(0.5, 1) * self.backoff * 2 ** attempt
+            if wait > self.max_retry_wait:
+                return error_type
+            if self.rate_limiter is not None and retry_after is not None:
+                self.rate_limiter.pause(host, retry_after)
+            self.counter.add(retries=1)
+            attempt += 1
+            time.sleep(wait)
+
+    def probed(self):
+        """
+        Return False if the last URL probed by this thread was short-circuited by
+        the breaker (it got the error of its host without a request).
+        """
+        return getattr(self.last_probe, "requested", True)
+
+    def connection_stats(self):
+        """
+        Return the connections opened and reused, the requests sent, the
+        redirects followed, the retries and the URLs short-circuited by the
+        breaker so far.
+        """
+        with self.counter.lock:
+            opened, sent, redirects = self.counter.opened, self.counter.requests, self.counter.redirects
+            retries = self.counter.retries
+        return {"requests": sent, "opened": opened, "reused": max(sent - opened, 0), "redirects": redirects,
+                "retries": retries,
+                "short_circuited": self.health.short_circuited, "open_hosts": len(self.health.open_hosts())}
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# --- Concurrent probing engine ---
+def probe_feeds(items, probe, key=None, max_workers=16, max_per_host=4, window=None, stop=None):
+    """
+    Run 'probe' over every item and yield (item, result) in the same order as 'items'.
+
+    The probes run on a pool of 'max_workers' threads, but never more than
+    'max_per_host' at the same time against one host, so a broken domain
+    can't take all the workers. 'key' turns an item into its feed URL
+    (by default the item is the URL). 'window' limits how many items are
+    read ahead of the last yielded one (default: 8 per worker).
+
+    On Ctrl-C (a KeyboardInterrupt, also one thrown in by the consumer, see
+    interrupted_results) or once 'stop' (a threading.Event) is set, the
+    results already probed but waiting for the ones before them are yielded
+    out of order, and the probes still running are not waited for.
+    """
+    if key is None:
+        key = lambda item: item
+
+    # Serial path, same as calling the probe in a loop
+    if max_workers <= 1:
+        for item in items:
+            if stop is not None and stop.is_set():
+                return
+            yield item, probe(key(item))
+        return
+
+    max_per_host = max(1, max_per_host)
+    if window is None:
+        window = max_workers * 8
+
+    iterator = iter(items)
+    exhausted = False
+    next_index = 0      # index given to the next item read from 'items'
+    next_to_yield = 0   # index of the next result to yield (keeps the input order)
+
+    waiting = {}        # host -> deque of (index, item) waiting for a free host slot
+    ready_hosts = deque()  # hosts with waiting items, in round-robin order
+    in_flight = {}      # host -> number of running probes
+    futures = {}        # future -> (index, host)
+    items_by_index = {}
+    results = {}
+
+    def finished():
+        # The results already probed and not yielded yet, out of the input order
+        for future in [future for future in futures if future.done() and not future.cancelled()]:
+            index, _ = futures.pop(future)
+            results[index] = future.result()
+        for index in sorted(results):
+            yield items_by_index.pop(index), results.pop(index)
+
+    def submit_ready(executor):
+        # Start probes while there are free workers, rotating over the hosts
+        checked = 0
+        while len(futures) < max_workers and ready_hosts and checked < len(ready_hosts):
+            host = ready_hosts.popleft()
+            if in_flight.get(host, 0) >= max_per_host:
+                ready_hosts.append(host)
+                checked += 1
+                continue
+            checked = 0
+            index, item = waiting[host].popleft()
+            if waiting[host]:
+                ready_hosts.append(host)
+            else:
+                del waiting[host]
+            in_flight[host] = in_flight.get(host, 0) + 1
+            futures[executor.submit(probe, key(item))] = (index, host)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    stopped = False
+    try:
+        while True:
+            if stop is not None and stop.is_set():
+                stopped = True
+                yield from finished()
+                return
+
+            # Read ahead from the source until the window is full
+            while not exhausted and next_index - next_to_yield < window:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                host = feed_host(key(item))
+                if host not in waiting:
+                    waiting[host] = deque()
+                    ready_hosts.append(host)
+                waiting[host].append((next_index, item))
+                items_by_index[next_index] = item
+                next_index += 1
+
+            submit_ready(executor)
+
+            # Yield every result that is already in order
+            while next_to_yield in results:
+                yield items_by_index.pop(next_to_yield), results.pop(next_to_yield)
+                next_to_yield += 1
+
+            if not futures:
+                if exhausted and not waiting:
+                    break
+                continue
+
+            # With 'stop' the wait is short, to see it set while the probes run
+            done, _ = wait(futures, timeout=None if stop is None else 0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, host = futures.pop(future)
+                in_flight[host] -= 1
+                if not in_flight[host]:
+                    del in_flight[host]
+                results[index] = future.result()
+    except KeyboardInterrupt:
+        stopped = True
+        yield from finished()
+        raise
+    finally:
+        # Stop the queued probes if the consumer goes away early
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=not stopped)
+
+
+def interrupted_results(generator):
+    """
+    Throw a KeyboardInterrupt into a paused generator of probe_feeds (or one
+    that iterates it) and yield what it still gives before it stops: the
+    results it had already probed. Used after a Ctrl-C outside the generator.
+    """
+    try:
+        value = generator.throw(KeyboardInterrupt)
+        while True:
+            yield value
+            value = next(generator)
+    except (KeyboardInterrupt, StopIteration):
+        return
@@ -0,0 +1,164 @@
+# import libraries
+import argparse
+import sys
+from array import array
+from datetime import datetime
+
+# pandas (and the modules that need it) is imported by the steps that use it
+from feedErrorReport import add_search_arguments, error_report_headers, report_days_label, search_error_rows, search_options
+from customer_input import read_customers
+from group_feed import GROUP_OUTPUTS
+from report_writer import REPORT_FORMATS, report_file_name, save_dataframe
+from run_journal import JournalError
+from run_metrics import RunMetrics
+
+
+def error_frame(rows, columns, category_column="Error_type"):
+    """
+    Build a DataFrame from the rows of search_error_rows, column by column
+    instead of keeping a list per row. The 'category_column' (a few distinct
+    values repeated in every row) is kept as integer codes and becomes a
+    categorical column.
+    """
+    import numpy as np
+    import pandas as pd
+
+    values = {column: [] for column in columns if column != category_column}
+    appends = [values[column].append if column != category_column else None for column in columns]
+    categories = {}
+    codes = array("i")
+    count = 0
+    for row in rows:
+        count += 1
+        for append, value in zip(appends, row):
+            if append is None:
+                codes.append(categories.setdefault(value, len(categories)))
+            else:
+                append(value)
+    if not count:
+        return pd.DataFrame(columns=list(columns))
+
+    frame = pd.DataFrame(values, columns=[column for column in columns if column != category_column])
+    if category_column in columns:
+        frame.insert(list(columns).index(category_column), category_column,
+                     pd.Categorical.from_codes(np.frombuffer(codes, dtype=np.int32), categories=list(categories)))
+    return frame
+
+
+def collect_errors(days=24, **options):
+    """
+    Search and probe the feeds with errors older than 'days' (the options are
+    the ones of feedErrorReport.search_error_rows) and return them as a DataFrame.
+    """
+    return error_frame(search_error_rows(days, **options),
+                       error_report_headers(options.get("cache_path"), options.get("buckets")))
+
+
+def run_report(days=24,
+               customer_file_path="Feeds with customers.xlsx",
+               grouped_file_path=None,
+               output_file_path=None,
+               group_output="tuples",
+               normalize_urls=True,
+               save_intermediate=False,
+               intermediate_format="xlsx",
+               metrics=None,
+               use_sidecars=False,
+               **options):
+    """
+    The whole report in one process: search the feed errors, group the
+    customers by feed_url and join both, passing the DataFrames from one step
+    to the next instead of writing and reading files in between.
+
+    'customer_file_path' is the file of feeds with customers (grouped here) and
+    'grouped_file_path' an already grouped file to use instead. With
+    'save_intermediate' the errors and grouped customers are also saved, as
+    the single scripts do, in 'intermediate_format'. The final report is
+    saved to 'output_file_path' (by default <date>final_report.xlsx) and
+    returned as a DataFrame. The timings of every step are added to 'metrics'
+    (a run_metrics.RunMetrics). With 'use_sidecars' the Parquet copy of the
+    customer xlsx and the URL index of the grouped file are kept next to them.
+    """
+    from group_feed import group_by_feed_url
+    from Join import join_feed_customer_frames
+    from url_join import load_customer_index
+
+    if metrics is None:
+        metrics = RunMetrics()
+    fecha_str = datetime.now().strftime("%Y%m%d")
+
+    # --- Step 1: feeds with errors (search_error.py / feedErrorReport.py) ---
+    df_errors = collect_errors(days, metrics=metrics, **options)
+    print(f"\nFeeds with errors: {len(df_errors)}")
+    if save_intermediate:
+        errorsFile = report_file_name(f"{report_days_label(days, options.get('buckets'))}Days_{fecha_str}",
+                                      intermediate_format)
+        with metrics.stage("saving"):
+            save_dataframe(df_errors, errorsFile)
+        print(f"Feed errors saved to '{errorsFile}'")
+
+    # --- Step 2: customers grouped by feed_url (group_feed.py) ---
+    if grouped_file_path:
+        with metrics.stage("grouping"):
+            if normalize_urls:
+                customers = load_customer_index(grouped_file_path, "feed_url", use_cache=use_sidecars)
+            else:
+                customers = read_customers(grouped_file_path, columns=None, use_sidecar=use_sidecars)
+        print(f"Grouped customers read from '{grouped_file_path}'")
+    else:
+        with metrics.stage("grouping"):
+            customers = group_by_feed_url(customer_file_path, output=group_output, use_sidecar=use_sidecars)
+        if customers is None:
+            return None
+        print(f"Customers grouped by feed_url: {len(customers)}")
+        if save_intermediate:
+            groupedFile = report_file_name("Group_feed_url", intermediate_format)
+            with metrics.stage("saving"):
+                save_dataframe(customers, groupedFile)
+            print(f"Grouped customers saved to '{groupedFile}'")
+
+    # --- Step 3: join (Join.py) ---
+    with metrics.stage("join"):
+        df_final = join_feed_customer_frames(df_errors, "Feed_URL", customers, "feed_url",
+                                             normalize_urls=normalize_urls)
+
+    output_file_path = output_file_path or f"{fecha_str}final_report.xlsx"
+    with metrics.stage("saving"):
+        save_dataframe(df_final, output_file_path)
+    print(f"\nFinal report saved to '{output_file_path}' ({len(df_final)} rows)")
+    return df_final
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Feed errors report pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="search the errors, group the customers and join them in one process")
+    add_search_arguments(run, cache_path="feed_report_cache.sqlite3")
+    run.add_argument("--customers", default="Feeds with customers.xlsx", help="file of feeds with customers")
+    run.add_argument("--grouped", default=None, help="already grouped customers file to use instead of --customers")
+    run.add_argument("--group-output", choices=GROUP_OUTPUTS, default="tuples", help="shape of the grouped customers")
+    run.add_argument("--output", default=None, help="final report file (xlsx, csv or parquet by its extension)")
+    run.add_argument("--exact-urls", action="store_true", help="join only identical URLs (no normalization)")
+    run.add_argument("--save-intermediate", action="store_true", help="also save the errors and grouped customers")
+    run.add_argument("--intermediate-format", choices=REPORT_FORMATS, default="xlsx",
+                     help="format of the intermediate files")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        runMetrics = RunMetrics()
+        try:
+            run_report(args.days,
+                       customer_file_path=args.customers,
+                       grouped_file_path=args.grouped,
+                       output_file_path=args.output,
+                       group_output=args.group_output,
+                       normalize_urls=not args.exact_urls,
+                       save_intermediate=args.save_intermediate,
+                       intermediate_format=args.intermediate_format,
+                       metrics=runMetrics,
+                       use_sidecars=True,
+                       **search_options(args))
+        except JournalError as e:
+            sys.exit(str(e))
+        runMetrics.save(args.metrics, args.prometheus)
@@ -1,13 +1,105 @@
-import pandas as pd
+from customer_input import CUSTOMER_COLUMNS, read_customers
+from report_writer import report_file_name, save_dataframe
 
-def group_by_feed_url(excel_filepath, sheet=0):
+INFO_COLUMNS = ['feed_id', 'owner_id', 'platform_id', 'platform_name']
+GROUP_OUTPUTS = ("tuples", "long", "delimited", "arrow")
+
+# Few distinct values repeated in many rows: categorical in the "long" output and
+# dictionary encoded in the "arrow" one
+REPEATED_COLUMNS = ['platform_id', 'platform_name']
+
+
+def group_feed_frame(df, output="tuples", separator="|"):
+    """
+    Group a DataFrame of feeds with customers by the feed_url.
+
+    output="tuples":    one row per feed_url, 'owner_platform_list' has a list of
+                        (feed_id, owner_id, platform_id, platform_name) tuples.
+    output="long":      one row per feed_url and customer, sorted by feed_url
+                        (normalized, nothing nested in the cells).
+    output="delimited": one row per feed_url, every column has its values joined
+                        by 'separator' (feed_id_list, owner_id_list, ...).
+    output="arrow":     like "tuples", but 'owner_platform_list' is an Arrow list
+                        of {feed_id, owner_id, platform_id, platform_name} structs
+                        (needs pyarrow), without a Python object per customer.
+    The empty values become ''.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if output not in GROUP_OUTPUTS:
+        raise ValueError(f"Unknown output '{output}', use one of {GROUP_OUTPUTS}")
+
+    # Column by column: empty values to '' and everything to text
+    info = pd.DataFrame({
+        col: df[col].astype(object).where(df[col].notna(), '').astype(str)
+        for col in INFO_COLUMNS
+    }, index=df.index)
+    info.insert(0, 'feed_url', df['feed_url'])
+    info = info[info['feed_url'].notna()]
+
+    if output == "long":
+        info = info.sort_values('feed_url', kind='stable').reset_index(drop=True)
+        return info.astype({col: 'category' for col in REPEATED_COLUMNS})
+
+    grouped = info.groupby('feed_url', sort=True)
+    if output == "delimited":
+        return grouped.agg(separator.join).add_suffix('_list').reset_index()
+
+    # Create the (feed_id, owner_id, platform_id, platform_name) tuples and slice the
+    # list of each feed_url from the sorted rows (a Python list per group is slow)
+    if info.empty:
+        lists = arrow_customer_lists(info, []) if output == "arrow" else []
+        return pd.DataFrame({'feed_url': [], 'owner_platform_list': lists})
+    info = info.sort_values('feed_url', kind='stable')
+    urls = info['feed_url'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, urls[1:] != urls[:-1]])
+    ends = np.r_[starts[1:], len(urls)]
+
+    if output == "arrow":
+        return pd.DataFrame({
+            'feed_url': urls[starts],
+            'owner_platform_list': arrow_customer_lists(info, starts)
+        })
+
+    tuple_info = list(zip(*(info[col].tolist() for col in INFO_COLUMNS)))
+
+    return pd.DataFrame({
+        'feed_url': urls[starts],
+        'owner_platform_list': [tuple_info[start:end] for start, end in zip(starts, ends)]
+    })
+
+
+def arrow_customer_lists(info, starts):
+    """
+    Return the customers of every group as a pandas column backed by an Arrow
+    ListArray: the rows of 'info' (sorted by feed_url) are stored once, column
+    by column, and every group is an offset range ('starts') into them.
+    """
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+
+    fields = []
+    for col in INFO_COLUMNS:
+        values = pa.array(info[col].to_numpy(dtype=object), type=pa.string())
+        fields.append(values.dictionary_encode() if col in REPEATED_COLUMNS else values)
+    customers = pa.StructArray.from_arrays(fields, names=INFO_COLUMNS)
+    offsets = pa.array(np.r_[starts, len(info)], type=pa.int32())
+    return pd.arrays.ArrowExtensionArray(pa.ListArray.from_arrays(offsets, customers))
+
+
+def group_by_feed_url(excel_filepath, sheet=0, output="tuples", separator="|", use_sidecar=False):
     """
     We group the excel file by the feed_url and put the other elements 
     in a list (feed_id, owner_id, platform_id, platform_name).
+    The file can also be a csv or a parquet, and only those columns are read
+    (see customer_input.read_customers, 'use_sidecar' keeps a Parquet copy of
+    an xlsx). See group_feed_frame for the 'output' forms.
     """
     try:
-        # Reed the excel file
-        df = pd.read_excel(excel_filepath, sheet_name=sheet)
+        # Reed the customer file (only the columns of the report)
+        df = read_customers(excel_filepath, sheet=sheet, use_sidecar=use_sidecar)
     except FileNotFoundError:
         print(f"Error: Don't found the file at '{excel_filepath}'")
         return None
@@ -16,40 +108,34 @@ def group_by_feed_url(excel_filepath, sheet=0):
         return None
 
     # Ensure all columns exist
-    required_columns = ['feed_id', 'feed_url', 'owner_id', 'platform_id', 'platform_name']
-    for col in required_columns:
+    for col in CUSTOMER_COLUMNS:
         if col not in df.columns:
             print(f"Error: column '{col}' doesn't found in the excel.")
             return None
 
-    # Create a new column (feed_id, owner_id, platform_id, platform_name)
-    df['tuple_info'] = df.apply(lambda row: (
-        str(row['feed_id']) if pd.notna(row['feed_id']) else '',
-        str(row['owner_id']) if pd.notna(row['owner_id']) else '',
-        str(row['platform_id']) if pd.notna(row['platform_id']) else '',
-        str(row['platform_name']) if pd.notna(row['platform_name']) else ''
-    ), axis=1)
-
-    # Group by 'feed url' and add 'tuple_info' in a list
-    df_group = df.groupby('feed_url').agg(
-        owner_platform_list=('tuple_info', lambda x: list(x))
-    ).reset_index()
-
-    return df_group
+    return group_feed_frame(df, output=output, separator=separator)
 
 
 if __name__ == "__main__":
     # Save the path of the excel that has the feeds whit customers
     file_path = 'Feeds with customers.xlsx'
 
-    df_result = group_by_feed_url(file_path)
+    # How to save the groups: "tuples" (a list in one cell), "long" (a row per customer),
+    # "delimited" (a text column per field, values joined by '|') or "arrow" (like "tuples",
+    # stored as an Arrow list, best saved as parquet)
+    resultShape = "tuples"
+
+    # Keep the xlsx as a Parquet copy next to it, read instead of the xlsx while it doesn't change
+    df_result = group_by_feed_url(file_path, output=resultShape, use_sidecar=True)
 
     if df_result is not None:
         # See the first rows ot the resulting file
         print("Data group by feed_url:")
         print(df_result.head())
 
-        # Save the result on a new excel
+        # Save the result on a new file ("xlsx", "csv" or "parquet")
         resultName = "Group_feed_url"
-        df_result.to_excel(f'{resultName}.xlsx', index=False)
-        print(f"\nResultado guardado en '{resultName}.xlsx'")
\ No newline at end of file
+        resultFormat = "xlsx"
+        resultFile = report_file_name(resultName, resultFormat)
+        save_dataframe(df_result, resultFile)
+        print(f"\nResultado guardado en '{resultFile}'")
\ No newline at end of file
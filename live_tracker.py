@@ -0,0 +1,247 @@
+# import libraries
+import argparse
+import os
+import pickle
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from error_state import fold_status_entry, new_feed_state
+
+# --- Live error tracker ---
+# A long running process that follows feed_status_log as the entries arrive and
+# keeps the error state of every feed in memory, so the "older than N days" feeds
+# are known at any time without grouping the whole log:
+#
+#     python live_tracker.py follow --state live_state.pkl
+#     python live_tracker.py older-than --state live_state.pkl --days 24
+#
+# The new entries come from a change stream (replica sets and Atlas) or, where
+# there are no change streams, from polling the log by _id. The state is saved
+# to a checkpoint file every few seconds, and the next start only reads the log
+# entries after the last one folded.
+TRACKER_VERSION = 1
+
+# Every feed is a tuple of these fields of error_state.new_feed_state (errorDate
+# is calculated from them), about a third of the memory of the whole state dict
+STATE_FIELDS = ("errors", "latestIdleDate", "earliestReadingErrorDate", "errorAfterIdleDate")
+
+
+class LiveErrorTracker:
+    """
+    Error state of every feed (see error_state.fold_status_entry), by feedUrl,
+    kept in memory and saved to the checkpoint file 'path' every
+    'checkpoint_every' seconds. An existing checkpoint is loaded.
+    error_rows() can be called from another thread while follow() runs.
+    """
+    def __init__(self, path=None, checkpoint_every=60):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.states = {}
+        self.last_id = None
+        self.processed = 0
+        self.lock = threading.Lock()
+        self.saved_at = time.monotonic()
+        if path and os.path.exists(path):
+            self.load()
+
+    @classmethod
+    def from_checkpoint(cls, path):
+        # Unlike the constructor, a missing checkpoint is an error
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"The live tracker state '{path}' doesn't exist, run 'live_tracker.py follow' first")
+        return cls(path)
+
+    # --- State ---
+    def fold(self, entry):
+        """
+        Add one feed_status_log entry to the state of its feed.
+        """
+        feed_url = entry.get("feedUrl")
+        with self.lock:
+            state = new_feed_state(feed_url)
+            record = self.states.get(feed_url)
+            if record is not None:
+                state.update(zip(STATE_FIELDS, record))
+            fold_status_entry(state, entry.get("status"), entry.get("date"))
+            self.states[feed_url] = tuple(state[field] for field in STATE_FIELDS)
+
+            if self.last_id is None or entry["_id"] > self.last_id:
+                self.last_id = entry["_id"]
+            self.processed += 1
+
+    def error_rows(self, error_days_ago, now=None):
+        """
+        Return the feeds with errors whose errorDate is older than
+        'error_days_ago', as the rows of the error pipelines (_id, errorDate,
+        days_error). Only the feeds in memory are read.
+        """
+        # days_error counts the days as the $dateDiff of the pipelines (UTC calendar days)
+        today = (now or datetime.now(timezone.utc).replace(tzinfo=None)).date()
+        with self.lock:
+            records = list(self.states.items())
+
+        rows = []
+        for feed_url, (errors, latestIdleDate, earliestReadingErrorDate, errorAfterIdleDate) in records:
+            errorDate = earliestReadingErrorDate if latestIdleDate is None else errorAfterIdleDate
+            if errors > 0 and errorDate is not None and errorDate <= error_days_ago:
+                rows.append({"_id": feed_url, "errorDate": errorDate, "days_error": (today - errorDate.date()).days})
+        return rows
+
+    # --- Checkpoint ---
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                saved = pickle.load(f)
+            if saved.get("version") != TRACKER_VERSION:
+                raise ValueError(f"version {saved.get('version')} instead of {TRACKER_VERSION}")
+        except Exception as e:
+            print(f"The live tracker state '{self.path}' couldn't be used, starting from the whole log: {e}")
+            return
+        self.states = saved["states"]
+        self.last_id = saved["last_id"]
+        self.processed = saved["processed"]
+
+    def save(self):
+        """
+        Write the state to the checkpoint file (a new file replaces the old one,
+        so a crash while saving keeps the previous checkpoint).
+        """
+        with self.lock:
+            saved = {"version": TRACKER_VERSION, "last_id": self.last_id, "processed": self.processed,
+                     "states": dict(self.states)}
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+        self.saved_at = time.monotonic()
+
+    def maybe_save(self):
+        if self.path and time.monotonic() - self.saved_at >= self.checkpoint_every:
+            self.save()
+
+    # --- Log reading ---
+    def catch_up(self, collection, batch_size=5000):
+        """
+        Fold the entries of 'collection' (feed_status_log) after the last one
+        folded, in _id order. Return the number of entries read.
+        """
+        from pymongo import ASCENDING
+
+        query = {"_id": {"$gt": self.last_id}} if self.last_id is not None else {}
+        logCursor = collection.find(query, {"feedUrl": 1, "status": 1, "date": 1}) \
+            .sort("_id", ASCENDING).batch_size(batch_size)
+        count = 0
+        for entry in logCursor:
+            self.fold(entry)
+            count += 1
+            if count % batch_size == 0:
+                self.maybe_save()
+        return count
+
+    def follow(self, collection, use_change_stream=True, poll_interval=5, stop=None):
+        """
+        Keep the state up to date with the new entries of 'collection' until
+        'stop' (a threading.Event) is set or Ctrl-C. The change stream is opened
+        before catching up with the log, so no entry is lost in between; without
+        change streams (standalone mongod) the log is polled every
+        'poll_interval' seconds. The checkpoint is saved on the way out.
+        """
+        if stop is None:
+            stop = threading.Event()
+        changeStream = self._open_change_stream(collection) if use_change_stream else None
+        try:
+            start = time.perf_counter()
+            count = self.catch_up(collection)
+            print(f"Caught up with {count} log entries in {time.perf_counter() - start:.1f}s "
+                  f"({len(self.states)} feeds tracked)")
+            self.maybe_save()
+
+            if changeStream is not None:
+                # The entries folded by catch_up can also be in the stream
+                caughtUpId = self.last_id
+                while not stop.is_set() and changeStream.alive:
+                    change = changeStream.try_next()
+                    if change is not None:
+                        entry = change["fullDocument"]
+                        if caughtUpId is None or entry["_id"] > caughtUpId:
+                            self.fold(entry)
+                    self.maybe_save()
+                if not stop.is_set():
+                    print(f"The change stream was closed, polling the log every {poll_interval}s")
+            elif use_change_stream:
+                print(f"Change streams are not available (they need a replica set), "
+                      f"polling the log every {poll_interval}s")
+
+            while not stop.is_set():
+                self.catch_up(collection)
+                self.maybe_save()
+                stop.wait(poll_interval)
+        except KeyboardInterrupt:
+            print("\nInterrupted, saving the live state...")
+        finally:
+            if changeStream is not None:
+                changeStream.close()
+            if self.path:
+                self.save()
+
+    def _open_change_stream(self, collection):
+        from pymongo.errors import OperationFailure
+
+        try:
+            # The log only gets inserts, and an insert event has the whole entry
+            return collection.watch([{"$match": {"operationType": "insert"}}], max_await_time_ms=1000)
+        except (OperationFailure, NotImplementedError) as e:
+            print(f"Couldn't open a change stream: {e}")
+            return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Follow feed_status_log and keep the error state of every feed.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    follow = commands.add_parser("follow", help="follow the log and keep the state up to date")
+    follow.add_argument("--uri", default="mongodb+srv://r_personal:link", help="MongoDB URI (replace with your srv link)")
+    follow.add_argument("--state", default="live_state.pkl", help="checkpoint file of the state")
+    follow.add_argument("--checkpoint-every", type=float, default=60, help="seconds between checkpoints")
+    follow.add_argument("--poll", action="store_true", help="poll the log by _id instead of using a change stream")
+    follow.add_argument("--poll-interval", type=float, default=5, help="seconds between polls")
+
+    olderThan = commands.add_parser("older-than", help="print the feeds with errors older than --days")
+    olderThan.add_argument("--state", default="live_state.pkl", help="checkpoint file of the state")
+    olderThan.add_argument("--days", type=int, default=24, help="days the error needs to be older than")
+    olderThan.add_argument("--output", default=None, help="also save them to a report file (xlsx, csv or parquet)")
+    args = parser.parse_args()
+
+    if args.command == "follow":
+        from pymongo import MongoClient
+
+        client = MongoClient(args.uri)
+        tracker = LiveErrorTracker(args.state, checkpoint_every=args.checkpoint_every)
+        print(f"Live state: {len(tracker.states)} feeds, {tracker.processed} log entries folded")
+        try:
+            tracker.follow(client.feedreader.feed_status_log, use_change_stream=not args.poll,
+                           poll_interval=args.poll_interval)
+        finally:
+            client.close()
+        print(f"Live state saved to '{args.state}'")
+
+    elif args.command == "older-than":
+        from feedErrorReport import ERROR_REPORT_TYPES
+        from report_writer import open_report_writer
+
+        tracker = LiveErrorTracker.from_checkpoint(args.state)
+        rows = tracker.error_rows(datetime.now() - timedelta(days=args.days))
+        rows.sort(key=lambda row: row["errorDate"])
+        for row in rows:
+            print(f"{row['_id']}  {row['errorDate']}  {row['days_error']} days")
+        print(f"\n{len(rows)} feeds with errors older than {args.days} days "
+              f"(of {len(tracker.states)} tracked, {tracker.processed} log entries folded)")
+
+        if args.output:
+            reportWriter = open_report_writer(args.output, ["Feed_URL", "Error_Start_Date", "Days_Since_Error_Start"],
+                                              sheet_title="Error_Feeds", column_types=ERROR_REPORT_TYPES)
+            for row in rows:
+                reportWriter.append([row["_id"], row["errorDate"], row["days_error"]])
+            reportWriter.close()
+            print(f"Saved to '{args.output}'")
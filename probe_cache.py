@@ -0,0 +1,199 @@
+# import libraries
+import sqlite3
+import threading
+import time
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Time (seconds) a result stays valid, by error class. The classes that are not
+# listed use 'default_ttl', and a result with a TTL of 0 is never saved.
+DEFAULT_TTLS = {
+    "CONNECTION_ERROR": 6 * HOUR,
+    "TIMEOUT_ERROR": 6 * HOUR,
+    "REQUEST_FAILED": 6 * HOUR,
+    "UNKNOWN_ERROR": 6 * HOUR,
+    "ERROR_404": 3 * DAY,
+    "ERROR_410": 3 * DAY,
+    "HTML_FORMAT": DAY,
+    "REDIRECTED": DAY,
+    "NOT_VALIDATED": 12 * HOUR,
+    # Throttled or overloaded servers: the feed itself may be fine on the next run
+    "ERROR_429": 0,
+    "ERROR_502": 5 * MINUTE,
+    "ERROR_503": 5 * MINUTE,
+    "ERROR_504": 5 * MINUTE,
+}
+
+
+def error_class(error_type: str) -> str:
+    """
+    Return the class of an error type: "REDIRECTED: a -> b" -> "REDIRECTED".
+    """
+    return error_type.split(":", 1)[0].strip()
+
+
+def redirect_target(error_type: str):
+    """
+    Return the final URL of a "REDIRECTED: <from> -> <to>" error type, or None.
+    """
+    if error_class(error_type) != "REDIRECTED" or " -> " not in error_type:
+        return None
+    return error_type.rsplit(" -> ", 1)[1]
+
+
+def probe_mode(lightweight=False, report_redirects=True, max_bytes=8192) -> str:
+    """
+    Return the name of a way of probing, saved with its results: a feed probed
+    another way (e.g. without downloading it, or following its redirects) can
+    get another error type. "get", "light-8192", "get+redirects"...
+    """
+    mode = f"light-{max_bytes}" if lightweight else "get"
+    return mode + "+redirects" if report_redirects else mode
+
+
+class ProbeCache:
+    """
+    On disk (SQLite) cache of the feed_error_type results, keyed by feed URL.
+
+    Every result is saved with the probe 'mode' (see probe_mode) and a result
+    of another mode is a miss, so a cache is not mixed between ways of probing.
+
+    Every result is kept with the time it was checked and is valid for the TTL
+    of its error class ('ttls' updates DEFAULT_TTLS). When there are more than
+    'max_entries' results the least recently used ones are removed.
+    With 'force_refresh' nothing is read from the cache, but the new results
+    are still saved (not the ones with a TTL of 0).
+    """
+    def __init__(self, path="probe_cache.sqlite3", ttls=None, default_ttl=DAY,
+                 max_entries=200000, force_refresh=False, mode=None):
+        self.path = path
+        self.mode = mode or probe_mode()
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.force_refresh = force_refresh
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self._puts = 0
+
+        # The probes run on several threads, so the connection is shared behind a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS probe_results ("
+            " feed_url TEXT PRIMARY KEY,"
+            " error_type TEXT NOT NULL,"
+            " redirect_target TEXT,"
+            " checked_at REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " probe_mode TEXT)"
+        )
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(probe_results)")]
+        if "probe_mode" not in columns:
+            # A cache of before the modes were saved, its results (of an unknown mode) are misses
+            self.connection.execute("ALTER TABLE probe_results ADD COLUMN probe_mode TEXT")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS probe_results_last_used ON probe_results (last_used)")
+        self.connection.commit()
+
+    def ttl(self, error_type: str) -> float:
+        return self.ttls.get(error_type, self.ttls.get(error_class(error_type), self.default_ttl))
+
+    def get(self, feed_url: str):
+        """
+        Return the cached error type of 'feed_url', or None if it's missing,
+        expired or of another probe mode.
+        """
+        if self.force_refresh:
+            with self.lock:
+                self.misses += 1
+            return None
+
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT error_type, checked_at, probe_mode FROM probe_results WHERE feed_url = ?", (feed_url,)
+            ).fetchone()
+            if row is None or row[2] != self.mode:
+                self.misses += 1
+                return None
+
+            error_type, checked_at, _ = row
+            if now - checked_at > self.ttl(error_type):
+                self.misses += 1
+                self.expired += 1
+                return None
+
+            self.connection.execute("UPDATE probe_results SET last_used = ? WHERE feed_url = ?", (now, feed_url))
+            self.hits += 1
+            return error_type
+
+    def put(self, feed_url: str, error_type: str):
+        if self.ttl(error_type) <= 0:
+            return
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO probe_results"
+                " (feed_url, error_type, redirect_target, checked_at, last_used, probe_mode)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (feed_url, error_type, redirect_target(error_type), now, now, self.mode)
+            )
+            self._puts += 1
+            # Don't commit or check the size on every insert
+            if self._puts % 1000 == 0:
+                self._evict()
+            elif self._puts % 100 == 0:
+                self.connection.commit()
+
+    def _evict(self):
+        # Remove the least recently used results over 'max_entries' (the lock is already taken)
+        count = self.connection.execute("SELECT COUNT(*) FROM probe_results").fetchone()[0]
+        extra = count - self.max_entries
+        if extra > 0:
+            self.connection.execute(
+                "DELETE FROM probe_results WHERE feed_url IN"
+                " (SELECT feed_url FROM probe_results ORDER BY last_used LIMIT ?)", (extra,)
+            )
+            self.evicted += extra
+        self.connection.commit()
+
+    def cached(self, probe, keep=None):
+        """
+        Wrap a probe (feed_url -> error_type) so it returns (error_type, from_cache)
+        and only calls 'probe' when the cache has no valid result.
+        'keep' is called in the thread of the probe, right after it, and returns
+        False for a result that must not be saved (e.g. feed_probe.ProbeClient.probed,
+        False for the URLs short-circuited by the breaker).
+        """
+        def cached_probe(feed_url):
+            error_type = self.get(feed_url)
+            if error_type is not None:
+                return error_type, True
+            error_type = probe(feed_url)
+            if keep is None or keep():
+                self.put(feed_url, error_type)
+            return error_type, False
+
+        return cached_probe
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "expired": self.expired, "evicted": self.evicted}
+
+    def close(self):
+        with self.lock:
+            self._evict()
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
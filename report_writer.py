@@ -0,0 +1,202 @@
+# import libraries
+import csv
+import os
+
+REPORT_FORMATS = ("xlsx", "csv", "parquet")
+
+
+def report_file_name(base_name, output_format="xlsx"):
+    """
+    Return 'base_name' with the extension of the format ("20Days_20240101" -> "20Days_20240101.csv").
+    """
+    if output_format not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format '{output_format}', use one of {REPORT_FORMATS}")
+    return f"{os.path.splitext(base_name)[0]}.{output_format}"
+
+
+def report_format(file_path):
+    """
+    Return the report format of a file by its extension.
+    """
+    extension = os.path.splitext(file_path)[1].lower().lstrip(".")
+    if extension not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format for '{file_path}', use one of {REPORT_FORMATS}")
+    return extension
+
+
+# --- Row by row writers ---
+# All of them write the rows as they come (nothing is kept in memory but a small
+# batch) and have the same methods: append(row) and close().
+class XlsxReportWriter:
+    """
+    openpyxl write-only workbook: the rows are streamed to the file instead of
+    kept as cells in memory.
+    """
+    def __init__(self, path, headers, sheet_title="Error_Feeds"):
+        import openpyxl
+
+        self.path = path
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(title=sheet_title)
+        self.ws.append(headers)
+
+    def append(self, row):
+        self.ws.append(row)
+
+    def add_sheet(self, title, headers):
+        """
+        Add another sheet to the workbook and return it (it has append(row) too).
+        The rows of the sheets can be appended in any order.
+        """
+        ws = self.wb.create_sheet(title=title)
+        ws.append(headers)
+        return ws
+
+    def close(self):
+        self.wb.save(self.path)
+
+
+class CsvReportWriter:
+    def __init__(self, path, headers, sheet_title=None):
+        self.path = path
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+
+    def append(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetReportWriter:
+    """
+    Parquet file written in row groups of 'batch_size' rows (needs pyarrow).
+    'column_types' gives the Arrow type of some columns (e.g. {"Bucket": "int64"}),
+    the type of the others is taken from the rows: the first row group waits
+    until every one of them has a value, and a column without any is saved as text.
+    """
+    def __init__(self, path, headers, sheet_title=None, batch_size=50000, column_types=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("The parquet format needs pyarrow: pip install pyarrow")
+
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.headers = list(headers)
+        self.batch_size = batch_size
+        self.column_types = {name: pyarrow.type_for_alias(type_name) if isinstance(type_name, str) else type_name
+                             for name, type_name in (column_types or {}).items()}
+        self.untyped = [index for index, name in enumerate(self.headers) if name not in self.column_types]
+        self.rows = []
+        self.writer = None
+
+    def append(self, row):
+        self.rows.append(row)
+        if self.writer is None and self.untyped:
+            # Keep the columns still without a value out of the schema until they get one
+            self.untyped = [index for index in self.untyped if row[index] is None]
+        if len(self.rows) >= self.batch_size and not (self.writer is None and self.untyped):
+            self._flush()
+
+    def _flush(self):
+        columns = list(zip(*self.rows)) if self.rows else [[] for _ in self.headers]
+        if self.writer is None:
+            fields = []
+            for name, values in zip(self.headers, columns):
+                if name in self.column_types:
+                    fields.append(self.pa.field(name, self.column_types[name]))
+                    continue
+                field_type = self.pa.array(list(values)).type
+                # A column with only empty values in the whole report is saved as text
+                fields.append(self.pa.field(name, self.pa.string() if self.pa.types.is_null(field_type) else field_type))
+            self.writer = self.pq.ParquetWriter(self.path, self.pa.schema(fields))
+        table = self.pa.table({name: list(values) for name, values in zip(self.headers, columns)},
+                              schema=self.writer.schema)
+        self.writer.write_table(table)
+        self.rows = []
+
+    def close(self):
+        if self.rows or self.writer is None:
+            self._flush()
+        self.writer.close()
+
+
+REPORT_WRITERS = {
+    "xlsx": XlsxReportWriter,
+    "csv": CsvReportWriter,
+    "parquet": ParquetReportWriter,
+}
+
+
+def open_report_writer(path, headers, output_format=None, sheet_title="Error_Feeds", column_types=None):
+    """
+    Return the writer of 'output_format' (by default the extension of 'path').
+    'column_types' ({column: Arrow type name}) is only used by the parquet writer.
+    """
+    output_format = output_format or report_format(path)
+    if output_format not in REPORT_WRITERS:
+        raise ValueError(f"Unknown report format '{output_format}', use one of {REPORT_FORMATS}")
+    if output_format == "parquet":
+        return ParquetReportWriter(path, headers, sheet_title=sheet_title, column_types=column_types)
+    return REPORT_WRITERS[output_format](path, headers, sheet_title=sheet_title)
+
+
+# --- pandas steps (group_feed.py and Join.py) ---
+def excel_engine():
+    """
+    Return the pandas engine that reads the xlsx files: "calamine" if it's
+    installed (pip install python-calamine, pandas 2.2+), several times faster
+    than "openpyxl", the default otherwise.
+    """
+    import importlib.util
+    import pandas as pd
+
+    pandas_version = tuple(int(part) for part in pd.__version__.split(".")[:2] if part.isdigit())
+    if pandas_version >= (2, 2) and importlib.util.find_spec("python_calamine") is not None:
+        return "calamine"
+    return "openpyxl"
+
+
+def save_dataframe(df, path, output_format=None):
+    """
+    Save a DataFrame as xlsx, csv or parquet (by default by the extension of 'path').
+    """
+    output_format = output_format or report_format(path)
+    if output_format == "xlsx":
+        df.to_excel(path, index=False)
+    elif output_format == "csv":
+        df.to_csv(path, index=False)
+    elif output_format == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Unknown report format '{output_format}', use one of {REPORT_FORMATS}")
+
+
+def read_report(path, **kwargs):
+    """
+    Read a report saved as xlsx, csv or parquet into a DataFrame.
+    """
+    import pandas as pd
+
+    input_format = report_format(path)
+    if input_format == "xlsx":
+        return pd.read_excel(path, header=0, engine=excel_engine(), **kwargs)
+    if input_format == "csv":
+        return pd.read_csv(path, **kwargs)
+    try:
+        return pd.read_parquet(path, **kwargs)
+    except TypeError:
+        # pandas can't rebuild the Arrow list columns (group_feed's "arrow" output)
+        # from the file metadata, read them as Arrow columns
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, **kwargs)
+        return table.to_pandas(ignore_metadata=True,
+                               types_mapper=lambda arrow_type: pd.ArrowDtype(arrow_type)
+                               if pa.types.is_nested(arrow_type) else None)
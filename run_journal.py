@@ -0,0 +1,177 @@
+# import libraries
+import json
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+
+from error_pipeline import ErrorRecord
+
+# --- Journal of a report run ---
+# An append-only JSONL file, one line per event, written as the run goes:
+#
+#     {"type": "run", "settings": {...}, "started": "..."}   once, when the run starts
+#     {"type": "search"}                                      a search (or a new one on resume) starts
+#     {"type": "record", "record": [url, errorDate, days]}    a feed returned by the search
+#     {"type": "search_done"}                                 the search returned every feed
+#     {"type": "row", "row": [...]}                           a probed feed (a report row)
+#     {"type": "finished"}                                    the run finished
+#
+# A run started with resume=True reads it back: the rows already probed are not
+# probed again, and if the search had finished its feeds are taken from the
+# journal instead of searching again. A last line cut by a crash is dropped.
+JOURNAL_VERSION = 1
+
+
+class JournalError(ValueError):
+    """
+    The journal can't be resumed: it's damaged or of a run with other settings.
+    """
+
+
+def _check_run(path, entry, settings):
+    # The "run" line of a journal must be of this version and these settings to resume it
+    if entry.get("version") != JOURNAL_VERSION or entry.get("settings") != settings:
+        raise JournalError(f"The journal '{path}' is of a run with other settings "
+                           f"({entry.get('settings')}), run without --resume to start a new one")
+
+
+def check_journal(path, settings):
+    """
+    Raise JournalError if the journal at 'path' can't be resumed with
+    'settings', without changing it. A missing journal is fine (a new run starts).
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        line = f.readline()
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        raise JournalError(f"The journal '{path}' is damaged at line 1")
+    if entry.get("type") != "run":
+        raise JournalError(f"The journal '{path}' is damaged at line 1")
+    _check_run(path, entry, settings)
+
+
+def _encode_date(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _decode_date(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+class RunJournal:
+    """
+    Journal of the run at 'path'. 'settings' (a dict saved with the run) must
+    be the same to resume it (JournalError otherwise). Without 'resume' (or
+    without a journal to resume) a new journal replaces the old one.
+    Every line is flushed as it's written, so a run that dies keeps everything
+    done until then.
+    """
+    def __init__(self, path, settings, resume=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.started = None
+        self.records = []   # the feeds of the last search
+        self.rows = []      # the rows already probed
+        self.search_done = False
+        self.finished = False
+
+        if resume and os.path.exists(path):
+            self._read(settings)
+            self.file = open(path, "a", encoding="utf-8")
+        else:
+            if resume:
+                print(f"No journal '{path}' to resume, starting a new run")
+            self.started = datetime.now()
+            self.file = open(path, "w", encoding="utf-8")
+            self._write({"type": "run", "version": JOURNAL_VERSION, "settings": settings,
+                         "started": self.started.isoformat()})
+
+    def _read(self, settings):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # The last line was cut when the run died, drop it so the new lines start clean
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+
+        for number, line in enumerate(data[:end].decode("utf-8").splitlines()):
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                raise JournalError(f"The journal '{self.path}' is damaged at line {number + 1}")
+
+            entryType = entry.get("type")
+            if entryType == "run":
+                _check_run(self.path, entry, settings)
+                self.started = datetime.fromisoformat(entry["started"])
+            elif entryType == "search":
+                self.records = []
+                self.search_done = False
+            elif entryType == "record":
+                url, error_date, days_error = entry["record"]
+                self.records.append(ErrorRecord(url, _decode_date(error_date), days_error))
+            elif entryType == "search_done":
+                self.search_done = True
+            elif entryType == "row":
+                row = entry["row"]
+                row[1] = _decode_date(row[1])
+                self.rows.append(row)
+            elif entryType == "finished":
+                self.finished = True
+
+    def _write(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def _not_probed(self, records):
+        # Skip a record per row already probed for its URL (a URL can be in several records)
+        probed = Counter(row[0] for row in self.rows)
+        for record in records:
+            if probed[record.feed_url]:
+                probed[record.feed_url] -= 1
+                continue
+            yield record
+
+    def pending_records(self):
+        """
+        Return the feeds of the finished search that are not probed yet.
+        """
+        return list(self._not_probed(self.records))
+
+    def track_search(self, records):
+        """
+        Save every ErrorRecord of a new search as it's read and yield the ones
+        that are not probed yet.
+        """
+        self._write({"type": "search"})
+        self.records = []
+        self.search_done = False
+
+        def listed():
+            for record in records:
+                self._write({"type": "record",
+                             "record": [record.feed_url, _encode_date(record.error_date), record.days_error]})
+                yield record
+            self._write({"type": "search_done"})
+            self.search_done = True
+
+        return self._not_probed(listed())
+
+    def add_row(self, row):
+        self._write({"type": "row", "row": [row[0], _encode_date(row[1])] + list(row[2:])})
+
+    def finish(self):
+        self._write({"type": "finished"})
+        self.finished = True
+
+    def close(self):
+        self.file.close()
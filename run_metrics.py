@@ -0,0 +1,215 @@
+# import libraries
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from probe_cache import error_class
+
+# Upper bounds (seconds) of the probe latency histogram of the Prometheus file
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LOG_LEVELS = ("debug", "info", "warning")
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest rank percentile of an already sorted list (None if it's empty).
+    """
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class RunMetrics:
+    """
+    Timings and counters of a report run, safe to update from several threads.
+
+    'stages' has the wall-clock seconds of every stage (added up if a stage runs
+    several times), 'latencies' the seconds of every probe by error class and
+    'counters' the totals (timeouts, redirects, HTTP requests, cache hits...).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = datetime.now()
+        self.stages = {}
+        self.latencies = {}
+        self.counters = {}
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the block as the stage 'name': with metrics.stage("join"): ...
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_probe(self, error_type, seconds):
+        # Used as the 'on_probe' of a feed_probe.ProbeClient
+        errorClass = error_class(error_type)
+        with self.lock:
+            self.latencies.setdefault(errorClass, []).append(seconds)
+        if errorClass == "TIMEOUT_ERROR":
+            self.count("timeouts")
+
+    def first_item(self, items, stage, start):
+        """
+        Yield 'items', recording as 'stage' the time from 'start' (a perf_counter
+        value) to the first item, e.g. the latency of the first cursor batch.
+        """
+        first = True
+        for item in items:
+            if first:
+                self.add_time(stage, time.perf_counter() - start)
+                first = False
+            yield item
+
+    def summary(self):
+        """
+        Return the metrics as a dictionary (the content of the JSON file).
+        """
+        with self.lock:
+            latencies = {errorClass: sorted(values) for errorClass, values in self.latencies.items()}
+            stages = dict(self.stages)
+            counters = dict(self.counters)
+
+        allLatencies = sorted(value for values in latencies.values() for value in values)
+        probes = {}
+        for errorClass, values in sorted(latencies.items()) + [("ALL", allLatencies)]:
+            if values:
+                probes[errorClass] = {
+                    "count": len(values),
+                    "p50": round(percentile(values, 0.50), 4),
+                    "p95": round(percentile(values, 0.95), 4),
+                    "p99": round(percentile(values, 0.99), 4),
+                    "max": round(values[-1], 4),
+                }
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "stages": {name: round(seconds, 4) for name, seconds in stages.items()},
+            "probes": probes,
+            "counters": counters,
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def write_prometheus(self, path):
+        """
+        Save the metrics in the Prometheus text format (for the node_exporter
+        textfile collector): stage gauges, a probe latency histogram by error
+        class and the counters.
+        """
+        summary = self.summary()
+        with self.lock:
+            latencies = {errorClass: list(values) for errorClass, values in self.latencies.items()}
+
+        lines = [
+            "# HELP feed_report_stage_seconds Wall-clock seconds of every stage of the report run.",
+            "# TYPE feed_report_stage_seconds gauge",
+        ]
+        for name, seconds in summary["stages"].items():
+            lines.append(f'feed_report_stage_seconds{{stage="{_label(name)}"}} {seconds}')
+
+        lines += [
+            "# HELP feed_report_probe_latency_seconds Latency of the feed probes by error class.",
+            "# TYPE feed_report_probe_latency_seconds histogram",
+        ]
+        for errorClass, values in sorted(latencies.items()):
+            label = _label(errorClass)
+            for bound in LATENCY_BUCKETS:
+                below = sum(1 for value in values if value <= bound)
+                lines.append(f'feed_report_probe_latency_seconds_bucket{{class="{label}",le="{bound}"}} {below}')
+            lines.append(f'feed_report_probe_latency_seconds_bucket{{class="{label}",le="+Inf"}} {len(values)}')
+            lines.append(f'feed_report_probe_latency_seconds_sum{{class="{label}"}} {round(sum(values), 4)}')
+            lines.append(f'feed_report_probe_latency_seconds_count{{class="{label}"}} {len(values)}')
+
+        for name, value in sorted(summary["counters"].items()):
+            lines += [
+                f"# TYPE feed_report_{name}_total counter",
+                f"feed_report_{name}_total {value}",
+            ]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def save(self, json_path=None, prometheus_path=None):
+        """
+        Print the summary and save the JSON and Prometheus files that have a path.
+        """
+        self.print_summary()
+        if json_path:
+            self.write_json(json_path)
+            print(f"Metrics saved to '{json_path}'")
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+            print(f"Prometheus metrics saved to '{prometheus_path}'")
+
+    def print_summary(self):
+        summary = self.summary()
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in summary["stages"].items())
+        print(f"\nStages: {stages}")
+        for errorClass, probe in summary["probes"].items():
+            print(f"  {errorClass}: {probe['count']} probes, p50 {probe['p50']:.3f}s, "
+                  f"p95 {probe['p95']:.3f}s, p99 {probe['p99']:.3f}s")
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class UrlLog:
+    """
+    Console line of every probed URL, by level:
+        "debug":   every URL
+        "info":    at most 'per_second' URL lines a second, the URLs not shown
+                   are counted in the next line
+        "warning": no URL lines
+    Printing every URL of a large run slows the loop down.
+    """
+    def __init__(self, level="info", per_second=5):
+        if level not in LOG_LEVELS:
+            raise ValueError(f"Unknown log level '{level}', use one of {LOG_LEVELS}")
+        self.level = level
+        self.per_second = per_second
+        self.window_start = 0.0
+        self.shown = 0
+        self.skipped = 0
+
+    def url(self, feed_url, error_type):
+        if self.level == "warning":
+            return
+        line = f"  Processing URL: {feed_url} -> Error Type: {error_type}"
+        if self.level == "debug":
+            print(line)
+            return
+
+        now = time.monotonic()
+        if now - self.window_start >= 1:
+            self.window_start = now
+            self.shown = 0
+        if self.shown < self.per_second:
+            if self.skipped:
+                line += f"  ({self.skipped} URLs not shown)"
+                self.skipped = 0
+            print(line)
+            self.shown += 1
+        else:
+            self.skipped += 1
+
+    def close(self):
+        if self.skipped:
+            print(f"  ... {self.skipped} more URLs not shown")
+            self.skipped = 0
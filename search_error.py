@@ -1,219 +1,147 @@
 # import libraries
-from pymongo import MongoClient
-from datetime import datetime, timedelta
-import openpyxl
-import requests
-from requests.exceptions import ConnectionError, Timeout, RequestException
+# Nothing runs at import: the search is done by main(), and pymongo and requests
+# are only imported there
+import sys
+from feedErrorReport import GenerateErrors
+from run_journal import JournalError
+from run_metrics import RunMetrics
 
 # --- DATE TO USE ---
-# Connecting to the URI
-client = MongoClient('mongodb+srv://r_personal:link') # Replace whit your srv link
+# URI to connect to
+mongo_uri = 'mongodb+srv://r_personal:link' # Replace whit your srv link
 
 # Days the error needs to be older than
 days_subtract = 24 # you can change the date
-now = datetime.now()
-error_days_ago = now - timedelta(days=days_subtract)
 
-print(f"Filtering for errorDate (first error after last IDLE) older than: {error_days_ago}")
+# Several thresholds in one run, e.g. [7, 14, 24, 60] (None = only days_subtract): the search
+# and the probes run once with the smallest, every row gets its 'Bucket' (the largest threshold
+# its error is older than) and the xlsx also gets a sheet per threshold
+report_buckets = None
+
+# URLs probed at the same time (1 = one by one, e.g. 16 to probe them concurrently)
+# and the limit for a single host
+probe_concurrency = 1
+max_per_host = 4
+
+# Classify the feeds with a HEAD request (or a GET that reads at most probe_max_bytes)
+# instead of downloading the whole feed (False = a full GET, like the original script)
+lightweight_probe = False
+probe_max_bytes = 8192
+
+# Seconds a probe waits for the connection and for the answer. After host_breaker_threshold
+# consecutive connection errors or timeouts (and one confirmation probe) the other URLs of
+# that host get the same error without a request (0 = always probe, e.g. 5 to skip the broken
+# hosts). With adaptive_timeouts the timeouts of every host follow its latency
+connect_timeout = 10
+read_timeout = 10
+host_breaker_threshold = 0
+adaptive_timeouts = False
+
+# Probes a second to one host (None = no limit) and how many it can get at once.
+# The 429/502/503/504 answers are probed again up to probe_retries times (0 = never), waiting
+# what their Retry-After asks for (or a growing pause with some randomness)
+host_rate_limit = None
+host_rate_burst = 1
+probe_retries = 0
+
+# Keep the probe results in a cache file and don't probe the URLs checked recently.
+# With force_refresh every URL is probed again (and the cache is updated)
+use_probe_cache = False
+probe_cache_path = "search_error_cache.sqlite3"
+force_refresh = False
+
+# Keep a journal of the feeds found and probed by the run. With resume_run the run goes on
+# with the one of run_journal_path that was stopped or died: only the feeds it didn't probe are probed
+use_run_journal = False
+run_journal_path = "report_journal.jsonl"
+resume_run = False
+
+# Keep a per feed error state in a side collection and read only the log entries
+# added since the last run, instead of grouping the whole feed_status_log
+incremental_search = False
+
+# Take the feeds from the state file kept by `python live_tracker.py follow` instead of
+# searching the log (None = search the log)
+live_state_path = None
+
+# Use the pipeline that pre-filters the statuses and doesn't build per feed date arrays
+# (MongoDB 5.0+, create its index once with error_pipeline.ensure_error_indexes)
+optimized_pipeline = False
+
+# How to join with the 'feeds' collection: "embedded" ($lookup of the whole documents),
+# "pipeline" ($lookup of the status only) or "batched" (one find per chunk of URLs)
+feeds_lookup = "embedded"
+
+# Read the cursor, probe and write at the same time, joined by queues of stream_queue_size rows.
+# cursor_batch_size is the batchSize of the aggregation cursor (None = server default)
+streaming_run = False
+stream_queue_size = 1000
+cursor_batch_size = None
+
+# Split the feedUrl keyspace into search_shards ranges, searched as separate aggregations,
+# shard_parallelism of them at the same time (1 = a single aggregation)
+search_shards = 1
+shard_parallelism = 4
+
+# Format of the report file: "xlsx", "csv" or "parquet" (needs pyarrow)
+report_format_name = "xlsx"
+
+# URL lines: "debug" (every URL), "info" (a few per second) or "warning" (none).
+# Stage timings, probe latencies and counters are saved to metrics_path (JSON) and,
+# if set, to prometheus_path (Prometheus text format)
+url_log_level = "info"
+metrics_path = "run_metrics.json"
+prometheus_path = None
+
+
+def search_options():
+    """
+    Return the options of feedErrorReport.search_error_rows from the settings above.
+    """
+    return {
+        "concurrency": probe_concurrency,
+        "max_per_host": max_per_host,
+        "lightweight": lightweight_probe,
+        "max_bytes": probe_max_bytes,
+        "cache_path": probe_cache_path if use_probe_cache else None,
+        "force_refresh": force_refresh,
+        "incremental": incremental_search,
+        "optimized": optimized_pipeline,
+        "lookup": feeds_lookup,
+        "streaming": streaming_run,
+        "batch_size": cursor_batch_size,
+        "queue_size": stream_queue_size,
+        "shards": search_shards,
+        "shard_parallelism": shard_parallelism,
+        "log_level": url_log_level,
+        "connect_timeout": connect_timeout,
+        "read_timeout": read_timeout,
+        "breaker_threshold": host_breaker_threshold,
+        "adaptive_timeouts": adaptive_timeouts,
+        "rate_limit": host_rate_limit,
+        "rate_burst": host_rate_burst,
+        "retries": probe_retries,
+        "live_state": live_state_path,
+        "buckets": report_buckets,
+        "journal_path": run_journal_path if use_run_journal or resume_run else None,
+        "resume": resume_run,
+        "uri": mongo_uri,
+        "report_redirects": True,
+    }
 
-# Selecting the DB
-db = client.feedreader
 
-# --- Web Request Function ---
-def feed_error_type(feed_url: str) -> str:
+def main():
     """
-    Try to search the feed URl and determine the error by it HTTP state.
+    Search the feeds with errors older than days_subtract, probe them and save
+    the report, with the settings above (see feedErrorReport.search_error_rows).
     """
+    runMetrics = RunMetrics()
     try:
-        # Create a User-Agent to simulate a browser
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(feed_url, timeout=10, allow_redirects=True, headers=headers)
-
-        sCode = response.status_code
-
-        # Check for redirects
-        if response.history:
-            # The last response in history is the one that redirected to the final URL
-            redirect_response = response.history[-1]
-            return f"REDIRECTED: {redirect_response.url} -> {response.url}"
-
-        # If the code is 200 it could be html or have some error on the xml
-        content_type = response.headers.get("Content-Type", "").lower()
-        if sCode == 200:
-            if "text/html" in content_type:
-                return "HTML_FORMAT"
-            return "NOT_VALIDATED"
-        else:
-            return "ERROR_"+str(sCode) # return the error code
-
-    # Other posible error if we can't reach the feed URL
-    except ConnectionError:
-        return "CONNECTION_ERROR"
-    except Timeout:
-        return "TIMEOUT_ERROR"
-    except RequestException as e:
-        return f"REQUEST_FAILED: {type(e).__name__}"
-    except Exception as e:
-        return f"UNKNOWN_ERROR: {type(e).__name__}"
-    
-
-# --- Extract the URL that have errors later than days_subtract ---
-# Selecting the collection feed_status_log
-feedsStatusColeccion = db.feed_status_log
-
-# The aggregation pipeline translated from JavaScript to Python dictionary format
-aggregation_pipeline = [
-    {
-        "$group": {
-            # Select the feed URL that has at least one READING_ERROR
-            "_id": "$feedUrl",
-            "count": {"$sum": 1},
-            "errors": {
-                "$sum": {
-                    "$cond": {
-                        "if": {"$eq": ["$status", "READING_ERROR"]},
-                        "then": 1,
-                        "else": 0
-                    }
-                }
-            },
-            # This is the date of the oldest "READING_ERROR_DURING_ATTEMPT" found for this feedUrl (overall)
-            "earliestReadingErrorDate": {
-                "$min": {
-                    "$cond": {
-                        "if": {"$eq": ["$status", "READING_ERROR_DURING_ATTEMPT"]},
-                        "then": "$date",
-                        "else": None
-                    }
-                }
-            },
-            # Calculate the most recent "IDLE" date for this feedUrl
-            "latestIdleDate": {
-                "$max": {
-                    "$cond": {
-                        "if": {"$eq": ["$status", "IDLE"]},
-                        "then": "$date",
-                        "else": None
-                    }
-                }
-            },
-            # Collect all "READING_ERROR_DURING_ATTEMPT" dates into an array
-            "allReadingErrorDates": {
-                "$push": {
-                    "$cond": {
-                        "if": {"$eq": ["$status", "READING_ERROR_DURING_ATTEMPT"]},
-                        "then": "$date",
-                        "else": "$$REMOVE"
-                    }
-                }
-            }
-        }
-    },
-    {
-        # Calculate 'errorDate' based on aggregated values from the previous group
-        "$addFields": {
-            # 'errorDate' will be the ldest READING_ERROR_ATTEMPT date after the latest IDLE,
-            # or the oldest overall READING_ERROR_ATTEMPT if no IDLE occurred.
-            "errorDate": {
-                "$cond": {
-                    "if": {"$eq": ["$latestIdleDate", None]}, 
-                    "then": "$earliestReadingErrorDate",      
-                    "else": {  
-                        "$min": {  
-                            "$filter": {  
-                                "input": "$allReadingErrorDates",
-                                "as": "errDate",
-                                "cond": {"$gt": ["$$errDate", "$latestIdleDate"]}
-                            }
-                        }
-                    }
-                }
-            }
-        }
-    },
-    {
-        # 
-        "$match": {
-            "errors": {"$gt": 0},  # Keep groups that have errors
-            "errorDate": {"$lte": error_days_ago}  # Filter groups where 'errorDate' is older than 'error_days_ago'
-        }
-    },
-    {
-        "$lookup": {
-            "from": "feeds",
-            "localField": "_id",
-            "foreignField": "feedUrl",
-            "as": "feedInfo"
-        }
-    },
-    {
-        # Ensure there's a matching feedInfo document and its status is not "NOT_AVAILABLE"
-        "$match": {
-            "feedInfo": {"$ne": []},
-            "feedInfo.status": {"$ne": "NOT_AVAILABLE"}
-        }
-    },
-    {
-        "$unwind": "$feedInfo"
-    },
-    {
-        "$project": {
-            "_id": 1, # The feed URL
-            "errorDate": 1, # The calculated "date this error start"
-            "days_error": { # the day since this error start (example: 25 days)
-                "$dateDiff": {
-                    "startDate": "$errorDate",
-                    "endDate": "$$NOW",
-                    "unit": "day",
-                }
-            }
-        }
-    }
-]
-# Process the search in the DB
-errorCursor = feedsStatusColeccion.aggregate(aggregation_pipeline)
-
-# --- Save everything to an Excel file ---
-wb = openpyxl.Workbook() # Create a new Excel workbook
-ws = wb.active # Select the active sheet
-ws.title = "Error_Feeds"
-
-# -- Write the headers
-headers = [
-    "Feed_URL",
-    "Error_Start_Date",
-    "Days_Since_Error_Start",
-    "Error_type"
-]
-ws.append(headers)
-
-# -- Write the data to the Excel file
-print("\nInitiating web requests for 'Error_type' determination...")
-
-for element in errorCursor:
-    feed_url = element["_id"]
-    calculated_error_start_date = element.get("errorDate")
-    days_since_error_start = element.get("days_error")
-
-    # --- Determine the error_type by making a web request ---
-    error_type = feed_error_type(feed_url)
-    print(f"  Processing URL: {feed_url} -> Error Type: {error_type}")
-
-    # Add a row with the data to Excel
-    ws.append([
-        feed_url,
-        calculated_error_start_date,
-        days_since_error_start,
-        error_type
-    ])
-
-# --- Save the Excel file ---
-fecha_str = now.strftime("%Y%m%d")
-excel_file_name = f"{str(days_subtract)}Days_{fecha_str}.xlsx"
-wb.save(excel_file_name)
-
-print(f"\nData saved successfully to '{excel_file_name}'")
-
-# Close the connection
-client.close()
-print("\nConnection to MongoDB closed.")
\ No newline at end of file
+        GenerateErrors(days_subtract, output_format=report_format_name, metrics=runMetrics, **search_options())
+    except JournalError as e:
+        sys.exit(str(e))
+    runMetrics.save(metrics_path, prometheus_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# import libraries
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Sharded error search ---
+# The feedUrl keyspace is split into ranges and the same pipeline runs on every
+# range at the same time, each one with its own cursor (and its own $group, that
+# only holds the feeds of its range). A feed is always in a single range, so the
+# merged rows are the same as the ones of one aggregate call, in another order.
+_SHARD_DONE = object() # marks the end of a shard
+
+
+class _ShardError:
+    # Carries the exception of a shard thread to the consumer
+    def __init__(self, error):
+        self.error = error
+
+
+def shard_boundaries(collection, shards, field="feedUrl", sample_size=10000):
+    """
+    Return the shards - 1 values of 'field' that split the collection into ranges
+    with about the same number of documents, taken with $bucketAuto from a
+    $sample of 'sample_size' documents (so the whole collection isn't scanned).
+    There can be fewer boundaries if the sample has few distinct URLs.
+    """
+    if shards <= 1:
+        return []
+    buckets = collection.aggregate([
+        {"$sample": {"size": sample_size}},
+        {"$bucketAuto": {"groupBy": f"${field}", "buckets": shards}}
+    ])
+    # Every bucket but the first starts a new range
+    return sorted({bucket["_id"]["min"] for bucket in buckets if isinstance(bucket["_id"]["min"], str)})[1:]
+
+
+def shard_ranges(boundaries):
+    """
+    Return the (lower, upper) ranges of the boundaries, the first and the last
+    open (None): [b1, b2] -> [(None, b1), (b1, b2), (b2, None)].
+    """
+    boundaries = list(boundaries)
+    return list(zip([None] + boundaries, boundaries + [None]))
+
+
+def shard_match_stage(lower, upper, field="feedUrl"):
+    """
+    $match of the documents with lower <= field < upper (an open end is None).
+    The first range is "not >= upper", so it also gets the documents without
+    the field or with a value of another type and no document is left out.
+    """
+    if lower is None and upper is None:
+        return {"$match": {}}
+    if lower is None:
+        return {"$match": {field: {"$not": {"$gte": upper}}}}
+    condition = {"$gte": lower}
+    if upper is not None:
+        condition["$lt"] = upper
+    return {"$match": {field: condition}}
+
+
+def sharded_aggregate(collection, pipeline, boundaries, field="feedUrl", parallelism=4,
+                      batch_size=None, queue_size=1000):
+    """
+    Run 'pipeline' on every range of 'boundaries' (see shard_ranges), at most
+    'parallelism' ranges at the same time, and yield the documents of all of
+    them as they arrive. The pipeline must group by 'field', as the error search
+    does. The shards share the connection pool of the collection's MongoClient
+    (its maxPoolSize must be at least 'parallelism'). The time and rows of every
+    shard are printed when it finishes.
+    """
+    ranges = shard_ranges(boundaries)
+    results = queue.Queue(maxsize=queue_size)
+    stopping = threading.Event()
+    aggregate_options = {"batchSize": batch_size} if batch_size else {}
+
+    def put(value):
+        # Wait for room in the queue, but give up if the consumer is gone
+        while not stopping.is_set():
+            try:
+                results.put(value, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run_shard(number, lower, upper):
+        if stopping.is_set():
+            return
+        start = time.perf_counter()
+        rows = 0
+        try:
+            with collection.aggregate([shard_match_stage(lower, upper, field)] + pipeline,
+                                      **aggregate_options) as cursor:
+                for document in cursor:
+                    if not put(document):
+                        return
+                    rows += 1
+            print(f"  Shard {number}/{len(ranges)} [{lower} .. {upper}): "
+                  f"{rows} rows in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            put(_ShardError(e))
+        finally:
+            put(_SHARD_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, parallelism))
+    try:
+        for number, (lower, upper) in enumerate(ranges, 1):
+            executor.submit(run_shard, number, lower, upper)
+
+        finished = 0
+        while finished < len(ranges):
+            value = results.get()
+            if value is _SHARD_DONE:
+                finished += 1
+            elif isinstance(value, _ShardError):
+                raise value.error
+            else:
+                yield value
+    finally:
+        stopping.set()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,133 @@
+# import libraries
+import queue
+import threading
+
+from feed_probe import probe_feeds
+
+_DONE = object() # marks the end of a stage
+
+
+class _StageError:
+    # Carries the exception of a stage thread to the consumer
+    def __init__(self, error):
+        self.error = error
+
+
+class StreamingPipeline:
+    """
+    Three stages that run at the same time, joined by bounded queues:
+
+        cursor reader -> probe workers (probe_feeds) -> writer (the consumer)
+
+    Iterate over it to get (item, result) in the order of 'source'. When a
+    queue is full the stage before it waits (backpressure), so the memory
+    stays bounded and the run takes about as long as the slowest stage.
+    Call stop() (e.g. on Ctrl-C) and then drain() to get the results that
+    were already probed, in order or not.
+    """
+    def __init__(self, source, probe, key=None, workers=16, max_per_host=4, queue_size=1000):
+        self.source = source
+        self.probe = probe
+        self.key = key
+        self.workers = workers
+        self.max_per_host = max_per_host
+
+        self.to_probe = queue.Queue(maxsize=queue_size)
+        self.to_write = queue.Queue(maxsize=queue_size)
+        self.stopping = threading.Event()
+        self.threads = []
+        self.source_error = None
+        self.stopped_results = [] # probed after stop(), kept for drain()
+
+    def _put(self, target, value):
+        # Wait for room in the queue, but give up if the pipeline is stopping
+        while not self.stopping.is_set():
+            try:
+                target.put(value, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read_source(self):
+        try:
+            for item in self.source:
+                if not self._put(self.to_probe, item):
+                    return
+        except Exception as e:
+            self._put(self.to_probe, _StageError(e))
+        finally:
+            self._put(self.to_probe, _DONE)
+
+    def _queued_items(self):
+        while True:
+            try:
+                item = self.to_probe.get(timeout=0.2)
+            except queue.Empty:
+                if self.stopping.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                # Passed on by _probe_items after the items read before it are probed
+                self.source_error = item
+                return
+            yield item
+
+    def _probe_items(self):
+        try:
+            for item, result in probe_feeds(self._queued_items(), self.probe, key=self.key,
+                                            max_workers=self.workers, max_per_host=self.max_per_host,
+                                            stop=self.stopping):
+                if not self._put(self.to_write, (item, result)):
+                    # Stopping: probe_feeds gives the results it already has and ends
+                    self.stopped_results.append((item, result))
+            if self.source_error is not None and not self.stopping.is_set():
+                self._put(self.to_write, self.source_error)
+        except Exception as e:
+            self._put(self.to_write, _StageError(e))
+        finally:
+            self._put(self.to_write, _DONE)
+
+    def start(self):
+        if not self.threads:
+            for target in (self._read_source, self._probe_items):
+                thread = threading.Thread(target=target, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        return self
+
+    def __iter__(self):
+        self.start()
+        while True:
+            value = self.to_write.get()
+            if value is _DONE:
+                return
+            if isinstance(value, _StageError):
+                raise value.error
+            yield value
+
+    def stop(self):
+        """
+        Stop reading the source and probing. The probes already running are not waited for.
+        """
+        self.stopping.set()
+
+    def drain(self, timeout=5):
+        """
+        Yield the results that were already probed and are waiting to be written,
+        waiting up to 'timeout' seconds for the probe stage to pass on the ones
+        it had finished (after stop()).
+        """
+        if len(self.threads) > 1:
+            self.threads[1].join(timeout)
+        while True:
+            try:
+                value = self.to_write.get_nowait()
+            except queue.Empty:
+                break
+            if value is _DONE or isinstance(value, _StageError):
+                break
+            yield value
+        yield from self.stopped_results
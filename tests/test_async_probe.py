@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+import pytest
+
+from async_probe import classify_many
+from benchmarks.stub_server import start_stub_server
+
+
+@pytest.fixture(scope="module")
+def port():
+    server = start_stub_server("127.0.0.1")
+    yield server.server_address[1]
+    server.shutdown()
+
+
+def test_busy_host_does_not_block_the_others(port):
+    # 127.0.0.1 and localhost are two hosts of the same server: the slow URLs fill
+    # the only slot of the first one, the feeds of the second must not wait for them
+    slow = [f"http://127.0.0.1:{port}/slow?delay=1&i={i}" for i in range(4)]
+    fast = [f"http://localhost:{port}/feed.xml?i={i}" for i in range(8)]
+
+    async def probe_all():
+        start = time.perf_counter()
+        return [(url, time.perf_counter() - start)
+                async for url, _ in classify_many(slow + fast, concurrency=4, max_per_host=1)]
+
+    finished = asyncio.run(probe_all())
+    assert sorted(url for url, _ in finished) == sorted(slow + fast)
+    assert max(seconds for url, seconds in finished if url in fast) < 1
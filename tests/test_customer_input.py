@@ -0,0 +1,41 @@
+import os
+
+import pandas as pd
+import pytest
+
+from customer_input import customer_sidecar_path, read_customers
+
+pytest.importorskip("openpyxl")
+pytest.importorskip("pyarrow")
+
+
+def write_customers(path, feed_ids):
+    pd.DataFrame({"feed_id": feed_ids, "feed_url": [f"http://{n}/feed" for n in range(len(feed_ids))],
+                  "owner_id": 1, "platform_id": 2, "platform_name": "p"}).to_excel(path, index=False)
+
+
+def test_no_sidecar_by_default(tmp_path):
+    path = str(tmp_path / "customers.xlsx")
+    write_customers(path, [1, 2])
+    assert len(read_customers(path)) == 2
+    assert os.listdir(tmp_path) == ["customers.xlsx"]
+
+
+def test_sidecar_is_reused(tmp_path):
+    path = str(tmp_path / "customers.xlsx")
+    write_customers(path, [1, 2])
+    read_customers(path, use_sidecar=True)
+    assert os.path.exists(customer_sidecar_path(path))
+    assert read_customers(path, use_sidecar=True)["feed_id"].tolist() == [1, 2]
+
+
+def test_unsupported_sidecar_is_remembered(tmp_path, capsys):
+    # A column of numbers and text can't be stored by Arrow
+    path = str(tmp_path / "customers.xlsx")
+    write_customers(path, [1, "a"])
+    read_customers(path, use_sidecar=True)
+    assert "can't be saved" in capsys.readouterr().out
+
+    df = read_customers(path, use_sidecar=True)
+    assert df["feed_id"].tolist() == [1, "a"]
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+import search_error
+from benchmarks.stub_server import start_stub_server
+from feed_probe import ProbeClient, interrupted_results, probe_feeds
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = start_stub_server("127.0.0.1")
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_transient_answers_are_not_retried_by_default(base_url):
+    assert search_error.search_options()["retries"] == 0
+    with ProbeClient() as client:
+        assert client.feed_error_type(f"{base_url}/status/503") == "ERROR_503"
+        stats = client.connection_stats()
+    assert stats["requests"] == 1
+    assert stats["retries"] == 0
+
+
+def test_transient_answers_are_retried_when_asked(base_url):
+    with ProbeClient(retries=1, backoff=0.01) as client:
+        assert client.feed_error_type(f"{base_url}/status/503") == "ERROR_503"
+        assert client.connection_stats()["retries"] == 1
+
+
+def slow_first_probe(url):
+    time.sleep(1 if url.endswith("/slow") else 0.01)
+    return "OK"
+
+
+def test_interrupt_keeps_the_results_waiting_for_their_turn():
+    # The fast URLs after the slow one are probed, but wait for it to be yielded in order
+    urls = ["http://a.example/fast", "http://b.example/slow", "http://c.example/fast", "http://d.example/fast"]
+    probed = probe_feeds(urls, slow_first_probe, max_workers=4)
+    assert next(probed) == (urls[0], "OK")
+    time.sleep(0.3)
+    start = time.perf_counter()
+    assert sorted(interrupted_results(probed)) == [(urls[2], "OK"), (urls[3], "OK")]
+    assert time.perf_counter() - start < 0.5  # the slow probe isn't waited for
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.import_time import HEAVY_MODULES, LIGHT_MODULES, REPO_ROOT
+
+
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_light_import(module):
+    # A new process, so the modules loaded by other tests don't count
+    code = f"import sys, {module}; print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == []
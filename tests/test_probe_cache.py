@@ -0,0 +1,22 @@
+from probe_cache import ProbeCache
+
+
+def test_throttled_and_short_circuited_results_are_not_cached(tmp_path):
+    probeCache = ProbeCache(str(tmp_path / "cache.sqlite3"))
+    results = {"http://a/feed": "ERROR_429", "http://b/feed": "CONNECTION_ERROR", "http://c/feed": "ERROR_404"}
+    skipped = {"http://b/feed"} # short-circuited by the breaker
+    last = {}
+
+    def probe(feed_url):
+        last["url"] = feed_url
+        return results[feed_url]
+
+    cached_probe = probeCache.cached(probe, keep=lambda: last["url"] not in skipped)
+    for feed_url in results:
+        assert cached_probe(feed_url) == (results[feed_url], False)
+
+    assert probeCache.get("http://a/feed") is None
+    assert probeCache.get("http://b/feed") is None
+    assert probeCache.get("http://c/feed") == "ERROR_404"
+    assert 0 < probeCache.ttl("ERROR_503") <= 10 * 60
+    probeCache.close()
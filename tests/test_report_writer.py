@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+
+from feedErrorReport import ERROR_REPORT_TYPES, error_report_headers
+from report_writer import ParquetReportWriter, open_report_writer
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def test_parquet_none_only_first_batch(tmp_path):
+    # The first row group has no dates and no buckets, the next one has both
+    path = tmp_path / "report.parquet"
+    headers = error_report_headers(cache_path="cache.sqlite3", buckets=[7, 24])
+    reportWriter = open_report_writer(str(path), headers, column_types=ERROR_REPORT_TYPES)
+    reportWriter.batch_size = 2
+    reportWriter.append(["http://a/feed", None, None, "TIMEOUT", False, None])
+    reportWriter.append(["http://b/feed", None, None, "ERROR_404", True, None])
+    reportWriter.append(["http://c/feed", datetime(2024, 1, 2, 3, 4, 5), 30, "HTML_FORMAT", False, 24])
+    reportWriter.close()
+
+    table = pq.read_table(path)
+    assert table.column_names == headers
+    assert str(table.schema.field("Error_Start_Date").type) == "timestamp[us]"
+    assert table.column("Error_Start_Date").to_pylist() == [None, None, datetime(2024, 1, 2, 3, 4, 5)]
+    assert table.column("Bucket").to_pylist() == [None, None, 24]
+
+
+def test_parquet_untyped_columns_wait_for_a_value(tmp_path):
+    # Without column_types the first row group waits until every column has a value
+    path = tmp_path / "report.parquet"
+    reportWriter = ParquetReportWriter(str(path), ["Feed_URL", "Error_Start_Date", "Note"], batch_size=1)
+    reportWriter.append(["http://a/feed", None, None])
+    reportWriter.append(["http://b/feed", datetime(2024, 1, 2), None])
+    reportWriter.append(["http://c/feed", datetime(2024, 1, 3), None])
+    reportWriter.close()
+
+    table = pq.read_table(path)
+    assert table.column("Error_Start_Date").to_pylist() == [None, datetime(2024, 1, 2), datetime(2024, 1, 3)]
+    # A column empty in the whole report is saved as text
+    assert str(table.schema.field("Note").type) == "string"
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+
+import feedErrorReport
+from feedErrorReport import GenerateErrors, journal_settings
+from run_journal import JournalError, RunJournal, check_journal
+
+
+def test_resume_with_other_settings_keeps_the_report(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    journalPath = str(tmp_path / "report_journal.jsonl")
+    journal = RunJournal(journalPath, journal_settings(24))
+    journal.add_row(["http://a/feed", datetime(2024, 1, 2), 30, "TIMEOUT_ERROR"])
+    journal.close()
+
+    # The report of the interrupted run, which a failed resume must not replace
+    reportPath = tmp_path / f"30Days_{datetime.now().strftime('%Y%m%d')}.csv"
+    reportPath.write_text("Feed_URL\nhttp://a/feed\n")
+    monkeypatch.setattr(feedErrorReport, "search_error_rows", lambda *a, **k: pytest.fail("searched"))
+
+    with pytest.raises(JournalError, match="other settings"):
+        GenerateErrors(30, output_format="csv", journal_path=journalPath, resume=True)
+    assert reportPath.read_text() == "Feed_URL\nhttp://a/feed\n"
+
+
+def test_check_journal(tmp_path):
+    journalPath = str(tmp_path / "report_journal.jsonl")
+    check_journal(journalPath, journal_settings(24)) # no journal: a new run
+    RunJournal(journalPath, journal_settings(7, buckets=[24, 7])).close()
+    check_journal(journalPath, journal_settings(14, buckets=[7, 24]))
+    with pytest.raises(JournalError):
+        check_journal(journalPath, journal_settings(7, buckets=[7, 24], cache_path="cache.sqlite3"))
@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+from stream_pipeline import StreamingPipeline
+
+
+def test_source_error_comes_after_the_probed_rows():
+    def source():
+        for i in range(20):
+            yield f"http://h{i % 3}.example/{i}"
+        raise RuntimeError("cursor died")
+
+    def probe(url):
+        time.sleep(0.01)
+        return "OK"
+
+    rows = []
+    with pytest.raises(RuntimeError, match="cursor died"):
+        for item, result in StreamingPipeline(source(), probe, workers=4, queue_size=5):
+            rows.append(item)
+    assert len(rows) == 20
+
+
+def test_stop_keeps_the_results_waiting_for_their_turn():
+    def probe(url):
+        time.sleep(2 if url.endswith("/slow") else 0.01)
+        return "OK"
+
+    urls = ["http://a.example/slow"] + [f"http://h{i}.example/fast" for i in range(5)]
+    pipeline = StreamingPipeline(iter(urls), probe, workers=4).start()
+    time.sleep(0.5)
+    pipeline.stop()
+    start = time.perf_counter()
+    drained = sorted(item for item, _ in pipeline.drain())
+    assert drained == sorted(urls[1:])
+    assert time.perf_counter() - start < 1.5
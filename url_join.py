@@ -0,0 +1,137 @@
+# import libraries
+import os
+import pickle
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from report_writer import read_report
+
+KEY_COLUMN = "_url_key"
+CUSTOMER_URL_COLUMN = "_customer_url"
+INDEX_VERSION = 1
+
+
+def normalize_feed_url(url):
+    """
+    Return the join key of a feed URL: the same for URLs that only differ by
+    scheme (http/https), host case, default port, trailing slash, fragment or
+    the order of the query parameters.
+    """
+    if not isinstance(url, str):
+        return None
+    url = url.strip()
+    if not url:
+        return None
+    try:
+        parts = urlsplit(url if "://" in url else "//" + url)
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return url.lower()
+
+    if port and not (parts.scheme, port) in (("http", 80), ("https", 443)):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+
+class CustomerIndex:
+    """
+    The customer dataset with its normalized URL key, built once.
+
+    'frame' is the customer DataFrame with the key column added and
+    'key_counts' how many customer rows share every key (more than one
+    means a URL of the errors report can match several customer rows).
+    """
+    def __init__(self, frame, join_column, source_mtime=None, source_size=None):
+        self.join_column = join_column
+        self.frame = frame
+        self.frame[KEY_COLUMN] = frame[join_column].map(normalize_feed_url)
+        self.key_counts = self.frame[KEY_COLUMN].value_counts()
+        self.source_mtime = source_mtime
+        self.source_size = source_size
+
+    def join(self, df_main, main_join_column):
+        """
+        INNER JOIN of 'df_main' with the customers by the normalized URL.
+        When a URL matches several customer rows and one of them has exactly
+        the same URL, only that one is kept. Return (df_combined, stats).
+        """
+        import pandas as pd
+
+        left = df_main.reset_index(drop=True)
+        left_keys = left[main_join_column].map(normalize_feed_url)
+        right = self.frame.rename(columns={self.join_column: CUSTOMER_URL_COLUMN})
+        right = right[right[KEY_COLUMN].notna()] # an empty URL doesn't match anything
+
+        left_rows = pd.Series(range(len(left)), name="_main_row")
+        df_combined = pd.merge(left.assign(**{KEY_COLUMN: left_keys, "_main_row": left_rows}),
+                               right, on=KEY_COLUMN, how="inner")
+
+        candidates = df_combined[KEY_COLUMN].map(self.key_counts)
+        ambiguous = candidates > 1
+        exact = df_combined[main_join_column] == df_combined[CUSTOMER_URL_COLUMN]
+        has_exact = exact.groupby(df_combined["_main_row"]).transform("any")
+        df_combined = df_combined[~ambiguous | ~has_exact | exact]
+
+        matched_rows = df_combined["_main_row"].nunique()
+        stats = {
+            "matched": matched_rows,
+            "unmatched": len(left) - matched_rows,
+            "ambiguous": df_combined.loc[ambiguous[df_combined.index], "_main_row"].nunique(),
+            "not_exact": int((df_combined[main_join_column] != df_combined[CUSTOMER_URL_COLUMN]).sum()),
+        }
+
+        df_combined = df_combined.drop(columns=[KEY_COLUMN, "_main_row", CUSTOMER_URL_COLUMN]).reset_index(drop=True)
+        return df_combined, stats
+
+
+# URL indexes that couldn't be saved, not tried again by this process
+_unwritable_sidecars = set()
+
+
+def index_sidecar_path(customer_file_path):
+    return f"{customer_file_path}.urlindex.pkl"
+
+
+def load_customer_index(customer_file_path, customer_join_column, use_cache=False):
+    """
+    Return the CustomerIndex of a customer file. With 'use_cache' (the command
+    line scripts) the index is saved next to the file (<file>.urlindex.pkl)
+    and reused while the file keeps the same modification time and size, so
+    the file isn't read and hashed again.
+    """
+    stat = os.stat(customer_file_path)
+    sidecar = index_sidecar_path(customer_file_path)
+
+    if use_cache and os.path.exists(sidecar):
+        try:
+            with open(sidecar, "rb") as f:
+                saved = pickle.load(f)
+            if (saved.get("version") == INDEX_VERSION
+                    and saved["source_mtime"] == stat.st_mtime
+                    and saved["source_size"] == stat.st_size
+                    and saved["index"].join_column == customer_join_column):
+                return saved["index"]
+        except Exception as e:
+            print(f"The URL index '{sidecar}' couldn't be used, building it again: {e}")
+
+    df_customer = read_report(customer_file_path)
+    if customer_join_column not in df_customer.columns:
+        raise ValueError(f"The join column '{customer_join_column}' doesn't found on '{customer_file_path}'. ")
+    customerIndex = CustomerIndex(df_customer, customer_join_column, stat.st_mtime, stat.st_size)
+
+    if use_cache and sidecar not in _unwritable_sidecars:
+        try:
+            temp_path = sidecar + ".tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump({"version": INDEX_VERSION,
+                             "source_mtime": stat.st_mtime,
+                             "source_size": stat.st_size,
+                             "index": customerIndex}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, sidecar)
+        except Exception as e:
+            # Not tried again by this process (e.g. a read-only folder)
+            _unwritable_sidecars.add(sidecar)
+            print(f"The URL index '{sidecar}' can't be saved, it's built on every run: {e}")
+    return customerIndex